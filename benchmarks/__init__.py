@@ -0,0 +1 @@
+"""Микробенчмарки движка и рендеринга. Запуск: python -m benchmarks.<модуль>"""
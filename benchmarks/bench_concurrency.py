@@ -0,0 +1,182 @@
+"""Стресс-проверка параллельной обработки апдейтов с очередностью по чатам.
+
+Сотни чатов одновременно начинают игру, нажимают кнопки и переключают вид.
+Апдейты всех чатов перемешаны в одну очередь (порядок внутри чата
+сохранен), а сетевые вызовы Telegram заменены на asyncio.sleep. Очередь
+обрабатывается как в PTB по умолчанию (по одному апдейту) и через
+ChatUpdateProcessor; для сравнения - параллельно без очередности по чатам
+(SimpleUpdateProcessor). Для каждого чата проверяется, что все ходы дошли
+до игры и применены в порядке нажатий.
+    
+    python -m benchmarks.bench_concurrency [--chats 300] [--moves 20] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from telegram.ext import SimpleUpdateProcessor
+
+from database.session_store import GameSessions, MemorySessionStore
+from handlers.game_handler import GameHandler
+from handlers.outbound import OutboundScheduler
+from handlers.update_processor import ChatUpdateProcessor
+
+MOVES = ["left", "right", "rotate", "down"]
+
+
+class FakeMessage:
+    """Сообщение Telegram: каждый вызов API "идет по сети" около latency секунд"""
+    
+    def __init__(self, chat_id, latency):
+        self.chat_id = chat_id
+        self.message_id = 1
+        self.latency = latency
+        self.rng = random.Random(chat_id)
+    
+    async def network(self):
+        await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+    
+    async def reply_photo(self, **kwargs):
+        await self.network()
+    
+    async def reply_text(self, *args, **kwargs):
+        await self.network()
+    
+    async def edit_text(self, *args, **kwargs):
+        await self.network()
+
+
+class FakeQuery:
+    def __init__(self, data, message):
+        self.data = data
+        self.message = message
+    
+    async def answer(self):
+        await self.message.network()
+    
+    async def edit_message_media(self, **kwargs):
+        await self.message.network()
+    
+    async def edit_message_text(self, *args, **kwargs):
+        await self.message.network()
+
+
+class NullRecords:
+    def update_record(self, user_id, user_data, score, replay=None):
+        return False
+
+
+def recording_game_class(base):
+    """Подкласс игры, который записывает каждый примененный к нему ход"""
+    
+    class RecordingGame(base):
+        def __init__(self):
+            super().__init__()
+            self.applied = []
+        
+        def move(self, dx, dy):
+            self.applied.append({(-1, 0): "left", (1, 0): "right", (0, 1): "down"}[(dx, dy)])
+            return super().move(dx, dy)
+        
+        def rotate(self):
+            self.applied.append("rotate")
+            return super().rotate()
+    
+    return RecordingGame
+
+
+def make_updates(chats, moves, latency, seed=1):
+    """Апдейты всех чатов вперемешку; для каждого чата - ожидаемые ходы"""
+    rng = random.Random(seed)
+    streams = {}
+    expected = {}
+    for chat_id in range(1, chats + 1):
+        message = FakeMessage(chat_id, latency)
+        actions = [rng.choice(MOVES) for _ in range(moves)]
+        # Переключение вида посередине: отправка нового сообщения внутри обработки
+        actions.insert(moves // 2, "toggle_view")
+        expected[chat_id] = [action for action in actions if action in MOVES]
+        streams[chat_id] = [("play_game", message)] + [(action, message) for action in actions]
+    
+    updates = []
+    positions = {chat_id: 0 for chat_id in streams}
+    while positions:
+        chat_id = rng.choice(list(positions))
+        data, message = streams[chat_id][positions[chat_id]]
+        positions[chat_id] += 1
+        if positions[chat_id] == len(streams[chat_id]):
+            del positions[chat_id]
+        updates.append(SimpleNamespace(
+            effective_chat=SimpleNamespace(id=chat_id),
+            effective_user=SimpleNamespace(id=chat_id, username=f"user{chat_id}", first_name=f"Игрок {chat_id}"),
+            callback_query=FakeQuery(data, message)
+        ))
+    return updates, expected
+
+
+async def handle(handler, update):
+    """Повторяет TetrisBot.handle_callback для игровых кнопок"""
+    query = update.callback_query
+    await query.answer()
+    user = update.effective_user
+    if query.data == "play_game":
+        await handler.start_game(update, None, query.message, user)
+    else:
+        await handler.handle_game_action(update, None, query, user)
+
+
+async def settle(handler):
+    """Дожидается фоновых задач отрисовки"""
+    while handler.pending_displays:
+        await asyncio.gather(*(state['task'] for state in list(handler.pending_displays.values())))
+
+
+async def run(mode, chats, moves, latency):
+    updates, expected = make_updates(chats, moves, latency)
+    sessions = GameSessions(None, MemorySessionStore())
+    # Проверяется обработка апдейтов, а не лимиты Telegram
+    outbound = OutboundScheduler(global_rate=0, chat_rate=0, group_rate=0)
+    handler = GameHandler(NullRecords(), sessions, outbound)
+    handler.game_class = sessions.game_class = recording_game_class(handler.game_class)
+    
+    start = time.perf_counter()
+    if mode == "sequential":
+        for update in updates:
+            await handle(handler, update)
+    else:
+        processor = ChatUpdateProcessor(256) if mode == "per-chat" else SimpleUpdateProcessor(256)
+        tasks = [asyncio.create_task(processor.process_update(update, handle(handler, update))) for update in updates]
+        await asyncio.gather(*tasks)
+    await settle(handler)
+    elapsed = time.perf_counter() - start
+    await handler.shutdown()
+    
+    # Игра за 20 ходов без сброса не заканчивается, поэтому у каждого чата одна игра
+    broken = [
+        chat_id for chat_id in expected
+        if chat_id not in handler.games or handler.games.get(chat_id).applied != expected[chat_id]
+    ]
+    return len(updates), elapsed, broken
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=300)
+    parser.add_argument('--moves', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+    
+    print(f"{args.chats} чатов, {args.moves} ходов в каждом, задержка API {args.latency * 1000:.0f} мс")
+    results = {}
+    for mode in ("sequential", "per-chat", "unordered"):
+        count, elapsed, broken = asyncio.run(run(mode, args.chats, args.moves, args.latency))
+        results[mode] = count / elapsed
+        status = "порядок соблюден" if not broken else f"НАРУШЕН в {len(broken)} чатах"
+        print(f"{mode:>10}: {count} апдейтов за {elapsed:6.2f} с, {count / elapsed:8.1f} апдейтов/с, {status}")
+    print(f"Ускорение: x{results['per-chat'] / results['sequential']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
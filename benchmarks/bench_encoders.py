@@ -0,0 +1,54 @@
+"""Размер кадра и время кодирования для каждого формата из game.encoders.
+
+Корпус - снимки игр (game.snapshot), записанные подряд в файл. Без
+аргументов корпус генерируется сыгранными с фиксированным seed партиями.
+
+    python -m benchmarks.bench_encoders [--corpus FILE] [--record FILE]
+"""
+import argparse
+import time
+
+from config import BOARD_WIDTH, BOARD_HEIGHT
+from game.renderer import AtlasRenderer
+from game.encoders import ENCODERS
+from game.snapshot import HEADER, snapshot_game, restore_frame_state
+
+from benchmarks.common import generate_states
+
+SNAPSHOT_SIZE = HEADER.size + BOARD_WIDTH * BOARD_HEIGHT
+
+
+def load_corpus(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [data[i:i + SNAPSHOT_SIZE] for i in range(0, len(data), SNAPSHOT_SIZE)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', help="файл с записанными снимками")
+    parser.add_argument('--record', help="сохранить сгенерированный корпус в файл")
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+    
+    if args.corpus:
+        snapshots = load_corpus(args.corpus)
+    else:
+        snapshots = [snapshot_game(state) for state in generate_states(args.frames)]
+        if args.record:
+            with open(args.record, 'wb') as f:
+                f.write(b''.join(snapshots))
+    
+    renderer = AtlasRenderer()
+    images = [renderer.create_game_image(restore_frame_state(s)) for s in snapshots]
+    print(f"Корпус: {len(images)} кадров")
+    
+    for name, encode in ENCODERS.items():
+        start = time.perf_counter()
+        total_bytes = sum(len(encode(img)) for img in images)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>12}: {total_bytes / len(images):8.0f} байт/кадр  {elapsed / len(images) * 1000:6.2f} мс/кадр")
+
+
+if __name__ == '__main__':
+    main()
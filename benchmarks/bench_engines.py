@@ -0,0 +1,72 @@
+"""Сравнение TetrisGame и BitboardTetrisGame: рандомизированная проверка эквивалентности и скорость"""
+import random
+import time
+
+from game.tetris import TetrisGame
+from game.bitboard import BitboardTetrisGame
+
+from benchmarks.common import ACTIONS, apply_action, fill_garbage
+
+
+def game_snapshot(game):
+    return (
+        [list(row) for row in game.board],
+        [list(row) for row in game.current_piece],
+        game.piece_x, game.piece_y, game.piece_color,
+        game.get_game_state()
+    )
+
+
+def play(game_class, seed, steps):
+    """Играет партию и возвращает состояние после каждого действия"""
+    random.seed(seed)
+    actions = random.Random(seed)
+    game = game_class()
+    fill_garbage(game, actions)
+    trace = [game_snapshot(game)]
+    for _ in range(steps):
+        if game.game_over:
+            break
+        apply_action(game, actions.choice(ACTIONS))
+        trace.append(game_snapshot(game))
+    return trace
+
+
+def check_equivalence(engine, games=300, steps=400):
+    """Проверяет, что движок ведет себя так же, как TetrisGame"""
+    for seed in range(games):
+        expected = play(TetrisGame, seed, steps)
+        actual = play(engine, seed, steps)
+        if expected != actual:
+            step = next(i for i, (a, b) in enumerate(zip(expected, actual)) if a != b)
+            raise AssertionError(f"{engine.__name__}: расхождение с TetrisGame, seed={seed}, шаг={step}")
+    print(f"✅ {engine.__name__}: {games} случайных партий совпадают с TetrisGame")
+
+
+def throughput(game_class, games=200, steps=400):
+    random.seed(0)
+    actions = random.Random(0)
+    script = [actions.choice(ACTIONS) for _ in range(steps)]
+    total = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        game = game_class()
+        for action in script:
+            if game.game_over:
+                game = game_class()
+            apply_action(game, action)
+            total += 1
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    check_equivalence(BitboardTetrisGame)
+    base = None
+    for engine in (TetrisGame, BitboardTetrisGame):
+        ops = throughput(engine)
+        base = base or ops
+        print(f"{engine.__name__:>20}: {ops:10.0f} действий/с  (x{ops / base:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""LeaderboardIndex против сортировки всех записей на каждый запрос.
+
+    python -m benchmarks.bench_leaderboard [--players 1000000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from database.leaderboard import LeaderboardIndex
+
+
+def timed(func, count):
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=1000000)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    scores = [(str(100000 + i), rng.randint(0, 50000)) for i in range(args.players)]
+    user_ids = [user_id for user_id, _ in scores]
+    print(f"{args.players} игроков")
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = LeaderboardIndex(scores)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Построение индекса: {build:.2f} с, память {memory / 1024 / 1024:.0f} МБ")
+    
+    samples = [rng.choice(user_ids) for _ in range(100000)]
+    print(f"update:  {timed(lambda i: index.update(samples[i], rng.randint(0, 60000)), len(samples)):10.0f} оп/с")
+    print(f"rank:    {timed(lambda i: index.rank(samples[i]), len(samples)):10.0f} оп/с")
+    print(f"top-10:  {timed(lambda i: index.top(10), len(samples)):10.0f} оп/с")
+    
+    # Как раньше: сортировка всех записей на каждый просмотр статистики
+    records = {user_id: {'score': score} for user_id, score in scores}
+    sort_ops = timed(lambda i: sorted(records.values(), key=lambda x: x.get('score', 0), reverse=True)[:100], 3)
+    print(f"сортировка (старый get_user_stats): {sort_ops:10.2f} оп/с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Стоимость метрик на горячем пути и проверка формата Prometheus.
+
+Сначала меряется одна запись в гистограмму и счетчик. Затем нажатия в
+GameHandler (с подменой Telegram, как в bench_concurrency) проходят с
+метриками, и считается, сколько записей приходится на нажатие и какую
+долю времени нажатия они занимают. Вывод render_prometheus() проверяется
+построчно, а профилировщик медленных нажатий - на нескольких нажатиях.
+
+    python -m benchmarks.bench_metrics [--presses 2000]
+"""
+import argparse
+import asyncio
+import random
+import re
+import tempfile
+import time
+import timeit
+
+import metrics
+from metrics import Histogram, Counter, STAGE_SECONDS, SlowRequestProfiler
+from database.session_store import GameSessions, MemorySessionStore
+from handlers.game_handler import GameHandler
+from handlers.outbound import OutboundScheduler
+from handlers.stats_handler import StatsHandler
+
+from benchmarks.bench_concurrency import FakeMessage, FakeQuery, NullRecords
+from benchmarks.fake_bot_api import GAME_ACTIONS
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="[^"]*"(,[a-zA-Z_][a-zA-Z0-9_]*="[^"]*")*\})? \S+$')
+
+
+def bench_primitives(number=200000):
+    histogram = Histogram("bench_seconds", "bench", label="stage")
+    counter = Counter("bench_total", "bench", label="action")
+    rng = random.Random(0)
+    values = [rng.expovariate(200) for _ in range(1000)]
+    value = iter(values * (number // len(values) + 1)).__next__
+    observe = timeit.timeit(lambda: histogram.observe(value(), "render"), number=number) / number
+    inc = timeit.timeit(lambda: counter.inc("left"), number=number) / number
+    timer = timeit.timeit(time.perf_counter, number=number) / number
+    empty = timeit.timeit(lambda: None, number=number) / number
+    return observe - empty, inc - empty, timer
+
+
+def observations():
+    return sum(STAGE_SECONDS.summary(stage)[0] for stage in list(STAGE_SECONDS.series))
+
+
+async def bench_presses(presses):
+    """Возвращает (мкс на нажатие, записей в гистограммы на нажатие)"""
+    sessions = GameSessions(None, MemorySessionStore())
+    outbound = OutboundScheduler(global_rate=0, chat_rate=0, group_rate=0)
+    handler = GameHandler(NullRecords(), sessions, outbound)
+    sessions.game_class = handler.game_class
+    user = FakeMessage(1, 0)
+    user.first_name = "Игрок"
+    message = FakeMessage(1, 0)
+    await handler.start_game(None, None, message, user)
+    rng = random.Random(1)
+    before = observations()
+    start = time.perf_counter()
+    for _ in range(presses):
+        await handler.handle_game_action(None, None, FakeQuery(rng.choice(GAME_ACTIONS), message), user)
+        # Как в боте: следующее нажатие приходит после кадра
+        while handler.pending_displays:
+            await asyncio.gather(*(state['task'] for state in list(handler.pending_displays.values())))
+        if handler.games.get(1).game_over:
+            await handler.start_game(None, None, message, user)
+    elapsed = (time.perf_counter() - start) / presses
+    per_press = (observations() - before) / presses
+    metrics.register_stats("sessions", handler.games.get_stats)
+    metrics.register_stats("frame_cache", handler.frame_cache.get_stats)
+    metrics.register_stats("outbound", handler.outbound.get_stats)
+    await handler.shutdown()
+    return elapsed, per_press
+
+
+def check_prometheus():
+    metrics.register_stats("nested", lambda: {'records': {'hits': 3, 'hit_rate': 0.5}})
+    start = time.perf_counter()
+    text = metrics.render_prometheus()
+    elapsed = time.perf_counter() - start
+    metrics.unregister_stats("nested")
+    samples = 0
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        if not SAMPLE.match(line):
+            raise AssertionError(f"Строка не в формате Prometheus: {line!r}")
+        samples += 1
+    for required in ('tetris_stage_seconds_bucket{stage="render",le="+Inf"}', 'tetris_sessions_cached',
+                     'tetris_nested_hits{name="records"} 3'):
+        if required not in text:
+            raise AssertionError(f"Нет метрики {required}")
+    return samples, len(text), elapsed
+
+
+async def check_profiler(directory):
+    profiler = SlowRequestProfiler(sample_rate=1.0, slow_ms=5, directory=directory)
+    
+    async def press(seconds):
+        profile = profiler.start()
+        start = time.perf_counter()
+        sum(range(20000))
+        await asyncio.sleep(seconds)
+        profiler.finish(profile, time.perf_counter() - start, "left")
+    
+    await press(0)
+    await press(0.01)
+    return metrics.SLOW_PROFILES.values.get("", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--presses', type=int, default=2000)
+    args = parser.parse_args()
+    
+    observe, inc, timer = bench_primitives()
+    print(f"observe: {observe * 1e9:.0f} нс, inc: {inc * 1e9:.0f} нс, perf_counter: {timer * 1e9:.0f} нс")
+    elapsed, per_press = asyncio.run(bench_presses(args.presses))
+    # На каждую запись - еще два вызова perf_counter
+    overhead = per_press * (observe + 2 * timer) + inc
+    print(f"Нажатие: {elapsed * 1e6:.0f} мкс, записей в гистограммы: {per_press:.1f}, "
+          f"метрики: {overhead * 1e6:.2f} мкс ({overhead / elapsed:.2%})")
+    samples, size, render_time = check_prometheus()
+    print(f"✅ /metrics: {samples} значений, {size} байт за {render_time * 1000:.2f} мс")
+    text = StatsHandler().create_stats_text()
+    print(f"✅ /stats: {len(text)} символов\n{text}")
+    with tempfile.TemporaryDirectory() as directory:
+        saved = asyncio.run(check_profiler(directory))
+    if saved != 1:
+        raise AssertionError(f"Ожидался один профиль медленного нажатия, сохранено {saved}")
+    print("✅ Профиль сохранен только для медленного нажатия")
+
+
+if __name__ == '__main__':
+    main()
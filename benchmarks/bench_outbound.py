@@ -0,0 +1,140 @@
+"""Исходящие запросы при лимитах Telegram: прямые вызовы против планировщика.
+
+GameHandler с настоящим telegram.Bot работает против локального стенда
+Bot API (benchmarks/fake_bot_api.py), который, как Telegram, отвечает 429
+на сообщения сверх лимита в чат и в целом. Игроки нажимают кнопки чаще,
+чем чат может обновляться. Без планировщика запросы уходят сразу, а
+ответ 429 - обычная ошибка, после которой обработчик пробует запасные
+запросы (как было раньше); с планировщиком запросы ждут токенов, а
+устаревшие кадры заменяются новыми. Для каждого чата измеряется, через
+сколько после последнего нажатия игрок видит итоговое сообщение.
+
+    python -m benchmarks.bench_outbound [--chats 40] [--presses 30] [--chat-limit 1] [--global-limit 30]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from telegram import Bot, Update
+from telegram.error import RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+
+from database.session_store import GameSessions, MemorySessionStore
+from handlers.game_handler import GameHandler
+from handlers.outbound import OutboundScheduler
+
+from benchmarks.fake_bot_api import FakeBotApi, GAME_ACTIONS, make_press
+
+
+class DirectSender:
+    """Прежнее поведение: запрос уходит сразу, 429 - такая же ошибка, как остальные"""
+    
+    async def send(self, chat_id, call, key=None):
+        try:
+            return await call()
+        except RetryAfter as e:
+            raise TelegramError(str(e))
+    
+    async def stop(self):
+        pass
+    
+    def get_stats(self):
+        return {}
+
+
+class NullRecords:
+    def update_record(self, user_id, user_data, score, replay=None):
+        return False
+
+
+async def run(mode, args):
+    api = FakeBotApi(args.latency, chat_limit=args.chat_limit, chat_burst=args.chat_burst,
+                     global_limit=args.global_limit)
+    await api.start()
+    bot = Bot("123456:TEST", base_url=f"{api.url}/bot",
+              request=HTTPXRequest(connection_pool_size=args.chats * 2))
+    await bot.initialize()
+    
+    if mode == "scheduler":
+        outbound = OutboundScheduler(global_rate=args.global_limit, chat_rate=args.chat_limit,
+                                     burst=args.chat_burst)
+    else:
+        outbound = DirectSender()
+    sessions = GameSessions(None, MemorySessionStore())
+    handler = GameHandler(NullRecords(), sessions, outbound)
+    sessions.game_class = handler.game_class
+    
+    last_message = {}
+    api.on_message = lambda method, chat_id: last_message.__setitem__(chat_id, time.perf_counter())
+    last_press = {}
+    next_update_id = [1]
+    errors = []
+    
+    def press_update(chat_id, data):
+        update = Update.de_json(dict(make_press(chat_id, data), update_id=next_update_id[0]), bot)
+        next_update_id[0] += 1
+        return update
+    
+    async def handle(coroutine):
+        # Ошибку обработчика PTB только записывает в лог
+        try:
+            await coroutine
+        except TelegramError as e:
+            errors.append(e)
+    
+    async def player(chat_id):
+        rng = random.Random(chat_id)
+        update = press_update(chat_id, "play_game")
+        await handle(handler.start_game(update, None, update.callback_query.message, update.effective_user))
+        for _ in range(args.presses):
+            await asyncio.sleep(rng.uniform(0, 2 * args.think))
+            update = press_update(chat_id, rng.choice(GAME_ACTIONS))
+            last_press[chat_id] = time.perf_counter()
+            await handle(handler.handle_game_action(update, None, update.callback_query, update.effective_user))
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(player(chat_id) for chat_id in range(1, args.chats + 1)))
+    # Дожидаемся последних кадров
+    while handler.pending_displays:
+        await asyncio.gather(*(state['task'] for state in list(handler.pending_displays.values())))
+    elapsed = time.perf_counter() - start
+    
+    stats = outbound.get_stats()
+    await handler.shutdown()
+    await bot.shutdown()
+    await api.stop()
+    final = [last_message[chat_id] - last_press[chat_id] for chat_id in last_press if chat_id in last_message]
+    return elapsed, final, len(errors), api, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=40)
+    parser.add_argument('--presses', type=int, default=30)
+    parser.add_argument('--think', type=float, default=0.15, help="средняя пауза между нажатиями, с")
+    parser.add_argument('--latency', type=float, default=0.02, help="задержка сети в одну сторону, с")
+    parser.add_argument('--chat-limit', type=float, default=1.0, help="сообщений в секунду на чат")
+    parser.add_argument('--chat-burst', type=int, default=3)
+    parser.add_argument('--global-limit', type=float, default=30.0, help="сообщений в секунду всего")
+    args = parser.parse_args()
+    
+    print(f"{args.chats} чатов по {args.presses} нажатий (пауза ~{args.think * 1000:.0f} мс), "
+          f"лимит {args.chat_limit:g}/с на чат и {args.global_limit:g}/с всего")
+    for mode in ("direct", "scheduler"):
+        elapsed, final, errors, api, stats = asyncio.run(run(mode, args))
+        messages = sum(count for method, count in api.calls.items() if method != "getMe")
+        floods = sum(api.flood_errors.values())
+        # Итоговое сообщение могло уйти раньше последнего нажатия, если кадр после него не дошел
+        late = [value for value in final if value >= 0]
+        print(f"{mode:>9}: {elapsed:5.1f} с, запросов {messages}, ответов 429: {floods}, ошибок обработчика: {errors}")
+        print(f"{'':>11}итоговое сообщение через {statistics.mean(late):5.2f} с (макс {max(late):5.2f} с), "
+              f"не показано в {args.chats - len(late)} чатах")
+        print(f"{'':>11}вызовы: {dict(api.calls)}")
+        if stats:
+            print(f"{'':>11}планировщик: {stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Скорость update_record для разных хранилищ рекордов при 10k и 100k игроков.
+
+С --async запись идет через фоновый RecordsWriter, и вместо пропускной
+способности меряется, на сколько update_record задерживает цикл событий.
+
+    python -m benchmarks.bench_records [--players 10000 100000] [--updates 200] [--async]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from database.records import RecordsManager
+from database.windows import WindowedLeaderboards
+from database.storage import JsonStorage
+from database.journal_storage import JournalStorage
+from database.sqlite_storage import SqliteStorage
+
+
+def make_records(players, seed=1):
+    rng = random.Random(seed)
+    stamp = "2025-01-01T00:00:00"
+    return {
+        str(100000 + i): {
+            'username': f"user{i}", 'first_name': f"Игрок {i}", 'last_name': '',
+            'score': rng.randint(0, 20000), 'date': stamp, 'last_played': stamp
+        }
+        for i in range(players)
+    }
+
+
+BACKENDS = [
+    ("json (перезапись)", lambda directory, json_path: JsonStorage(json_path)),
+    ("journal fsync=entry", lambda directory, json_path: JournalStorage(json_path, fsync="entry")),
+    ("journal fsync=batch", lambda directory, json_path: JournalStorage(json_path, fsync="batch")),
+    ("sqlite", lambda directory, json_path: SqliteStorage(os.path.join(directory, "records.db"), json_path=json_path)),
+]
+
+
+def bench(players, updates):
+    records = make_records(players)
+    rng = random.Random(2)
+    user_ids = [int(user_id) for user_id in rng.choices(list(records), k=updates)]
+    print(f"\n{players} игроков, {updates} обновлений")
+    for name, factory in BACKENDS:
+        directory, manager = open_manager(records, factory)
+        start = time.perf_counter()
+        for i, user_id in enumerate(user_ids):
+            manager.update_record(user_id, {'username': 'u', 'first_name': 'Игрок'}, i * 7 % 25000)
+        elapsed = time.perf_counter() - start
+        manager.close()
+        shutil.rmtree(directory)
+        print(f"{name:>22}: {updates / elapsed:10.1f} обновлений/с")
+
+
+def open_manager(records, factory):
+    # Каждое хранилище начинает с одинакового файла в отдельном каталоге
+    directory = tempfile.mkdtemp(prefix="tetris-records-")
+    json_path = os.path.join(directory, "records.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    return directory, RecordsManager(factory(directory, json_path), WindowedLeaderboards(path=None))
+
+
+async def run_async(manager, user_ids):
+    """Обновления вперемешку с другими задачами цикла; возвращает задержки update_record"""
+    manager.start_writer()
+    stalls = []
+    for i, user_id in enumerate(user_ids):
+        start = time.perf_counter()
+        manager.update_record(user_id, {'username': 'u', 'first_name': 'Игрок'}, i * 7 % 25000)
+        stalls.append(time.perf_counter() - start)
+        # Даем циклу обработать другие события, как между апдейтами Telegram
+        await asyncio.sleep(0)
+    start = time.perf_counter()
+    await manager.stop_writer()
+    return stalls, time.perf_counter() - start
+
+
+def bench_async(players, updates):
+    records = make_records(players)
+    rng = random.Random(2)
+    user_ids = [int(user_id) for user_id in rng.choices(list(records), k=updates)]
+    print(f"\n{players} игроков, {updates} обновлений, фоновая запись")
+    for name, factory in BACKENDS:
+        directory, manager = open_manager(records, factory)
+        stalls, drain = asyncio.run(run_async(manager, user_ids))
+        stats = manager.get_writer_stats()
+        manager.close()
+        shutil.rmtree(directory)
+        stalls.sort()
+        print(f"{name:>22}: блокировка цикла p50 {stalls[len(stalls) // 2] * 1e6:7.1f} мкс, "
+              f"max {stalls[-1] * 1e3:6.2f} мс; {stats['flushes']} записей на диск "
+              f"(в среднем {stats['avg_flush_ms']:.2f} мс), дозапись при остановке {drain * 1e3:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--async', dest='use_async', action='store_true')
+    args = parser.parse_args()
+    for players in args.players:
+        if args.use_async:
+            bench_async(players, args.updates)
+        else:
+            bench(players, args.updates)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Время запуска и память RecordsManager: JSON-файл против двоичного снимка.
+
+Каждый замер идет в отдельном процессе, чтобы RSS не смешивался. Сначала
+проверяется, что рейтинг снимка после перезапуска учитывает рекорды из
+журнала, которые еще не свернуты в снимок, и остается верным после
+сворачивания.
+
+    python -m benchmarks.bench_records_startup [--players 100000 1000000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_records import make_records
+from database.records import RecordsManager
+from database.windows import WindowedLeaderboards
+from database.storage import JsonStorage
+from database.snapshot_storage import SnapshotStorage
+from database.records_snapshot import write_snapshot
+
+LOADERS = {
+    'json': lambda directory: JsonStorage(os.path.join(directory, "records.json")),
+    'snapshot': lambda directory: SnapshotStorage(os.path.join(directory, "records.snap"), json_path=None),
+}
+
+
+def rss_mb():
+    """RSS процесса и его анонимная часть (без страниц файлов, отображенных в память)"""
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'RssAnon'):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields.get('VmRSS', 0.0), fields.get('RssAnon', 0.0)
+
+
+def child(loader, directory, user_id):
+    """Замер в дочернем процессе; результат - одна строка JSON"""
+    before = rss_mb()
+    start = time.perf_counter()
+    manager = RecordsManager(LOADERS[loader](directory), WindowedLeaderboards(path=None))
+    startup = time.perf_counter() - start
+    start = time.perf_counter()
+    manager.get_top_records(10)
+    manager.get_user_stats(user_id)
+    first_view = time.perf_counter() - start
+    after = rss_mb()
+    print(json.dumps({'startup': startup, 'first_view': first_view,
+                      'rss': after[0] - before[0], 'anon': after[1] - before[1]}))
+    manager.close()
+
+
+def bench(players):
+    records = make_records(players)
+    user_id = next(iter(records))
+    directory = tempfile.mkdtemp(prefix="tetris-records-")
+    with open(os.path.join(directory, "records.json"), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    start = time.perf_counter()
+    write_snapshot(os.path.join(directory, "records.snap"), changes=records)
+    build = time.perf_counter() - start
+    del records
+
+    sizes = {name: os.path.getsize(os.path.join(directory, f"records.{ext}")) / 1024 / 1024
+             for name, ext in (('json', 'json'), ('snapshot', 'snap'))}
+    print(f"\n{players} игроков (сборка снимка из JSON: {build:.2f} с)")
+    for loader in LOADERS:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_records_startup', '--child', loader, directory, user_id],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{loader:>9}: файл {sizes[loader]:7.1f} МБ, запуск {result['startup']:7.3f} с, "
+              f"RSS +{result['rss']:7.1f} МБ (анонимная +{result['anon']:6.1f} МБ), первый топ и статистика {result['first_view'] * 1000:7.2f} мс")
+    shutil.rmtree(directory)
+
+
+def expected_view(scores, user_ids):
+    """Топ-10 очков, места игроков и число игроков по словарю user_id -> очки"""
+    ordered = sorted(scores.values(), reverse=True)
+    ranks = {user_id: 1 + sum(1 for score in ordered if score > scores[user_id]) for user_id in user_ids}
+    return ordered[:10], ranks, len(scores)
+
+
+def manager_view(manager, user_ids):
+    top = [record['score'] for record in manager.get_top_records(10)]
+    ranks = {user_id: manager.get_user_stats(user_id)['rank'] for user_id in user_ids}
+    return top, ranks, manager.get_players_count()
+
+
+def check_restart(players=500):
+    directory = tempfile.mkdtemp(prefix="tetris-records-")
+    path = os.path.join(directory, "records.snap")
+
+    def open_manager():
+        # Журнал сворачивается только вызовом compact()
+        storage = SnapshotStorage(path, json_path=None, compact_entries=10 ** 9, compact_interval=3600)
+        return RecordsManager(storage, WindowedLeaderboards(path=None))
+
+    records = make_records(players)
+    scores = {user_id: record['score'] for user_id, record in records.items()}
+    user_ids = list(scores)[::25]
+    before = open_manager()
+    for user_id, record in records.items():
+        before.update_record(int(user_id), record, record['score'])
+
+    # Процесс "упал": снимок пуст, все рекорды только в журнале
+    manager = open_manager()
+
+    def new_records():
+        for user_id in user_ids[:5]:
+            scores[user_id] += 30000
+            manager.update_record(int(user_id), records[user_id], scores[user_id])
+
+    steps = [("после перезапуска", None), ("после сворачивания", manager.storage.compact),
+             ("после новых рекордов", new_records), ("после второго сворачивания", manager.storage.compact)]
+    try:
+        for name, action in steps:
+            if action is not None:
+                action()
+            if manager_view(manager, user_ids) != expected_view(scores, user_ids):
+                raise AssertionError(f"Рейтинг снимка неверен {name}")
+    finally:
+        manager.close()
+        before.storage.close()
+        shutil.rmtree(directory)
+    print(f"✅ рейтинг снимка верен после перезапуска без сворачивания и после сворачиваний ({players} игроков)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--child', nargs=3, metavar=('LOADER', 'DIR', 'USER_ID'))
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+    check_restart()
+    for players in args.players:
+        bench(players)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Задержка обработки нажатий при отрисовке в цикле событий и в пуле.
+
+Симулируется много одновременных чатов: каждый чат применяет действие к игре,
+рисует кадр и "загружает" его (asyncio.sleep вместо сетевого вызова).
+Кэш кадров не используется, чтобы измерять именно отрисовку.
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from game.bitboard import BitboardTetrisGame
+from game.render_pool import RenderExecutor
+from game.snapshot import snapshot_game
+
+from benchmarks.common import ACTIONS, apply_action
+
+UPLOAD_SECONDS = 0.02
+
+
+async def simulate_chat(executor, seed, presses, latencies):
+    rng = random.Random(seed)
+    game = BitboardTetrisGame()
+    for _ in range(presses):
+        await asyncio.sleep(rng.uniform(0.3, 1.0))  # Пауза между нажатиями
+        started = time.perf_counter()
+        if game.game_over:
+            game = BitboardTetrisGame()
+        apply_action(game, rng.choice(ACTIONS))
+        await executor.render(snapshot_game(game))
+        await asyncio.sleep(UPLOAD_SECONDS)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(kind, chats, presses, workers):
+    executor = RenderExecutor(kind, workers)
+    try:
+        # Прогрев пула, чтобы не учитывать запуск процессов
+        await asyncio.gather(*(executor.render(snapshot_game(BitboardTetrisGame())) for _ in range(workers)))
+        latencies = []
+        await asyncio.gather(*(simulate_chat(executor, seed, presses, latencies) for seed in range(chats)))
+        return latencies
+    finally:
+        executor.shutdown()
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+
+def main(chats=120, presses=20, workers=4):
+    print(f"{chats} чатов x {presses} нажатий, загрузка {UPLOAD_SECONDS * 1000:.0f} мс, CPU: {os.cpu_count()}")
+    for kind in ("inline", "thread", "process"):
+        latencies = asyncio.run(run(kind, chats, presses, workers))
+        print(f"{kind:>8}: p50 {percentile(latencies, 50):7.1f} мс   p99 {percentile(latencies, 99):7.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Сравнение GameRenderer, AtlasRenderer и SessionRenderer: совпадение кадров и FPS"""
+from game.renderer import GameRenderer, AtlasRenderer, SessionRenderer
+
+from benchmarks.common import generate_states, measure
+
+
+def main(frames=500):
+    # Состояния идут подряд, как кадры одной сессии
+    states = generate_states(frames)
+    reference = GameRenderer()
+    atlas = AtlasRenderer()
+    session = SessionRenderer(atlas)
+    renderers = [("draw", reference), ("atlas", atlas)]
+    
+    for state in states:
+        expected = reference.create_game_image(state).tobytes()
+        if atlas.create_game_image(state).tobytes() != expected:
+            raise AssertionError("AtlasRenderer дает кадр, отличный от GameRenderer")
+        if session.render(state).tobytes() != expected:
+            raise AssertionError("SessionRenderer дает кадр, отличный от GameRenderer")
+    print(f"✅ {len(states)} кадров совпадают побайтно "
+          f"(сессия: {session.partial_redraws} частичных, {session.full_redraws} полных перерисовок)")
+    
+    base_fps = None
+    for name, renderer in renderers:
+        elapsed = measure(renderer.create_game_image, states)
+        fps = len(states) / elapsed
+        base_fps = base_fps or fps
+        print(f"{name:>7}: {fps:8.1f} кадров/с  (x{fps / base_fps:.2f})")
+    
+    session = SessionRenderer(atlas)
+    fps = len(states) / measure(session.render, states, repeat=1)
+    print(f"{'session':>7}: {fps:8.1f} кадров/с  (x{fps / base_fps:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Хранилище сессий: проверка сериализации игр, размер состояния и стоимость хода.
+
+Игры обоих движков после каждого хода упаковываются и восстанавливаются;
+восстановленная игра должна совпадать с исходной, в том числе в индексе
+высот и битовых масках. Затем сравнивается, сколько стоит сохранить ход и
+прочитать игру в разных хранилищах, и проверяется, что игры из SQLite
+переживают "перезапуск" (повторное открытие файла) в обоих форматах:
+состоянием и журналом ходов, который после перезапуска повторяется. В конце считается
+память на сессию (tracemalloc) для брошенных игр: без вытеснения, с
+вытеснением в упакованный вид и с удалением.
+
+    python -m benchmarks.bench_sessions [--games 200] [--steps 300] [--abandoned 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from game.tetris import TetrisGame
+from game.bitboard import BitboardTetrisGame
+from game.state import pack_game, unpack_game
+from game.replay import play as play_move
+from game.renderer import AtlasRenderer, SessionRenderer
+from database.session_store import GameSessions, MemorySessionStore, SqliteSessionStore
+
+from benchmarks.common import ACTIONS, apply_action, fill_garbage
+
+ENGINES = {'list': TetrisGame, 'bitboard': BitboardTetrisGame}
+
+
+def game_state(game):
+    state = [pack_game(game), game.heights, game.board]
+    if hasattr(game, 'rows'):
+        state.append(game.rows)
+    return state
+
+
+def play(engine, seed, steps):
+    """Играет партию и после каждого хода отдает игру"""
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = engine()
+    fill_garbage(game, rng)
+    for _ in range(steps):
+        if game.game_over:
+            break
+        apply_action(game, rng.choice(ACTIONS))
+        yield game
+
+
+def check_roundtrip(games, steps):
+    checked = 0
+    for name, engine in ENGINES.items():
+        for seed in range(games):
+            for game in play(engine, seed, steps):
+                restored = unpack_game(pack_game(game), engine)
+                if game_state(restored) != game_state(game):
+                    raise AssertionError(f"{name}: игра восстановлена неверно, seed={seed}")
+                # Восстановленная игра продолжается так же, как исходная: генератор фигур сохранен с ней
+                if not game.game_over:
+                    game.drop()
+                    restored.drop()
+                    if game_state(restored) != game_state(game):
+                        raise AssertionError(f"{name}: восстановленная игра продолжилась иначе, seed={seed}")
+                checked += 1
+    print(f"✅ {checked} состояний обоих движков восстановлены без потерь")
+
+
+def bench_codec(engine, count=20000):
+    games = [game for seed in range(count // 100) for game in list(play(engine, seed, 100))][:count]
+    states = [pack_game(game) for game in games]
+    start = time.perf_counter()
+    for game in games:
+        pack_game(game)
+    pack_time = (time.perf_counter() - start) / len(games)
+    start = time.perf_counter()
+    for data in states:
+        unpack_game(data, engine)
+    unpack_time = (time.perf_counter() - start) / len(states)
+    return len(states[0]), pack_time, unpack_time
+
+
+def bench_store(get, put, chats, moves):
+    """Ход в каждом из chats чатов moves раз: get, ход, put. Возвращает мкс на ход"""
+    rng = random.Random(0)
+    for chat_id in range(chats):
+        put(chat_id, BitboardTetrisGame())
+    start = time.perf_counter()
+    for _ in range(moves):
+        for chat_id in range(chats):
+            game = get(chat_id)
+            play_move(game, rng.choice(ACTIONS[:4]))
+            put(chat_id, game)
+    return (time.perf_counter() - start) / (chats * moves) * 1e6
+
+
+def check_restart(directory, format, chats=1000):
+    path = os.path.join(directory, f"restart-{format}.db")
+    sessions = GameSessions(BitboardTetrisGame, SqliteSessionStore(path), format=format)
+    expected = {}
+    for chat_id in range(-chats // 2, chats // 2):
+        game = BitboardTetrisGame()
+        sessions.put(chat_id, game)
+        # Каждый ход записывается сразу, как в GameHandler
+        for _ in range(20):
+            if game.game_over:
+                break
+            play_move(game, random.choice(ACTIONS))
+            sessions.put(chat_id, game)
+        expected[chat_id] = pack_game(game)
+    writes = sessions.get_stats()
+    sessions.close()
+    
+    start = time.perf_counter()
+    sessions = GameSessions(BitboardTetrisGame, SqliteSessionStore(path), format=format)
+    restored = {chat_id: pack_game(sessions.get(chat_id)) for chat_id in expected}
+    elapsed = time.perf_counter() - start
+    stats = sessions.get_stats()
+    sessions.close()
+    if restored != expected:
+        raise AssertionError(f"Игры после перезапуска не совпадают (формат {format})")
+    print(f"✅ {format}: {chats} игр восстановлены из SQLite после перезапуска за {elapsed * 1000:.0f} мс "
+          f"(записей целиком: {writes['saves']}, дописываний: {writes['appends']}, повторов журнала: {stats['replays']})")
+
+
+def traced_bytes(build, count):
+    """Память (байт на элемент), которую занимает результат build()"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used / count
+
+
+def played_games(engine, count, rng):
+    games = []
+    for _ in range(count):
+        game = engine()
+        for _ in range(30):
+            apply_action(game, rng.choice(ACTIONS))
+        games.append(game)
+    return games
+
+
+def abandon(put, count, seed):
+    """count чатов делают по несколько ходов и уходят"""
+    random.seed(seed)
+    rng = random.Random(seed)
+    for chat_id in range(count):
+        game = BitboardTetrisGame()
+        for _ in range(10):
+            apply_action(game, rng.choice(ACTIONS))
+        put(chat_id, game)
+
+
+def bench_memory(count):
+    print(f"\nПамять на сессию ({count} игр):")
+    for name, engine in ENGINES.items():
+        rng = random.Random(1)
+        size = traced_bytes(lambda: played_games(engine, count, rng), count)
+        print(f"{'объект ' + name:>25}: {size:8.0f} байт")
+    
+    session = SessionRenderer(AtlasRenderer())
+    frame = session.render(BitboardTetrisGame())
+    print(f"{'кадр SessionRenderer':>25}: {frame.width * frame.height * len(frame.getbands()):8d} байт (вне tracemalloc)")
+    
+    scenarios = [
+        ("без вытеснения", dict(max_cached=count * 2)),
+        ("вытеснение в упакованный вид", dict(max_cached=count // 20)),
+        ("вытеснение с удалением", dict(max_cached=count // 20, spill=False)),
+    ]
+    expected = {}
+    abandon(lambda chat_id, game: expected.__setitem__(chat_id, pack_game(game)), count, seed=2)
+    for name, options in scenarios:
+        sessions = GameSessions(BitboardTetrisGame, MemorySessionStore(), **options)
+        evicted = []
+        sessions.on_evict = evicted.append
+        size = traced_bytes(lambda: abandon(sessions.put, count, seed=2), count)
+        stats = sessions.get_stats()
+        # Вытесненные игры возвращаются при следующем нажатии
+        checked = evicted[:1000]
+        restored = 0
+        for chat_id in checked:
+            game = sessions.get(chat_id)
+            if game is not None and pack_game(game) == expected[chat_id]:
+                restored += 1
+        print(f"{name:>25}: {size:8.0f} байт, в памяти {stats['cached']}, упаковано {stats['stored']}, "
+              f"вытеснено {stats['evictions']}, восстановлено {restored} из {len(checked)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--moves', type=int, default=20)
+    parser.add_argument('--abandoned', type=int, default=20000)
+    args = parser.parse_args()
+    
+    check_roundtrip(args.games, args.steps)
+    for name, engine in ENGINES.items():
+        size, pack_time, unpack_time = bench_codec(engine)
+        print(f"{name:>9}: состояние {size} байт, упаковка {pack_time * 1e6:5.1f} мкс, распаковка {unpack_time * 1e6:5.1f} мкс")
+    
+    directory = tempfile.mkdtemp(prefix="tetris-sessions-")
+    try:
+        for format in ("state", "log"):
+            check_restart(directory, format)
+        stores = [
+            ("memory + кэш", lambda: GameSessions(BitboardTetrisGame, MemorySessionStore())),
+            ("memory, без кэша", lambda: GameSessions(BitboardTetrisGame, MemorySessionStore(), cache=False)),
+            ("sqlite, без кэша", lambda: GameSessions(BitboardTetrisGame, SqliteSessionStore(os.path.join(directory, "a.db")), cache=False)),
+            ("sqlite + кэш", lambda: GameSessions(BitboardTetrisGame, SqliteSessionStore(os.path.join(directory, "b.db")))),
+            ("sqlite + кэш, журнал", lambda: GameSessions(BitboardTetrisGame, SqliteSessionStore(os.path.join(directory, "c.db")),
+                                                          format="log")),
+        ]
+        print(f"\nХод (get, действие, put) в {args.chats} чатах по {args.moves} раз:")
+        # Прежнее поведение: игры только в словаре процесса
+        games = {}
+        elapsed = bench_store(games.get, games.__setitem__, args.chats, args.moves)
+        print(f"{'dict':>21}: {elapsed:7.1f} мкс на ход")
+        for name, factory in stores:
+            sessions = factory()
+            elapsed = bench_store(sessions.get, sessions.put, args.chats, args.moves)
+            sessions.close()
+            print(f"{name:>21}: {elapsed:7.1f} мкс на ход")
+    finally:
+        shutil.rmtree(directory)
+    
+    bench_memory(args.abandoned)
+
+
+if __name__ == '__main__':
+    main()
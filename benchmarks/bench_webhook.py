@@ -0,0 +1,120 @@
+"""Задержка от нажатия кнопки до изменения сообщения: long polling против webhook.
+
+Бот запускается отдельным процессом (main.py) против локального стенда
+Bot API (benchmarks/fake_bot_api.py). Несколько чатов начинают игру и
+нажимают кнопки с паузами, как люди; для каждого нажатия измеряется время
+от появления апдейта на стенде до запроса бота на изменение сообщения.
+Задержка сети в одну сторону задается --latency.
+
+    python -m benchmarks.bench_webhook [--chats 10] [--presses 20] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import FakeBotApi, GAME_ACTIONS, make_press
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def start_bot(mode, api, directory):
+    # Сравнивается доставка апдейтов, поэтому лимиты исходящих запросов сняты
+    env = dict(os.environ, BOT_TOKEN="123456:TEST", BOT_API_URL=api.url, SESSION_BACKEND="memory",
+               OUTBOUND_GLOBAL_RATE="0", OUTBOUND_CHAT_RATE="0")
+    env.pop('WEBHOOK_URL', None)
+    if mode == "webhook":
+        port = free_port()
+        env.update(WEBHOOK_URL=f"http://127.0.0.1:{port}/hook", WEBHOOK_LISTEN="127.0.0.1", PORT=str(port))
+    log = open(os.path.join(directory, f"{mode}.log"), 'w')
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, MAIN, cwd=directory, env=env, stdout=log, stderr=log
+    )
+    await asyncio.wait_for(api.connected.wait(), 60)
+    return process
+
+
+async def stop_bot(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(process.wait(), 30)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def run(mode, args, directory):
+    api = FakeBotApi(args.latency)
+    await api.start()
+    process = await start_bot(mode, api, directory)
+    loop = asyncio.get_running_loop()
+    waiters = {}
+    
+    def on_message(method, chat_id):
+        future = waiters.pop(chat_id, None)
+        if future is not None and not future.done():
+            future.set_result(method)
+    api.on_message = on_message
+    
+    async def press(chat_id, data):
+        waiters[chat_id] = loop.create_future()
+        future = waiters[chat_id]
+        await api.deliver(make_press(chat_id, data))
+        await asyncio.wait_for(future, 30)
+    
+    latencies = []
+    
+    async def player(chat_id):
+        rng = random.Random(chat_id)
+        await press(chat_id, "play_game")
+        for _ in range(args.presses):
+            await asyncio.sleep(rng.uniform(0, 2 * args.think))
+            start = time.perf_counter()
+            await press(chat_id, rng.choice(GAME_ACTIONS))
+            latencies.append(time.perf_counter() - start)
+    
+    try:
+        await asyncio.gather(*(player(chat_id) for chat_id in range(1, args.chats + 1)))
+    finally:
+        await stop_bot(process)
+        await api.stop()
+    return latencies, api
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=10)
+    parser.add_argument('--presses', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help="задержка сети в одну сторону, с")
+    parser.add_argument('--think', type=float, default=0.3, help="средняя пауза между нажатиями, с")
+    args = parser.parse_args()
+    
+    print(f"{args.chats} чатов по {args.presses} нажатий, задержка сети {args.latency * 1000:.0f} мс в одну сторону")
+    with tempfile.TemporaryDirectory(prefix="tetris-webhook-") as directory:
+        for mode in ("polling", "webhook"):
+            latencies, api = asyncio.run(run(mode, args, directory))
+            ms = [value * 1000 for value in latencies]
+            print(f"{mode:>8}: среднее {statistics.mean(ms):6.1f} мс, p50 {percentile(ms, 0.5):6.1f}, "
+                  f"p90 {percentile(ms, 0.9):6.1f}, p99 {percentile(ms, 0.99):6.1f}, макс {max(ms):6.1f} мс; "
+                  f"getUpdates: {api.calls['getUpdates']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import random
+import time
+
+from config import COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.tetris import TetrisGame
+from game.snapshot import FrameState
+
+ACTIONS = ["left", "right", "down", "rotate", "drop"]
+
+
+def apply_action(game, action):
+    """Применяет действие так же, как GameHandler"""
+    if action == "left":
+        game.move(-1, 0)
+    elif action == "right":
+        game.move(1, 0)
+    elif action == "down":
+        game.move(0, 1)
+    elif action == "rotate":
+        game.rotate()
+    elif action == "drop":
+        game.drop()
+
+
+def set_cell(game, x, y, color_idx):
+    """Ставит блок на поле любого из движков"""
+    if hasattr(game, 'rows'):
+        game.rows[y] |= 1 << x
+    game.colors[y * BOARD_WIDTH + x] = color_idx + 1
+    game.heights[x] = min(game.heights[x], y)
+
+
+def fill_garbage(game, rng, rows=None, with_gap=True):
+    """Заполняет нижние строки "мусором" с одной дыркой, чтобы партии доходили до сжигания линий"""
+    if rows is None:
+        rows = rng.randint(0, 8)
+    for y in range(BOARD_HEIGHT - rows, BOARD_HEIGHT):
+        gap = rng.randrange(BOARD_WIDTH) if with_gap else None
+        for x in range(BOARD_WIDTH):
+            if x != gap:
+                set_cell(game, x, y, rng.randrange(len(COLORS)))
+
+
+def generate_states(count, seed=42, game_factory=TetrisGame):
+    """Проигрывает случайные партии и возвращает снимки игр после каждого хода"""
+    random.seed(seed)
+    states = []
+    game = game_factory()
+    while len(states) < count:
+        if game.game_over:
+            game = game_factory()
+        apply_action(game, random.choice(ACTIONS))
+        states.append(FrameState(
+            [row[:] for row in game.board],
+            game.shape_idx, game.rotation,
+            game.piece_x, game.piece_y, game.game_over,
+            game._landing_y() if not game.game_over else None
+        ))
+    return states
+
+
+def measure(func, items, repeat=3):
+    """Возвращает лучшее время (в секундах) прохода func по items"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
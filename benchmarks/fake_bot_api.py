@@ -0,0 +1,319 @@
+"""Локальный стенд Bot API для проверки бота без Telegram.
+
+Стенд отвечает на методы, которые вызывает бот, и доставляет апдейты как
+Telegram: через getUpdates (long polling) или POST-запросом на адрес из
+setWebhook. При ответе 503 от webhook доставка повторяется. Задержка сети
+latency добавляется к каждому запросу бота в обе стороны и к каждой
+доставке апдейта. С chat_limit/global_limit стенд, как Telegram, отвечает
+429 с retry_after на сообщения сверх лимита.
+
+Проигрывание записанных апдейтов (файл WEBHOOK_RECORD_FILE или --generate):
+
+    python -m benchmarks.fake_bot_api --port 8081 --generate updates.jsonl
+    python -m benchmarks.fake_bot_api --port 8081 --replay updates.jsonl
+    BOT_TOKEN=1:test BOT_API_URL=http://127.0.0.1:8081 WEBHOOK_URL=http://127.0.0.1:8080/hook python main.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+from handlers.outbound import TokenBucket
+from handlers.webhook import read_request, write_response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Tetris", "username": "tetris_test_bot"}
+GAME_ACTIONS = ["left", "right", "rotate", "down"]
+# Методы, которые отправляют или меняют сообщение в чате
+MESSAGE_METHODS = {"sendMessage", "sendPhoto", "editMessageText", "editMessageMedia",
+                   "editMessageCaption", "editMessageReplyMarkup"}
+
+
+def make_press(chat_id, data, message_id=1):
+    """Апдейт с нажатием кнопки data под сообщением message_id"""
+    return {
+        "callback_query": {
+            "id": f"{chat_id}-{time.monotonic_ns()}",
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"Игрок {chat_id}", "username": f"player{chat_id}"},
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "Тетрис"
+            }
+        }
+    }
+
+
+def parse_params(headers, body):
+    """Параметры метода из тела запроса: форма, JSON или multipart (файлы пропускаются)"""
+    content_type = headers.get('content-type', '')
+    if content_type.startswith('application/json'):
+        return json.loads(body or b"{}")
+    if content_type.startswith('multipart/form-data'):
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        params = {}
+        for part in body.split(b"--" + boundary):
+            head, _, value = part.partition(b"\r\n\r\n")
+            match = re.search(rb'name="([^"]+)"', head)
+            if match and b'filename=' not in head:
+                params[match.group(1).decode()] = value[:-2].decode('utf-8', 'replace')
+        return params
+    return dict(parse_qsl(body.decode('utf-8')))
+
+
+async def read_response(reader):
+    """Читает HTTP-ответ и возвращает код"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    match = re.search(rb'(?i)content-length:\s*(\d+)', head)
+    if match:
+        await reader.readexactly(int(match.group(1)))
+    return status
+
+
+class FakeBotApi:
+    """HTTP-сервер, который изображает api.telegram.org для одного бота"""
+    
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, webhook_connections=40,
+                 chat_limit=0, chat_burst=3, global_limit=0):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.server = None
+        self.updates = []
+        self.updates_changed = asyncio.Event()
+        self.next_update_id = 1
+        self.next_message_id = 1000
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.webhook_slots = asyncio.Semaphore(webhook_connections)
+        self.webhook_pool = []
+        self.connected = asyncio.Event()
+        # Открытые соединения бота: задача -> writer
+        self.handlers = {}
+        # Вызывается для каждого сообщения, которое бот отправил или изменил: (метод, chat_id)
+        self.on_message = None
+        # Лимиты сообщений в секунду, как у Telegram; 0 - без лимита
+        self.chat_limit = chat_limit
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.global_bucket = TokenBucket(global_limit, global_limit)
+        
+        # Статистика
+        self.calls = Counter()
+        self.flood_errors = Counter()
+        self.webhook_statuses = Counter()
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+    
+    async def stop(self):
+        self.server.close()
+        for _, writer in self.webhook_pool:
+            writer.close()
+        self.webhook_pool = []
+        # Отпускаем висящий getUpdates, закрываем соединения бота и ждем их задачи
+        self.updates_changed.set()
+        for writer in self.handlers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+    
+    async def _serve_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers[task] = writer
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                _, path, headers, body = request
+                await asyncio.sleep(self.latency)
+                method = path.rsplit('/', 1)[-1]
+                self.calls[method] += 1
+                params = parse_params(headers, body)
+                retry_after = self._flood_wait(method, params)
+                if retry_after:
+                    self.flood_errors[method] += 1
+                    status, response = 429, {"ok": False, "error_code": 429,
+                                             "description": f"Too Many Requests: retry after {retry_after}",
+                                             "parameters": {"retry_after": retry_after}}
+                else:
+                    status, response = 200, {"ok": True, "result": await self._call(method, params)}
+                await asyncio.sleep(self.latency)
+                write_response(writer, status, json.dumps(response).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.handlers.pop(task, None)
+            writer.close()
+    
+    def _flood_wait(self, method, params):
+        """Сколько секунд (целых, как у Telegram) ждать, если сообщение сверх лимита; 0 - можно"""
+        if method not in MESSAGE_METHODS:
+            return 0
+        now = time.monotonic()
+        chat_id = int(params.get('chat_id', 0))
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_limit, self.chat_burst, now)
+        ready_at = max(bucket.ready_at(now), self.global_bucket.ready_at(now))
+        if ready_at > now:
+            return max(1, math.ceil(ready_at - now))
+        bucket.take(now)
+        self.global_bucket.take(now)
+        return 0
+    
+    async def _call(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            self.connected.set()
+            return await self._get_updates(int(params.get('offset', 0)), float(params.get('timeout', 0)))
+        if method == "setWebhook":
+            self.webhook_url = params['url']
+            self.webhook_secret = params.get('secret_token')
+            self.connected.set()
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return True
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get('chat_id', 0))
+            if method.startswith("send"):
+                self.next_message_id += 1
+                message_id = self.next_message_id
+            else:
+                message_id = int(params.get('message_id', 0))
+            if self.on_message is not None:
+                self.on_message(method, chat_id)
+            return {"message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": "Тетрис"}
+        return True
+    
+    async def _get_updates(self, offset, timeout):
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout:
+            self.updates_changed.clear()
+            try:
+                await asyncio.wait_for(self.updates_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(self.updates)
+    
+    async def deliver(self, update):
+        """Доставляет апдейт боту тем способом, который он выбрал"""
+        update = dict(update, update_id=self.next_update_id)
+        self.next_update_id += 1
+        await asyncio.sleep(self.latency)
+        if self.webhook_url is None:
+            self.updates.append(update)
+            self.updates_changed.set()
+            return
+        body = json.dumps(update).encode()
+        while True:
+            status = await self._post_webhook(body)
+            self.webhook_statuses[status] += 1
+            if status != 503:
+                return
+            # Очередь бота заполнена - Telegram повторяет доставку позже
+            await asyncio.sleep(0.1)
+    
+    async def _post_webhook(self, body):
+        url = urlsplit(self.webhook_url)
+        async with self.webhook_slots:
+            if self.webhook_pool:
+                reader, writer = self.webhook_pool.pop()
+            else:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            secret = f"X-Telegram-Bot-Api-Secret-Token: {self.webhook_secret}\r\n" if self.webhook_secret else ""
+            writer.write((
+                f"POST {url.path or '/'} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+                f"Content-Type: application/json\r\n{secret}Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body)
+            await writer.drain()
+            status = await read_response(reader)
+            self.webhook_pool.append((reader, writer))
+            return status
+
+
+def generate(path, chats, presses, seed=1):
+    """Пишет файл апдейтов: каждый чат начинает игру и нажимает кнопки"""
+    rng = random.Random(seed)
+    streams = {chat_id: ["play_game"] + [rng.choice(GAME_ACTIONS) for _ in range(presses)]
+               for chat_id in range(1, chats + 1)}
+    with open(path, 'w', encoding='utf-8') as f:
+        while streams:
+            chat_id = rng.choice(list(streams))
+            f.write(json.dumps(make_press(chat_id, streams[chat_id].pop(0)), ensure_ascii=False) + "\n")
+            if not streams[chat_id]:
+                del streams[chat_id]
+
+
+async def replay(api, path, rate):
+    """Дожидается бота и доставляет апдейты из файла по порядку"""
+    with open(path, encoding='utf-8') as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    print(f"Стенд Bot API: {api.url}, ждем бота...")
+    await api.connected.wait()
+    mode = "webhook" if api.webhook_url else "getUpdates"
+    start = time.perf_counter()
+    for update in updates:
+        await api.deliver(update)
+        if rate:
+            await asyncio.sleep(1 / rate)
+    elapsed = time.perf_counter() - start
+    # Даем боту доработать очередь
+    await asyncio.sleep(2)
+    print(f"Доставлено {len(updates)} апдейтов через {mode} за {elapsed:.2f} с")
+    print(f"Вызовы бота: {dict(api.calls)}")
+    if api.flood_errors:
+        print(f"Ответы 429: {dict(api.flood_errors)}")
+    if api.webhook_statuses:
+        print(f"Ответы webhook: {dict(api.webhook_statuses)}")
+
+
+async def run(args):
+    api = FakeBotApi(args.latency, port=args.port, webhook_connections=1,
+                     chat_limit=args.chat_limit, global_limit=args.global_limit)
+    await api.start()
+    try:
+        await replay(api, args.replay, args.rate)
+    finally:
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--replay', metavar='FILE', help="файл апдейтов, по одному JSON в строке")
+    parser.add_argument('--rate', type=float, default=0, help="апдейтов в секунду (0 - без пауз)")
+    parser.add_argument('--chat-limit', type=float, default=0, help="сообщений в секунду на чат (0 - без лимита)")
+    parser.add_argument('--global-limit', type=float, default=0, help="сообщений в секунду всего (0 - без лимита)")
+    parser.add_argument('--generate', metavar='FILE', help="записать файл апдейтов и выйти")
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--presses', type=int, default=30)
+    args = parser.parse_args()
+    if args.generate:
+        generate(args.generate, args.chats, args.presses)
+        return
+    if not args.replay:
+        parser.error("нужен --replay или --generate")
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Повтор журналов партий: проверка очков из архива и скорость повтора.
+
+Каждая запись архива законченных партий (database/game_archive.py),
+включая прежние файлы ARCHIVE.1, ARCHIVE.2 и дальше, перепроигрывается
+с зерна; партии, очки которых не сходятся с повтором, выводятся как
+подозрительные. С --engine both журнал повторяется обоими
+движками и их итоговые состояния сравниваются - регрессионная проверка
+движков на настоящих партиях.
+
+Без файла архива играются --games случайных партий, они пишутся во
+временный архив с маленьким размером файла (проверяется и переход на
+новый файл), у части очки подделываются, и проверяется, что повтор
+находит ровно подделанные. Перед последней партией к архиву дописывается
+оборванная запись, как после сбоя: она должна быть отрезана.
+
+    python -m benchmarks.replay_games [ARCHIVE] [--engine bitboard|list|both] [--games 2000]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+from game.tetris import TetrisGame
+from game.bitboard import BitboardTetrisGame
+from game.state import pack_game
+from game.replay import ACTIONS, play, pack_log, unpack_log, replay
+from database.game_archive import GameArchive, archive_files, read_archive
+
+ENGINES = {'list': TetrisGame, 'bitboard': BitboardTetrisGame}
+# Каждая FORGE_EVERY-я случайная партия получает лишние очки
+FORGE_EVERY = 50
+# Размер файла временного архива
+TEST_ARCHIVE_BYTES = 64 * 1024
+
+
+def random_games(count, seed=0, max_moves=3000):
+    """Случайные партии до конца игры: (id игрока, очки, журнал)"""
+    random.seed(seed)
+    rng = random.Random(seed)
+    # Сброс реже остальных ходов, чтобы партии были подлиннее
+    weights = [3, 3, 2, 3, 1]
+    for user_id in range(count):
+        game = BitboardTetrisGame()
+        while not game.game_over and len(game.moves) < max_moves:
+            play(game, rng.choices(ACTIONS, weights)[0])
+        yield user_id, game.score, pack_log(game)
+
+
+def verify(records, engines):
+    """Повторяет журналы; возвращает подозрительные партии, число партий, ходов и время"""
+    suspicious = []
+    games = moves = 0
+    start = time.perf_counter()
+    for user_id, score, log in records:
+        games += 1
+        try:
+            seed, codes = unpack_log(log)
+            results = [replay(seed, codes, engine) for engine in engines]
+        except (ValueError, IndexError) as e:
+            suspicious.append((user_id, score, f"журнал не повторяется: {e}"))
+            continue
+        moves += len(codes)
+        replayed = results[0].score
+        if len(results) > 1 and len({pack_game(game) for game in results}) > 1:
+            raise AssertionError(f"Движки разошлись на партии игрока {user_id}, зерно {seed}")
+        if replayed != score:
+            suspicious.append((user_id, score, f"повтор дает {replayed}"))
+    return suspicious, games, moves, time.perf_counter() - start
+
+
+def report(suspicious, games, moves, elapsed):
+    print(f"Повторено {games} партий ({moves} ходов) за {elapsed:.2f} с: "
+          f"{games / elapsed:.0f} партий/с, {moves / elapsed / 1000:.0f} тыс. ходов/с")
+    for user_id, score, reason in suspicious[:20]:
+        print(f"⚠️ игрок {user_id}: заявлено {score}, {reason}")
+    if len(suspicious) > 20:
+        print(f"... и еще {len(suspicious) - 20}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('archive', nargs='?', help="файл архива партий (GAME_ARCHIVE_FILE)")
+    parser.add_argument('--engine', choices=['bitboard', 'list', 'both'], default='bitboard')
+    parser.add_argument('--games', type=int, default=2000)
+    args = parser.parse_args()
+    engines = list(ENGINES.values()) if args.engine == 'both' else [ENGINES[args.engine]]
+    
+    if args.archive:
+        records = itertools.chain.from_iterable(map(read_archive, archive_files(args.archive)))
+        suspicious, games, moves, elapsed = verify(records, engines)
+        report(suspicious, games, moves, elapsed)
+        sys.exit(1 if suspicious else 0)
+    
+    directory = tempfile.mkdtemp(prefix="tetris-replay-")
+    path = os.path.join(directory, "games.log")
+    try:
+        archive = GameArchive(path, max_bytes=TEST_ARCHIVE_BYTES, backups=args.games)
+        forged = set()
+        for user_id, score, log in random_games(args.games):
+            if user_id % FORGE_EVERY == 0:
+                score += 100
+                forged.add(user_id)
+            if user_id == args.games - 1:
+                # Сбой посреди записи, затем перезапуск
+                archive.close()
+                with open(path, 'ab') as f:
+                    f.write(log[:len(log) // 2])
+                archive = GameArchive(path, max_bytes=TEST_ARCHIVE_BYTES, backups=args.games)
+            archive.append(user_id, score, log)
+        archive.close()
+        files = archive_files(path)
+        size = sum(os.path.getsize(name) for name in files)
+        print(f"Архив: {args.games} партий в {len(files)} файлах, {size / args.games:.0f} байт на партию")
+        
+        records = list(itertools.chain.from_iterable(map(read_archive, files)))
+        if [user_id for user_id, _, _ in records] != list(range(args.games)):
+            raise AssertionError(f"В архиве {len(records)} партий из {args.games} или они не по порядку")
+        suspicious, games, moves, elapsed = verify(records, engines)
+        report([], games, moves, elapsed)
+        found = {user_id for user_id, _, _ in suspicious}
+        if found != forged:
+            raise AssertionError(f"Найдено {len(found)} подозрительных партий, подделано {len(forged)}")
+        print(f"✅ найдены все {len(forged)} партий с подделанными очками, других нет")
+    finally:
+        for name in archive_files(path):
+            os.remove(name)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Сводный бенчмарк движков и рендеринга без Telegram.
+
+Партии играются по фиксированному seed и сценарию, результат выводится
+в JSON, чтобы сравнивать прогоны и ловить регрессии перед деплоем.
+
+    python -m benchmarks.suite [--output FILE] [--compare BASELINE.json] [--tolerance 0.25]
+
+Результат пишется в файл, а не в stdout: config печатает сообщение при импорте.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from game.tetris import TetrisGame
+from game.bitboard import BitboardTetrisGame
+from game.renderer import GameRenderer, AtlasRenderer, SessionRenderer
+from game.encoders import ENCODERS
+
+from benchmarks.common import ACTIONS, apply_action, fill_garbage, generate_states
+
+ENGINES = {'list': TetrisGame, 'bitboard': BitboardTetrisGame}
+SEED = 2024
+
+
+REPEAT = 5
+
+
+def ops_per_second(func, make_items, repeat=REPEAT):
+    """Выполняет func для каждого элемента из make_items() и возвращает лучший результат в операциях в секунду"""
+    best = 0
+    for _ in range(repeat):
+        items = make_items()
+        gc.collect()
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = max(best, len(items) / (time.perf_counter() - start))
+    return best
+
+
+def new_games(engine, count, prepare=None):
+    """Создает count игр с одинаковой последовательностью фигур"""
+    random.seed(SEED)
+    rng = random.Random(SEED)
+    games = []
+    for _ in range(count):
+        game = engine()
+        if prepare:
+            prepare(game, rng)
+        games.append(game)
+    return games
+
+
+def bench_engine(engine, count=20000):
+    results = {}
+    results['move_per_sec'] = ops_per_second(lambda g: g.move(1, 0), lambda: new_games(engine, count))
+    results['rotate_per_sec'] = ops_per_second(lambda g: g.rotate(), lambda: new_games(engine, count))
+    results['drop_per_sec'] = ops_per_second(lambda g: g.drop(), lambda: new_games(engine, count // 4))
+    
+    # Фиксация фигуры, уже стоящей на дне
+    def land(game, rng):
+        while game.move(0, 1):
+            pass
+    results['lock_piece_per_sec'] = ops_per_second(lambda g: g.lock_piece(), lambda: new_games(engine, count // 4, land))
+    
+    # Сжигание четырех заполненных строк
+    def fill(game, rng):
+        fill_garbage(game, rng, rows=4, with_gap=False)
+    results['clear_lines_per_sec'] = ops_per_second(lambda g: g.clear_lines(), lambda: new_games(engine, count // 4, fill))
+    
+    # Целые партии по сценарию до окончания игры
+    random.seed(SEED)
+    script = random.Random(SEED)
+    games = actions = 0
+    start = time.perf_counter()
+    while games < 200:
+        game = engine()
+        while not game.game_over:
+            apply_action(game, script.choice(ACTIONS))
+            actions += 1
+        games += 1
+    elapsed = time.perf_counter() - start
+    results['games_per_sec'] = games / elapsed
+    results['actions_per_sec'] = actions / elapsed
+    
+    results['bytes_per_session'] = session_memory(engine)
+    return results
+
+
+def session_memory(engine, count=2000):
+    """Средний объем памяти одной игры (с уже упавшими фигурами)"""
+    random.seed(SEED)
+    script = random.Random(SEED)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = []
+    for _ in range(count):
+        game = engine()
+        for _ in range(10):
+            game.drop()
+            game.move(script.choice((-1, 1)), 0)
+        games.append(game)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def bench_render(frames=300):
+    states = generate_states(frames, seed=SEED)
+    results = {}
+    atlas = AtlasRenderer()
+    for name, renderer in (('draw', GameRenderer()), ('atlas', atlas)):
+        results[f'{name}_frames_per_sec'] = ops_per_second(renderer.create_game_image, lambda: states)
+    # Новая сессия на каждый повтор, чтобы первый кадр рисовался целиком
+    session = [None]
+    def session_states():
+        session[0] = SessionRenderer(atlas)
+        return states
+    results['session_frames_per_sec'] = ops_per_second(lambda s: session[0].render(s), session_states)
+    
+    images = [atlas.create_game_image(state) for state in states]
+    for name, encode in ENCODERS.items():
+        results[f'{name}_encode_ms'] = 1000 / ops_per_second(encode, lambda: images)
+        results[f'{name}_bytes_per_frame'] = sum(len(encode(img)) for img in images) / len(images)
+    return results
+
+
+def run():
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': SEED,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'engines': {name: bench_engine(engine) for name, engine in ENGINES.items()},
+        'render': bench_render()
+    }
+
+
+# Метрики, для которых меньше - лучше
+LOWER_IS_BETTER = ('_ms', '_bytes_per_frame', 'bytes_per_session')
+
+
+def compare(baseline, current, tolerance):
+    """Возвращает список метрик, ухудшившихся больше чем на tolerance"""
+    regressions = []
+    for section in ('engines', 'render'):
+        old_section, new_section = baseline.get(section, {}), current[section]
+        for key, new_value in new_section.items():
+            pairs = new_value.items() if isinstance(new_value, dict) else [(None, new_value)]
+            old_values = old_section.get(key, {})
+            for metric, value in pairs:
+                old = old_values.get(metric) if metric else old_values
+                if not isinstance(old, (int, float)) or not old:
+                    continue
+                name = f"{section}.{key}" + (f".{metric}" if metric else "")
+                change = (value - old) / old
+                if name.endswith(LOWER_IS_BETTER):
+                    change = -change
+                if change < -tolerance:
+                    regressions.append(f"{name}: {old:.1f} -> {value:.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='benchmark_results.json', help="файл для результатов")
+    parser.add_argument('--compare', help="JSON предыдущего прогона для поиска регрессий")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="допустимое ухудшение (доля)")
+    args = parser.parse_args()
+    
+    results = run()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"📄 Результаты записаны в {args.output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for line in regressions:
+            print(f"⚠️ Регрессия: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
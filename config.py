@@ -1,44 +1,173 @@
-import os
-
-# Загружаем .env файл для локальной разработки
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    print("✅ .env файл загружен для локальной разработки")
-except ImportError:
-    print("ℹ️  python-dotenv не установлен, используем системные environment variables")
-
-# === СЕКРЕТЫ ИЗ ENVIRONMENT VARIABLES ===
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-
-# === НАСТРОЙКИ ИГРЫ (статичные) ===
-BOARD_WIDTH = 10
-BOARD_HEIGHT = 20
-CELL_SIZE = 25
-BORDER = 5
-
-# ... остальные настройки
-
-# Настройки базы данных
-RECORDS_FILE = "tetris_records.json"
-
-# Фигуры Тетриса
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[1, 1, 1], [0, 1, 0]],  # T
-    [[1, 1, 1], [1, 0, 0]],  # L
-    [[1, 1, 1], [0, 0, 1]],  # J
-    [[0, 1, 1], [1, 1, 0]],  # S
-    [[1, 1, 0], [0, 1, 1]]   # Z
-]
-
-COLORS = [
-    (0, 255, 255),    # Cyan
-    (255, 255, 0),    # Yellow
-    (128, 0, 128),    # Purple
-    (255, 165, 0),    # Orange
-    (0, 0, 255),      # Blue
-    (0, 255, 0),      # Green
-    (255, 0, 0)       # Red
-]
\ No newline at end of file
+import os
+from urllib.parse import urlparse
+
+# Загружаем .env файл для локальной разработки
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+    print("✅ .env файл загружен для локальной разработки")
+except ImportError:
+    print("ℹ️  python-dotenv не установлен, используем системные environment variables")
+
+# === СЕКРЕТЫ ИЗ ENVIRONMENT VARIABLES ===
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+# Секрет, который Telegram передает в заголовке каждого запроса к webhook
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+# Telegram id администраторов через запятую: им доступна команда /stats
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+
+# === НАСТРОЙКИ ИГРЫ (статичные) ===
+BOARD_WIDTH = 10
+BOARD_HEIGHT = 20
+CELL_SIZE = 25
+BORDER = 5
+
+# ... остальные настройки
+
+# Игровой движок: "bitboard" (по умолчанию) - поле на битовых масках;
+# "list" - эталонный TetrisGame на списках, запасной вариант для сверки
+GAME_ENGINE = "bitboard"
+
+# Режим отрисовки: "atlas" - сборка кадра из готовых плиток, "draw" - прямое рисование
+RENDER_MODE = "atlas"
+
+# Перерисовывать только изменившиеся клетки (отдельный кадр на каждую игру).
+# Выключено: в benchmarks/bench_renderer.py это медленнее AtlasRenderer, который
+# рисует кадр целиком, а кадр сессии держит в памяти полный RGB-кадр на чат
+INCREMENTAL_RENDER = False
+
+# Отображение поля по умолчанию: "image" - картинка, "text" - эмодзи в тексте сообщения
+DISPLAY_MODE = "image"
+
+# Рисовать тень фигуры в месте ее приземления
+SHOW_GHOST = True
+
+# Где рисовать кадры: "thread" - пул потоков, "process" - пул процессов, "inline" - в цикле событий.
+# На одном ядре пул только добавляет накладные расходы, поэтому там по умолчанию "inline".
+RENDER_EXECUTOR = os.getenv('RENDER_EXECUTOR', 'thread' if (os.cpu_count() or 1) > 1 else 'inline')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Формат кадров: "png", "png_palette" (PNG с палитрой), "webp" или "jpeg"
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'png_palette')
+PNG_COMPRESS_LEVEL = 6
+WEBP_QUALITY = 80
+WEBP_LOSSLESS = True
+JPEG_QUALITY = 85
+
+# Сколько апдейтов обрабатывается одновременно (апдейты одного чата - всегда по очереди)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 64))
+
+# Получение апдейтов: без WEBHOOK_URL - long polling, с ним - webhook на встроенном
+# HTTP-сервере. WEBHOOK_URL - публичный HTTPS-адрес, который вызывает Telegram
+# (TLS снимает прокси или балансировщик перед ботом)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+# Render.com передает порт в PORT
+WEBHOOK_PORT = int(os.getenv('PORT', 8080))
+WEBHOOK_PATH = (urlparse(WEBHOOK_URL).path or '/') if WEBHOOK_URL else '/'
+# Сколько принятых webhook апдейтов может ждать в очереди и обрабатываться
+# (одновременно - не больше CONCURRENT_UPDATES); сверх этого Telegram получает
+# 503 и повторит доставку позже
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+# Сколько соединений Telegram открывает к webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = 40
+# Файл, куда дописываются принятые апдейты (для локального воспроизведения)
+WEBHOOK_RECORD_FILE = os.getenv('WEBHOOK_RECORD_FILE')
+# Свой сервер Bot API вместо api.telegram.org (или локальный стенд из benchmarks/fake_bot_api.py)
+BOT_API_URL = os.getenv('BOT_API_URL')
+
+# Исходящие запросы к Bot API идут через планировщик с лимитами Telegram: всего не
+# больше OUTBOUND_GLOBAL_RATE в секунду, в один чат - OUTBOUND_CHAT_RATE (в группу -
+# OUTBOUND_GROUP_RATE) и не больше OUTBOUND_CHAT_BURST запросов подряд. 0 - без лимита
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 1))
+OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', 20 / 60))
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 3))
+# Сколько раз повторять запрос после ответа 429 (Telegram сообщает, сколько ждать)
+OUTBOUND_MAX_RETRIES = 3
+
+# Метрики в формате Prometheus: GET /metrics на этом порту (без METRICS_PORT - выключено).
+# Порт внутренний: наружу, в отличие от webhook, его открывать не нужно
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+# Профилирование медленных нажатий: доля нажатий, которые снимаются cProfile (0 - выключено);
+# профиль нажатия дольше PROFILE_SLOW_MS печатается и сохраняется в PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 500))
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+# Лимит памяти кэша готовых кадров (байт)
+FRAME_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Сколько готовых текстов экранов (таблица рекордов, статистика) хранить
+RESPONSE_CACHE_MAX_ENTRIES = 10000
+
+# Настройки базы данных
+RECORDS_FILE = "tetris_records.json"
+# Хранилище рекордов: "sqlite" (WAL, перенос из RECORDS_FILE при первом запуске),
+# "journal" (JSON + журнал изменений), "snapshot" (двоичный снимок в mmap + журнал) или "json"
+RECORDS_BACKEND = os.getenv('RECORDS_BACKEND', 'sqlite')
+RECORDS_DB_FILE = "tetris_records.db"
+RECORDS_SNAPSHOT_FILE = "tetris_records.snap"
+
+# Таблицы рекордов за период: "day" (сутки) и "week" (неделя ISO)
+LEADERBOARD_WINDOWS = ("day", "week")
+# Сколько лучших игроков хранится в таблице за период
+WINDOW_TOP_SIZE = 10
+# Таблицы за текущие периоды сохраняются сюда при остановке
+WINDOWS_FILE = "tetris_windows.json"
+# Журналы законченных партий (зерно, ходы, заявленные очки) для офлайн-проверки
+# рекордов: python -m benchmarks.replay_games; пустая строка - не сохранять
+GAME_ARCHIVE_FILE = os.getenv('GAME_ARCHIVE_FILE', 'tetris_games.log')
+# Размер файла архива, после которого он переименовывается в .1 (прежние - в .2 и
+# дальше), и сколько таких прежних файлов хранить
+GAME_ARCHIVE_MAX_BYTES = int(os.getenv('GAME_ARCHIVE_MAX_BYTES', 64 * 1024 * 1024))
+GAME_ARCHIVE_BACKUPS = int(os.getenv('GAME_ARCHIVE_BACKUPS', 5))
+
+# Хранилище активных игр: "sqlite" (игры переживают перезапуск) или "memory"
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_DB_FILE = "tetris_sessions.db"
+# Держать игры в памяти и читать хранилище только при первом обращении к чату
+SESSION_CACHE = True
+# Игры без нажатий дольше SESSION_TTL секунд и самые давние сверх SESSION_MAX_CACHED
+# убираются из памяти вместе с кадром сессии
+SESSION_TTL = int(os.getenv('SESSION_TTL', 30 * 60))
+SESSION_MAX_CACHED = int(os.getenv('SESSION_MAX_CACHED', 10000))
+# Кадр сессии (INCREMENTAL_RENDER) - полный RGB-кадр в сотни КБ, поэтому их держится
+# намного меньше, чем игр: не больше SESSION_MAX_RENDERERS и не дольше
+# SESSION_RENDERER_TTL секунд без нового кадра; потом кадр рисуется целиком
+SESSION_MAX_RENDERERS = int(os.getenv('SESSION_MAX_RENDERERS', 200))
+SESSION_RENDERER_TTL = int(os.getenv('SESSION_RENDERER_TTL', 60))
+# Убранная игра остается в хранилище в упакованном виде (124 байта и байт на ход)
+# и продолжается со следующего нажатия; False - игра удаляется
+SESSION_SPILL = True
+# Что хранится для игры: "state" - поле и журнал ходов, переписываются каждым ходом;
+# "log" - только зерно и журнал: ход дописывает один байт, а после перезапуска
+# партия восстанавливается повтором ходов
+SESSION_FORMAT = os.getenv('SESSION_FORMAT', 'state')
+
+# Журнал рекордов: fsync после каждой записи ("entry") или при сворачивании ("batch")
+JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', 'batch')
+# Журнал сворачивается в снимок после стольких записей или по таймеру (секунды)
+JOURNAL_COMPACT_ENTRIES = 1000
+JOURNAL_COMPACT_INTERVAL = 60
+
+# Фигуры Тетриса
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[0, 1, 1], [1, 1, 0]],  # S
+    [[1, 1, 0], [0, 1, 1]]   # Z
+]
+
+COLORS = [
+    (0, 255, 255),    # Cyan
+    (255, 255, 0),    # Yellow
+    (128, 0, 128),    # Purple
+    (255, 165, 0),    # Orange
+    (0, 0, 255),      # Blue
+    (0, 255, 0),      # Green
+    (255, 0, 0)       # Red
+]
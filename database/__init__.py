@@ -1 +1,10 @@
-from .records import RecordsManager
\ No newline at end of file
+from .records import RecordsManager
+from .storage import JsonStorage
+from .sqlite_storage import SqliteStorage
+from .journal_storage import JournalStorage
+from .snapshot_storage import SnapshotStorage
+from .leaderboard import LeaderboardIndex, SnapshotLeaderboard
+from .writer import RecordsWriter
+from .windows import WindowedLeaderboards
+from .session_store import GameSessions, MemorySessionStore, SqliteSessionStore
+from .game_archive import GameArchive
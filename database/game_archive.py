@@ -0,0 +1,141 @@
+"""Архив законченных партий для офлайн-проверки рекордов.
+
+update_record получает журнал партии (game/replay.py) вместе с очками и
+дописывает сюда запись: длина журнала, игрок, заявленные очки, сам журнал
+и метка конца записи. Запись идет в потоке RecordsWriter, а не в цикле
+событий. Файл только дописывается; когда он вырастает до max_bytes, он
+переименовывается в path.1 (прежние - в path.2 и дальше, старше backups
+файлов удаляются), поэтому и чтение, и проверка при запуске ограничены
+размером одного файла. Оборванная при сбое последняя запись при чтении
+пропускается, а перед новой записью отрезается. benchmarks/replay_games.py
+перепроигрывает архив и находит партии, очки которых не сходятся с повтором.
+"""
+import logging
+import os
+import struct
+from config import GAME_ARCHIVE_FILE, GAME_ARCHIVE_MAX_BYTES, GAME_ARCHIVE_BACKUPS
+
+logger = logging.getLogger(__name__)
+
+# Длина журнала, id игрока, заявленные очки
+RECORD = struct.Struct('<IqI')
+# Длина журнала и метка конца записи: по ним целость последней записи
+# проверяется с конца файла, без чтения всего архива
+TRAILER = struct.Struct('<II')
+RECORD_END = 0x454E4447
+
+
+class GameArchive:
+    """Файл журналов законченных партий; с пустым path записи не сохраняются"""
+    
+    def __init__(self, path=GAME_ARCHIVE_FILE, max_bytes=GAME_ARCHIVE_MAX_BYTES,
+                 backups=GAME_ARCHIVE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = None
+        self.size = 0
+        self.archived = 0
+        self.rotations = 0
+        self.errors = 0
+    
+    def append(self, user_id, score, log):
+        if not self.path:
+            return
+        try:
+            if self.file is None:
+                self._open()
+            # Одна запись - один write: в файле нет половины записи, пока процесс жив
+            data = RECORD.pack(len(log), int(user_id), score) + log + TRAILER.pack(len(log), RECORD_END)
+            self.file.write(data)
+            self.file.flush()
+            self.size += len(data)
+            self.archived += 1
+            if self.size >= self.max_bytes:
+                self._rotate()
+        except (OSError, struct.error) as e:
+            self.errors += 1
+            logger.error(f"Ошибка записи партии в архив: {e}")
+    
+    def _open(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                _truncate_torn_tail(f)
+        self.file = open(self.path, 'ab')
+        self.size = self.file.tell()
+    
+    def _rotate(self):
+        """Переносит заполненный файл в path.1, сдвигая прежние; следующая запись начнет новый файл"""
+        self.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _truncate_torn_tail(f):
+    """Отрезает оборванную последнюю запись, иначе все следующие читались бы со сдвигом.
+    
+    Обычно проверяются только метка и заголовок последней записи; файл
+    целиком читается, только если она оборвана (после сбоя).
+    """
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    if size >= RECORD.size + TRAILER.size:
+        f.seek(size - TRAILER.size)
+        length, mark = TRAILER.unpack(f.read(TRAILER.size))
+        start = size - TRAILER.size - length - RECORD.size
+        if mark == RECORD_END and start >= 0:
+            f.seek(start)
+            if RECORD.unpack(f.read(RECORD.size))[0] == length:
+                return
+    f.seek(0)
+    end = 0
+    for end, *_ in _records(f.read()):
+        pass
+    f.truncate(end)
+
+
+def _records(data):
+    """Полные записи: (конец записи, id игрока, заявленные очки, журнал)"""
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        length, user_id, score = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        end = start + length + TRAILER.size
+        if end > len(data) or TRAILER.unpack_from(data, end - TRAILER.size) != (length, RECORD_END):
+            break
+        offset = end
+        yield offset, user_id, score, data[start:start + length]
+
+
+def archive_files(path=GAME_ARCHIVE_FILE):
+    """Файлы архива, которые есть на диске, от старых к новым"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_archive(path=GAME_ARCHIVE_FILE):
+    """Записи одного файла архива по порядку: (id игрока, заявленные очки, журнал)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for _, user_id, score, log in _records(data):
+        yield user_id, score, log
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+from config import RECORDS_FILE, JOURNAL_FSYNC, JOURNAL_COMPACT_ENTRIES, JOURNAL_COMPACT_INTERVAL
+from database.storage import JsonStorage
+
+
+def truncate_torn_tail(path):
+    """Обрезает журнал до последнего перевода строки.
+    
+    Недописанная при аварийном завершении строка все равно не читается, а
+    без обрезки следующая запись склеилась бы с ней и тоже потерялась.
+    """
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class JournalStorage(JsonStorage):
+    """JSON-хранилище с журналом изменений и отложенной записью снимка.
+    
+    Каждый результат дописывается в журнал одной строкой, и put возвращается
+    сразу. Фоновый поток сворачивает журнал в снимок (тот же формат, что у
+    JsonStorage) по таймеру или после накопления JOURNAL_COMPACT_ENTRIES записей.
+    При запуске читаются снимок и затем журнал.
+    
+    fsync: "entry" - после каждой записи, "batch" - при сворачивании журнала
+    (до этого записи защищены от падения процесса, но не от сбоя ОС).
+    """
+    
+    def __init__(self, path=RECORDS_FILE, fsync=JOURNAL_FSYNC,
+                 compact_entries=JOURNAL_COMPACT_ENTRIES, compact_interval=JOURNAL_COMPACT_INTERVAL):
+        self.journal_path = path + ".journal"
+        self.fsync = fsync
+        self.compact_entries = compact_entries
+        self.compact_interval = compact_interval
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.compactions = 0
+        super().__init__(path)
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._compactor, name="records-compactor", daemon=True)
+        self._thread.start()
+    
+    def _load_records(self):
+        """Загружает снимок и применяет к нему журнал"""
+        records = super()._load_records()
+        # .old остается, если процесс упал во время сворачивания
+        for path in (self.journal_path + ".old", self.journal_path):
+            if os.path.exists(path):
+                self._replay(path, records)
+        return records
+    
+    def _replay(self, path, records):
+        truncate_torn_tail(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    user_id, record = json.loads(line)
+                except ValueError:
+                    # Недописанная строка при аварийном завершении
+                    continue
+                records[user_id] = record
+                # Прочитанные записи попадут в снимок при ближайшем сворачивании
+                self.pending += 1
+    
+    def put(self, user_id, record):
+        self.put_many([(user_id, record)])
+    
+    def put_many(self, items):
+        items = list(items)
+        lines = []
+        for user_id, record in items:
+            lines.append(json.dumps([user_id, record], ensure_ascii=False, separators=(',', ':')) + "\n")
+        with self.lock:
+            for user_id, record in items:
+                self.records[user_id] = record
+            self.journal.write("".join(lines))
+            # Сбрасываем буфер сразу, чтобы записи пережили падение процесса
+            self.journal.flush()
+            if self.fsync == "entry":
+                os.fsync(self.journal.fileno())
+            self.pending += len(lines)
+            if self.pending >= self.compact_entries:
+                self._wake.set()
+    
+    def _compactor(self):
+        while not self._stopped:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self.pending:
+                self.compact()
+    
+    def compact(self):
+        """Записывает снимок всех рекордов и очищает журнал"""
+        with self.lock:
+            if not self.pending:
+                return
+            data = json.dumps(self.records, ensure_ascii=False, indent=2)
+            # Новые записи пойдут в свежий журнал, пока пишется снимок
+            self.journal.close()
+            self._rotate_journal()
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+            self.pending = 0
+        
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.remove(self.journal_path + ".old")
+            self.compactions += 1
+        except Exception as e:
+            print(f"Ошибка сохранения рекордов: {e}")
+    
+    def _rotate_journal(self):
+        """Переносит журнал в .old; если .old остался от неудачного сворачивания, дописывает в него"""
+        old_path = self.journal_path + ".old"
+        if not os.path.exists(old_path):
+            os.replace(self.journal_path, old_path)
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as src, open(old_path, 'a', encoding='utf-8') as dst:
+            dst.write(src.read())
+        os.remove(self.journal_path)
+    
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+        self.compact()
+        with self.lock:
+            self.journal.close()
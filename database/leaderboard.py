@@ -0,0 +1,249 @@
+import threading
+from bisect import bisect_left, insort
+
+# Под порядковый номер игрока отводятся младшие биты ключа
+SEQ_BITS = 32
+
+
+class LeaderboardIndex:
+    """Упорядоченный индекс лучших результатов для рейтинга.
+    
+    Ключ игрока - одно целое число: очки по убыванию, а при равных очках -
+    порядок появления игрока (как у сортировки записей в JSON). Ключи лежат
+    в отсортированных блоках по BUCKET_SIZE элементов, размеры блоков
+    собраны в дерево Фенвика. Поэтому обновление и место в рейтинге стоят
+    O(log n), а топ-k - O(k).
+    """
+    
+    BUCKET_SIZE = 1000
+    
+    def __init__(self, scores=()):
+        """scores - пары (user_id, очки) в порядке появления игроков"""
+        self.entries = {}
+        self.user_ids = []
+        keys = []
+        for user_id, score in scores:
+            key = self._make_key(score, len(self.user_ids))
+            self.entries[user_id] = key
+            self.user_ids.append(user_id)
+            keys.append(key)
+        keys.sort()
+        size = self.BUCKET_SIZE
+        self.buckets = [keys[i:i + size] for i in range(0, len(keys), size)] or [[]]
+        self._rebuild()
+    
+    @staticmethod
+    def _make_key(score, seq):
+        return (-score << SEQ_BITS) | seq
+    
+    def _rebuild(self):
+        """Пересчитывает максимумы блоков и дерево Фенвика по их размерам"""
+        self.maxes = [bucket[-1] if bucket else 0 for bucket in self.buckets]
+        tree = [0] * (len(self.buckets) + 1)
+        for i, bucket in enumerate(self.buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+    
+    def _tree_add(self, index, delta):
+        index += 1
+        tree = self.tree
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+    
+    def _prefix(self, index):
+        """Количество ключей в блоках до index (не включая)"""
+        total = 0
+        tree = self.tree
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+    
+    def _bucket_for(self, key):
+        index = bisect_left(self.maxes, key)
+        return min(index, len(self.buckets) - 1)
+    
+    def _insert(self, key):
+        index = self._bucket_for(key)
+        bucket = self.buckets[index]
+        insort(bucket, key)
+        self.maxes[index] = bucket[-1]
+        if len(bucket) > self.BUCKET_SIZE * 2:
+            half = len(bucket) // 2
+            self.buckets[index:index + 1] = [bucket[:half], bucket[half:]]
+            self._rebuild()
+        else:
+            self._tree_add(index, 1)
+    
+    def _remove(self, key):
+        index = self._bucket_for(key)
+        bucket = self.buckets[index]
+        del bucket[bisect_left(bucket, key)]
+        if not bucket and len(self.buckets) > 1:
+            del self.buckets[index]
+            self._rebuild()
+            return
+        if bucket:
+            self.maxes[index] = bucket[-1]
+        self._tree_add(index, -1)
+    
+    def update(self, user_id, score):
+        """Записывает лучший результат игрока"""
+        old_key = self.entries.get(user_id)
+        if old_key is None:
+            seq = len(self.user_ids)
+            self.user_ids.append(user_id)
+        else:
+            seq = old_key & ((1 << SEQ_BITS) - 1)
+            if old_key == self._make_key(score, seq):
+                return
+            self._remove(old_key)
+        key = self._make_key(score, seq)
+        self.entries[user_id] = key
+        self._insert(key)
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        key = self._make_key(score, 0)
+        index = self._bucket_for(key)
+        return self._prefix(index) + bisect_left(self.buckets[index], key)
+    
+    def rank(self, user_id):
+        """Место игрока (игроки с равными очками делят место) или None"""
+        key = self.entries.get(user_id)
+        if key is None:
+            return None
+        return self.count_above(-(key >> SEQ_BITS)) + 1
+    
+    def top(self, limit):
+        """Возвращает user_id лучших игроков"""
+        result = []
+        mask = (1 << SEQ_BITS) - 1
+        for bucket in self.buckets:
+            for key in bucket:
+                if len(result) >= limit:
+                    return result
+                result.append(self.user_ids[key & mask])
+        return result
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+class SnapshotLeaderboard:
+    """Рейтинг поверх снимка рекордов (database/records_snapshot.py).
+    
+    Строки снимка уже упорядочены по ключу, поэтому при запуске ничего не
+    строится: место считается двоичным поиском по очкам в снимке, а топ -
+    чтением первых строк. Отдельно хранятся только игроки, чей результат
+    изменился после запуска: их новые ключи и старые ключи из снимка.
+    
+    После сворачивания журнала rebase переносит рейтинг на новый снимок.
+    Сворачивание идет в фоновом потоке, поэтому обращения к рейтингу
+    идут под блокировкой.
+    """
+    
+    def __init__(self, snapshot):
+        self.lock = threading.RLock()
+        self._reset(snapshot)
+    
+    def _reset(self, snapshot):
+        self.base = snapshot
+        self.changed = {}
+        self.user_ids = {}
+        self.keys = []
+        self.removed = []
+        self.added = 0
+    
+    def update(self, user_id, score):
+        """Записывает лучший результат игрока"""
+        with self.lock:
+            self._update(user_id, score)
+    
+    def rebase(self, snapshot):
+        """Переносит рейтинг на новый снимок; результаты, уже попавшие в снимок, больше не хранятся отдельно"""
+        with self.lock:
+            scores = [(user_id, -(key >> SEQ_BITS)) for user_id, key in self.changed.items()]
+            self._reset(snapshot)
+            for user_id, score in scores:
+                index = snapshot.find(user_id)
+                if index >= 0 and -(snapshot.key(index) >> SEQ_BITS) == score:
+                    continue
+                self._update(user_id, score)
+    
+    def _update(self, user_id, score):
+        old_key = self.changed.get(user_id)
+        if old_key is None:
+            index = self.base.find(user_id)
+            if index >= 0:
+                base_key = self.base.key(index)
+                insort(self.removed, base_key)
+                seq = base_key & ((1 << SEQ_BITS) - 1)
+            else:
+                seq = len(self.base) + self.added
+                self.added += 1
+            self.user_ids[seq] = user_id
+        else:
+            seq = old_key & ((1 << SEQ_BITS) - 1)
+            if old_key == LeaderboardIndex._make_key(score, seq):
+                return
+            del self.keys[bisect_left(self.keys, old_key)]
+        key = LeaderboardIndex._make_key(score, seq)
+        self.changed[user_id] = key
+        insort(self.keys, key)
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        key = LeaderboardIndex._make_key(score, 0)
+        with self.lock:
+            return (self.base.count_above(score) - bisect_left(self.removed, key)
+                    + bisect_left(self.keys, key))
+    
+    def rank(self, user_id):
+        """Место игрока (игроки с равными очками делят место) или None"""
+        with self.lock:
+            key = self.changed.get(user_id)
+            if key is None:
+                index = self.base.find(user_id)
+                if index < 0:
+                    return None
+                key = self.base.key(index)
+            return self.count_above(-(key >> SEQ_BITS)) + 1
+    
+    def _is_removed(self, key):
+        index = bisect_left(self.removed, key)
+        return index < len(self.removed) and self.removed[index] == key
+    
+    def top(self, limit):
+        """Возвращает user_id лучших игроков"""
+        with self.lock:
+            return self._top(limit)
+    
+    def _top(self, limit):
+        result = []
+        mask = (1 << SEQ_BITS) - 1
+        index, count = 0, len(self.base)
+        keys = iter(self.keys)
+        key = next(keys, None)
+        while len(result) < limit:
+            # Пропускаем строки снимка, замененные новыми результатами
+            while index < count and self._is_removed(self.base.key(index)):
+                index += 1
+            base_key = self.base.key(index) if index < count else None
+            if base_key is None and key is None:
+                break
+            if key is None or (base_key is not None and base_key < key):
+                result.append(self.base.user_id(index))
+                index += 1
+            else:
+                result.append(self.user_ids[key & mask])
+                key = next(keys, None)
+        return result
+    
+    def __len__(self):
+        with self.lock:
+            return len(self.base) + self.added
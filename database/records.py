@@ -1,113 +1,164 @@
-import json
-import os
-from datetime import datetime
-from config import RECORDS_FILE
-
-class RecordsManager:
-    def __init__(self):
-        self.records = self._load_records()
-    
-    def _load_records(self):
-        """Загружает рекорды из файла"""
-        if os.path.exists(RECORDS_FILE):
-            try:
-                with open(RECORDS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Ошибка загрузки рекордов: {e}")
-                return {}
-        return {}
-    
-    def _save_records(self):
-        """Сохраняет рекорды в файл"""
-        try:
-            with open(RECORDS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Ошибка сохранения рекордов: {e}")
-    
-    def update_record(self, user_id, user_data, score):
-        """Обновляет рекорд пользователя"""
-        user_id_str = str(user_id)
-        current_time = datetime.now().isoformat()
-        
-        user_info = {
-            'username': user_data.get('username', ''),
-            'first_name': user_data.get('first_name', 'Игрок'),
-            'last_name': user_data.get('last_name', ''),
-            'score': score,
-            'date': current_time,
-            'last_played': current_time
-        }
-        
-        is_new_record = False
-        
-        if user_id_str not in self.records:
-            # Новый игрок
-            self.records[user_id_str] = user_info
-            is_new_record = True
-        else:
-            # Существующий игрок
-            old_score = self.records[user_id_str].get('score', 0)
-            if score > old_score:
-                self.records[user_id_str].update(user_info)
-                self.records[user_id_str]['best_score'] = score
-                self.records[user_id_str]['best_date'] = current_time
-                is_new_record = True
-            else:
-                # Обновляем только время последней игры
-                self.records[user_id_str]['last_played'] = current_time
-                self.records[user_id_str]['last_score'] = score
-        
-        self._save_records()
-        return is_new_record
-    
-    def get_user_record(self, user_id):
-        """Возвращает рекорд пользователя"""
-        user_id_str = str(user_id)
-        if user_id_str in self.records:
-            record = self.records[user_id_str]
-            return {
-                'best_score': record.get('score', 0),
-                'best_date': record.get('date', ''),
-                'last_score': record.get('last_score', 0),
-                'games_played': record.get('games_played', 1),
-                'username': record.get('username', ''),
-                'first_name': record.get('first_name', 'Игрок')
-            }
-        return {'best_score': 0, 'last_score': 0, 'games_played': 0, 'first_name': 'Игрок'}
-    
-    def get_top_records(self, limit=10):
-        """Возвращает топ рекордов"""
-        sorted_records = sorted(
-            self.records.values(), 
-            key=lambda x: x.get('score', 0), 
-            reverse=True
-        )[:limit]
-        
-        return [
-            {
-                'name': f"{r.get('first_name', 'Игрок')} ({r.get('username', '')})",
-                'score': r.get('score', 0),
-                'date': r.get('date', ''),
-                'first_name': r.get('first_name', 'Игрок')
-            }
-            for r in sorted_records
-        ]
-    
-    def get_user_stats(self, user_id):
-        """Возвращает статистику пользователя"""
-        user_record = self.get_user_record(user_id)
-        top_records = self.get_top_records(100)  # Большой лимит для точного позиционирования
-        
-        user_rank = None
-        for i, record in enumerate(top_records, 1):
-            if record['score'] == user_record['best_score']:
-                user_rank = i
-                break
-        
-        return {
-            **user_record,
-            'rank': user_rank,
-            'total_players': len(self.records)
-        }
\ No newline at end of file
+import time
+from datetime import datetime
+from config import RECORDS_BACKEND
+from database.storage import JsonStorage
+from database.sqlite_storage import SqliteStorage
+from database.journal_storage import JournalStorage
+from database.snapshot_storage import SnapshotStorage
+from database.writer import RecordsWriter
+from database.windows import WindowedLeaderboards
+from database.game_archive import GameArchive
+from metrics import STAGE_SECONDS
+
+
+def create_storage(backend=RECORDS_BACKEND):
+    """Создает хранилище рекордов по названию из настроек"""
+    if backend == "sqlite":
+        return SqliteStorage()
+    if backend == "journal":
+        return JournalStorage()
+    if backend == "snapshot":
+        return SnapshotStorage()
+    return JsonStorage()
+
+
+class RecordsManager:
+    # Сколько лучших игроков показывает таблица рекордов
+    TOP_SIZE = 10
+    
+    def __init__(self, storage=None, windows=None, archive=None):
+        self.storage = storage if storage is not None else create_storage()
+        # Журналы законченных партий для проверки очков повтором
+        self.archive = archive if archive is not None else GameArchive()
+        self.leaderboard = self.storage.create_leaderboard()
+        self.windows = windows if windows is not None else WindowedLeaderboards()
+        self.writer = RecordsWriter(self.storage)
+        # Версии для кэша ответов: любое изменение рекордов и изменение
+        # топ-TOP_SIZE или числа игроков
+        self.records_version = 0
+        self.top_version = 0
+    
+    def start_writer(self):
+        """Переводит сохранение рекордов в фоновую задачу текущего цикла событий"""
+        self.writer.start()
+    
+    async def stop_writer(self):
+        """Дописывает очередь рекордов и возвращается к синхронной записи"""
+        await self.writer.stop()
+    
+    def _get(self, user_id_str):
+        # Несохраненная запись новее той, что лежит в хранилище
+        record = self.writer.get(user_id_str)
+        if record is None:
+            record = self.storage.get(user_id_str)
+        return record
+    
+    def update_record(self, user_id, user_data, score, replay=None):
+        """Обновляет рекорд пользователя; replay - журнал партии (game/replay.py) для архива"""
+        start = time.perf_counter()
+        user_id_str = str(user_id)
+        if replay is not None:
+            # Диск - в потоке writer, не в цикле событий
+            self.writer.run(self.archive.append, user_id, score, replay)
+        now = datetime.now()
+        current_time = now.isoformat()
+        
+        user_info = {
+            'username': user_data.get('username', ''),
+            'first_name': user_data.get('first_name', 'Игрок'),
+            'last_name': user_data.get('last_name', ''),
+            'score': score,
+            'date': current_time,
+            'last_played': current_time
+        }
+        
+        is_new_record = False
+        record = self._get(user_id_str)
+        is_new_player = record is None
+        
+        if is_new_player:
+            # Новый игрок
+            record = user_info
+            is_new_record = True
+        else:
+            # Существующий игрок; копия, чтобы не менять запись, которую сейчас сохраняет writer
+            record = dict(record)
+            old_score = record.get('score', 0)
+            if score > old_score:
+                record.update(user_info)
+                record['best_score'] = score
+                record['best_date'] = current_time
+                is_new_record = True
+            else:
+                # Обновляем только время последней игры
+                record['last_played'] = current_time
+                record['last_score'] = score
+        
+        self.writer.submit(user_id_str, record)
+        self.leaderboard.update(user_id_str, record.get('score', 0))
+        # В таблицы за период идет результат этой игры, а не лучший за все время
+        self.windows.add(user_id_str, score, user_info['first_name'], now)
+        
+        self.records_version += 1
+        # Результат ниже лучшего не меняет топ; новый лучший меняет, только если попал в него
+        if is_new_player or (is_new_record and self.leaderboard.count_above(score) < self.TOP_SIZE):
+            self.top_version += 1
+        STAGE_SECONDS.observe(time.perf_counter() - start, "records")
+        return is_new_record
+    
+    def get_user_record(self, user_id):
+        """Возвращает рекорд пользователя"""
+        record = self._get(str(user_id))
+        if record is not None:
+            return {
+                'best_score': record.get('score', 0),
+                'best_date': record.get('date', ''),
+                'last_score': record.get('last_score', 0),
+                'games_played': record.get('games_played', 1),
+                'username': record.get('username', ''),
+                'first_name': record.get('first_name', 'Игрок')
+            }
+        return {'best_score': 0, 'last_score': 0, 'games_played': 0, 'first_name': 'Игрок'}
+    
+    def get_top_records(self, limit=10):
+        """Возвращает топ рекордов"""
+        sorted_records = [self._get(user_id) for user_id in self.leaderboard.top(limit)]
+        
+        return [
+            {
+                'name': f"{r.get('first_name', 'Игрок')} ({r.get('username', '')})",
+                'score': r.get('score', 0),
+                'date': r.get('date', ''),
+                'first_name': r.get('first_name', 'Игрок')
+            }
+            for r in sorted_records
+        ]
+    
+    def get_window_top(self, window):
+        """Возвращает версию и топ таблицы за текущий период ("day" или "week")"""
+        version, entries = self.windows.top(window)
+        return version, [{'first_name': name, 'score': score} for _, score, name in entries]
+    
+    def get_user_stats(self, user_id):
+        """Возвращает статистику пользователя"""
+        user_record = self.get_user_record(user_id)
+        
+        return {
+            **user_record,
+            # Игроки с одинаковым результатом делят место
+            'rank': self.leaderboard.rank(str(user_id)),
+            'total_players': len(self.leaderboard)
+        }
+    
+    def get_players_count(self):
+        """Возвращает количество игроков"""
+        return len(self.leaderboard)
+    
+    def get_writer_stats(self):
+        """Возвращает глубину очереди и время записи рекордов"""
+        return self.writer.get_stats()
+    
+    def close(self):
+        self.windows.save()
+        self.archive.close()
+        self.storage.close()
@@ -0,0 +1,295 @@
+"""Двоичный снимок рекордов для отображения в память.
+
+Формат файла:
+    заголовок   HEADER: сигнатура, число игроков, размер таблицы строк и
+                ее размер после последней полной пересборки
+    строки      по ROW на игрока, отсортированы по очкам (по убыванию),
+                при равных очках - по порядку появления игрока
+    индекс id   номера строк (uint32), отсортированные по user_id
+    таблица     строки без повторов: длина (uint32) и байты UTF-8
+
+Строка ROW имеет фиксированную длину, поэтому топ-N - это первые N строк
+файла, а игрок находится двоичным поиском по индексу id. Записи
+раскодируются в словари только при обращении к ним.
+
+Новый снимок обычно собирается копированием: нетронутые строки и таблица
+строк переносятся байтами, а строки изменившихся игроков дописываются в
+конец таблицы. Старые значения изменившихся игроков остаются в таблице
+мусором, поэтому, когда таблица вырастает вдвое, снимок пересобирается
+полностью.
+"""
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import struct
+from database.leaderboard import SEQ_BITS
+
+MAGIC = b"TRS1"
+HEADER = struct.Struct('<4sIII')
+
+INT_FIELDS = ('score', 'best_score', 'last_score', 'games_played')
+STR_FIELDS = ('username', 'first_name', 'last_name', 'date', 'last_played', 'best_date')
+FIELDS = INT_FIELDS + STR_FIELDS
+
+# Очки, порядковый номер, маска присутствующих полей, числа, ссылка на
+# user_id и ссылки на строковые поля в таблице строк
+ROW = struct.Struct('<iIH' + 'i' * (len(INT_FIELDS) - 1) + 'I' * (len(STR_FIELDS) + 1))
+USER_ID = 2 + len(INT_FIELDS)
+INDEX = struct.Struct('<I')
+# Только очки и порядковый номер из строки ROW
+KEY = struct.Struct(f'<iI{ROW.size - 8}x')
+LENGTH = struct.Struct('<I')
+SCORE = struct.Struct('<i')
+
+# Ссылка на строку для значения None
+NULL = 0xFFFFFFFF
+
+
+class RecordsSnapshot:
+    """Снимок рекордов, открытый через mmap только для чтения"""
+    
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.strings_size, self.compacted_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не снимок рекордов")
+        self.rows_offset = HEADER.size
+        self.index_offset = self.rows_offset + self.count * ROW.size
+        self.strings_offset = self.index_offset + self.count * INDEX.size
+        if self.strings_offset + self.strings_size != len(self.data):
+            raise ValueError(f"{path}: файл поврежден")
+    
+    def __len__(self):
+        return self.count
+    
+    def row(self, index):
+        return ROW.unpack_from(self.data, self.rows_offset + index * ROW.size)
+    
+    def rows(self):
+        """Все строки по порядку (для пересборки снимка)"""
+        return ROW.iter_unpack(self.data[self.rows_offset:self.index_offset])
+    
+    def raw_string(self, offset):
+        start = self.strings_offset + offset + LENGTH.size
+        return self.data[start:start + LENGTH.unpack_from(self.data, start - LENGTH.size)[0]]
+    
+    def string(self, offset):
+        if offset == NULL:
+            return None
+        return self.raw_string(offset).decode('utf-8')
+    
+    def key(self, index):
+        """Ключ строки в порядке рейтинга, как в LeaderboardIndex"""
+        score, seq = self.row(index)[:2]
+        return (-score << SEQ_BITS) | seq
+    
+    def user_id(self, index):
+        return self.string(self.row(index)[USER_ID])
+    
+    def decode(self, row):
+        """Раскодирует строку в запись того же вида, что в JSON"""
+        flags = row[2]
+        values = (row[0],) + row[3:USER_ID] + tuple(self.string(offset) for offset in row[USER_ID + 1:])
+        return {field: value for bit, (field, value) in enumerate(zip(FIELDS, values)) if flags & (1 << bit)}
+    
+    def _search(self, user_id):
+        """Номер строки игрока (или -1) и позиция user_id в индексе id"""
+        target = user_id.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            index = INDEX.unpack_from(self.data, self.index_offset + mid * INDEX.size)[0]
+            found = self.raw_string(self.row(index)[USER_ID])
+            if found < target:
+                lo = mid + 1
+            elif found > target:
+                hi = mid
+            else:
+                return index, mid
+        return -1, lo
+    
+    def find(self, user_id):
+        """Номер строки игрока или -1"""
+        return self._search(user_id)[0]
+    
+    def get(self, user_id):
+        index = self.find(user_id)
+        return self.decode(self.row(index)) if index >= 0 else None
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if SCORE.unpack_from(self.data, self.rows_offset + mid * ROW.size)[0] > score:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def close(self):
+        self.data.close()
+
+
+class _Strings:
+    """Таблица строк без повторов"""
+    
+    def __init__(self, start=0):
+        # start - размер таблицы, к которой дописываются строки
+        self.start = start
+        self.data = bytearray()
+        self.offsets = {}
+    
+    def add(self, raw):
+        offset = self.offsets.get(raw)
+        if offset is None:
+            offset = self.offsets[raw] = self.start + len(self.data)
+            self.data += LENGTH.pack(len(raw))
+            self.data += raw
+        return offset
+    
+    def add_text(self, value):
+        return NULL if value is None else self.add(str(value).encode('utf-8'))
+
+
+def _pack_record(strings, user_id, record, seq):
+    flags = 0
+    values = []
+    for bit, field in enumerate(FIELDS):
+        value = record.get(field)
+        if field in record:
+            flags |= 1 << bit
+        if field in INT_FIELDS:
+            values.append(int(value or 0))
+        else:
+            values.append(strings.add_text(value))
+    score = values[0]
+    row = ROW.pack(score, seq, flags, *values[1:len(INT_FIELDS)], strings.add(user_id.encode('utf-8')), *values[len(INT_FIELDS):])
+    return (-score << SEQ_BITS) | seq, row
+
+
+def _rebuild(base, changes):
+    """Полная пересборка: строки таблицы собираются заново без мусора"""
+    strings = _Strings()
+    entries = []
+    seq = 0
+    if base is not None:
+        seq = len(base)
+        moved = {NULL: NULL}
+        for row in base.rows():
+            raw_id = base.raw_string(row[USER_ID])
+            if raw_id.decode('utf-8') in changes:
+                continue
+            refs = []
+            for offset in row[USER_ID:]:
+                new_offset = moved.get(offset)
+                if new_offset is None:
+                    new_offset = moved[offset] = strings.add(base.raw_string(offset))
+                refs.append(new_offset)
+            entries.append(((-row[0] << SEQ_BITS) | row[1], ROW.pack(*row[:USER_ID], *refs), raw_id))
+    
+    for user_id, record in changes.items():
+        index = base.find(user_id) if base is not None else -1
+        if index >= 0:
+            row_seq = base.row(index)[1]
+        else:
+            row_seq = seq
+            seq += 1
+        key, row = _pack_record(strings, user_id, record, row_seq)
+        entries.append((key, row, user_id.encode('utf-8')))
+    
+    entries.sort()
+    by_id = sorted(range(len(entries)), key=lambda i: entries[i][2])
+    rows = b"".join(entry[1] for entry in entries)
+    return len(entries), rows, by_id, bytes(strings.data), len(strings.data)
+
+
+def _extend(base, changes):
+    """Сборка копированием строк base; изменения дописываются в конец таблицы"""
+    count = len(base)
+    strings = _Strings(base.strings_size)
+    changed = []
+    new_ids = []
+    seq = count
+    for user_id, record in changes.items():
+        index, id_position = base._search(user_id)
+        if index >= 0:
+            row_seq = base.row(index)[1]
+        else:
+            row_seq = seq
+            seq += 1
+            new_ids.append((id_position, user_id.encode('utf-8'), len(changed)))
+        key, row = _pack_record(strings, user_id, record, row_seq)
+        changed.append((key, row, index))
+    
+    # Порядок строк: строки base в прежнем порядке, изменения - на место по ключу;
+    # отрицательное число ~i обозначает i-е изменение
+    raw_rows = base.data[base.rows_offset:base.index_offset]
+    keys = [(-score << SEQ_BITS) | seq for score, seq in KEY.iter_unpack(raw_rows)]
+    replaced = {index for _, _, index in changed if index >= 0}
+    order = []
+    previous = 0
+    for i in sorted(range(len(changed)), key=lambda i: changed[i][0]):
+        position = bisect_left(keys, changed[i][0])
+        order.extend(range(previous, position))
+        order.append(~i)
+        previous = position
+    order.extend(range(previous, count))
+    if replaced:
+        order = [i for i in order if i not in replaced]
+    
+    new_positions = array('i', [-1]) * count
+    change_positions = [0] * len(changed)
+    for position, i in enumerate(order):
+        if i >= 0:
+            new_positions[i] = position
+        else:
+            change_positions[~i] = position
+    for i, (_, _, index) in enumerate(changed):
+        if index >= 0:
+            # Изменившийся игрок остается на своем месте в индексе id
+            new_positions[index] = change_positions[i]
+    
+    rows = b"".join(
+        raw_rows[i * ROW.size:(i + 1) * ROW.size] if i >= 0 else changed[~i][1]
+        for i in order
+    )
+    
+    old_by_id = struct.unpack_from(f'<{count}I', base.data, base.index_offset)
+    by_id = []
+    previous = 0
+    for id_position, _, i in sorted(new_ids):
+        by_id.extend(new_positions[index] for index in old_by_id[previous:id_position])
+        by_id.append(change_positions[i])
+        previous = id_position
+    by_id.extend(new_positions[index] for index in old_by_id[previous:])
+    
+    table = base.data[base.strings_offset:] + strings.data
+    return len(order), rows, by_id, table, base.compacted_size
+
+
+def write_snapshot(path, base=None, changes=None):
+    """Записывает снимок из строк base (RecordsSnapshot) и записей changes.
+    
+    changes - словарь user_id -> запись; они заменяют строки base. Новые
+    игроки получают порядковые номера после игроков base в порядке словаря.
+    Файл заменяется атомарно.
+    """
+    changes = changes or {}
+    if base is None or base.strings_size > 2 * max(base.compacted_size, 1024 * 1024):
+        count, rows, by_id, table, compacted_size = _rebuild(base, changes)
+    else:
+        count, rows, by_id, table, compacted_size = _extend(base, changes)
+    
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, count, len(table), compacted_size))
+        f.write(rows)
+        f.write(struct.pack(f'<{len(by_id)}I', *by_id))
+        f.write(table)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,304 @@
+"""Хранилища активных игр (сессий) по чатам.
+
+Хранилище работает с байтами из game/state.py и ничего не знает об
+объектах игр: MemorySessionStore держит их в словаре процесса,
+SqliteSessionStore - в файле SQLite, поэтому партии переживают
+перезапуск бота. GameSessions поверх хранилища отдает обработчику готовые
+объекты игр и, если включен кэш, держит их в памяти - не дольше
+SESSION_TTL без нажатий и не больше SESSION_MAX_CACHED игр.
+
+В формате "log" (SESSION_FORMAT) вместо состояния хранится журнал ходов
+(game/replay.py): ход дописывает в хранилище один байт, а игра после
+перезапуска восстанавливается повтором журнала. Записи обоих форматов
+читаются при любой настройке.
+
+Бот работает одним процессом. shard_of - задел на несколько процессов:
+для этого нужны маршрутизация апдейтов к процессу чата (getUpdates отдает
+апдейты только одному получателю) и общее хранилище рекордов, а сейчас
+рейтинг и файлы рекордов принадлежат одному процессу.
+"""
+import sqlite3
+import time
+from collections import OrderedDict
+from config import (SESSION_BACKEND, SESSION_DB_FILE, SESSION_CACHE,
+                    SESSION_TTL, SESSION_MAX_CACHED, SESSION_SPILL, SESSION_FORMAT)
+from game.state import pack_game, unpack_game
+from game.replay import pack_log, is_log, replay_log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_id INTEGER PRIMARY KEY,
+    state BLOB NOT NULL
+);
+"""
+
+
+def shard_of(chat_id, shards):
+    """Номер из shards процессов, который обслуживал бы чат"""
+    # У групп chat_id отрицательный; остаток в Python всегда неотрицательный
+    return chat_id % shards
+
+
+class MemorySessionStore:
+    """Сессии в памяти процесса; теряются при перезапуске"""
+    
+    # Запись сюда не переживает перезапуск, поэтому при включенном кэше
+    # игра попадает сюда только при вытеснении из кэша
+    persistent = False
+    
+    def __init__(self):
+        self.sessions = {}
+    
+    def load(self, chat_id):
+        return self.sessions.get(chat_id)
+    
+    def save(self, chat_id, data):
+        self.sessions[chat_id] = data
+    
+    def append(self, chat_id, data):
+        self.sessions[chat_id] += data
+    
+    def delete(self, chat_id):
+        self.sessions.pop(chat_id, None)
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def close(self):
+        pass
+
+
+class SqliteSessionStore:
+    """Сессии в файле SQLite в режиме WAL: одна строка на чат"""
+    
+    persistent = True
+    
+    def __init__(self, path=None):
+        self.path = path or SESSION_DB_FILE
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Без fsync на каждый ход: при сбое питания теряются последние ходы, но не файл
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+    
+    def load(self, chat_id):
+        row = self.conn.execute("SELECT state FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else None
+    
+    def save(self, chat_id, data):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO sessions (chat_id, state) VALUES (?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET state = excluded.state",
+                (chat_id, data)
+            )
+    
+    def append(self, chat_id, data):
+        """Дописывает байты в конец записи чата"""
+        with self.conn:
+            # || склеивает как строки; CAST возвращает тип BLOB
+            self.conn.execute(
+                "UPDATE sessions SET state = CAST(state || ? AS BLOB) WHERE chat_id = ?",
+                (data, chat_id)
+            )
+    
+    def delete(self, chat_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+    
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    
+    def close(self):
+        self.conn.close()
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Создает хранилище сессий по названию из настроек"""
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    return MemorySessionStore()
+
+
+class GameSessions:
+    """Активные игры по чатам поверх хранилища сессий.
+    
+    Без кэша игра раскодируется из хранилища при каждом get и записывается
+    при каждом put. С cache=True объекты игр остаются в памяти в порядке
+    последнего обращения, а хранилище читается только при первом обращении
+    к чату - например, после перезапуска или вытеснения. В постоянное
+    хранилище каждый ход по-прежнему записывается сразу, в память процесса
+    (MemorySessionStore) - только при вытеснении.
+    
+    Игра вытесняется из кэша, если к ней не обращались дольше ttl секунд
+    или игр в кэше больше max_cached. Со spill=True вытесненная игра
+    остается в хранилище в упакованном виде и продолжится со следующего
+    нажатия, со spill=False - удаляется. on_evict(chat_id), если задан,
+    вызывается для каждой вытесненной игры.
+    
+    С format="log" игра записывается журналом ходов. Пока игра в кэше,
+    в постоянное хранилище дописываются только новые ходы; целиком журнал
+    пишется для новой игры и после загрузки.
+    """
+    
+    def __init__(self, game_class, store=None, cache=SESSION_CACHE,
+                 ttl=SESSION_TTL, max_cached=SESSION_MAX_CACHED, spill=SESSION_SPILL,
+                 format=SESSION_FORMAT):
+        self.game_class = game_class
+        self.store = store if store is not None else create_session_store()
+        # chat_id -> (игра, время последнего обращения), от давних к свежим
+        self.cache = OrderedDict() if cache else None
+        self.write_through = self.cache is None or self.store.persistent
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self.spill = spill
+        self.on_evict = None
+        self.log_format = format == "log"
+        # chat_id -> сколько ходов игры из кэша уже записано в хранилище
+        self.logged = {} if self.log_format and self.cache is not None and self.write_through else None
+        
+        # Статистика
+        self.hits = 0
+        self.loads = 0
+        self.saves = 0
+        self.appends = 0
+        self.replays = 0
+        self.evictions = 0
+        self.errors = 0
+    
+    def get(self, chat_id):
+        """Игра чата или None"""
+        if self.cache is not None:
+            entry = self.cache.get(chat_id)
+            if entry is not None:
+                self.hits += 1
+                self.cache[chat_id] = (entry[0], time.monotonic())
+                self.cache.move_to_end(chat_id)
+                return entry[0]
+        
+        data = self.store.load(chat_id)
+        if data is None:
+            return None
+        self.loads += 1
+        try:
+            if is_log(data):
+                game = replay_log(data, self.game_class)
+                self.replays += 1
+            else:
+                game = unpack_game(data, self.game_class)
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка загрузки игры чата {chat_id}: {e}")
+            self.store.delete(chat_id)
+            return None
+        if self.cache is not None:
+            if not self.write_through:
+                # Игра снова в кэше; упакованная копия устареет после первого хода
+                self.store.delete(chat_id)
+            elif self.logged is not None and is_log(data):
+                self.logged[chat_id] = len(game.moves)
+            self._cache_put(chat_id, game)
+        return game
+    
+    def _cache_put(self, chat_id, game):
+        now = time.monotonic()
+        self.cache[chat_id] = (game, now)
+        self.cache.move_to_end(chat_id)
+        self._evict(now)
+    
+    def _evict(self, now):
+        """Вытесняет давние игры; свежая игра (последняя в кэше) остается"""
+        cache = self.cache
+        while len(cache) > 1:
+            chat_id, (game, last_access) = next(iter(cache.items()))
+            if len(cache) <= self.max_cached and now - last_access <= self.ttl:
+                break
+            del cache[chat_id]
+            if self.logged is not None:
+                self.logged.pop(chat_id, None)
+            self.evictions += 1
+            if not self.spill:
+                self.store.delete(chat_id)
+            elif not self.write_through:
+                self._save(chat_id, game)
+            if self.on_evict is not None:
+                self.on_evict(chat_id)
+    
+    def _save(self, chat_id, game):
+        # Игру, восстановленную без зерна (старый формат), можно записать только состоянием
+        data = pack_log(game) if self.log_format else None
+        try:
+            self.store.save(chat_id, data if data is not None else pack_game(game))
+            self.saves += 1
+        except Exception as e:
+            # Партия продолжается по копии в памяти, если кэш включен
+            self.errors += 1
+            print(f"Ошибка сохранения игры чата {chat_id}: {e}")
+            data = None
+        if self.logged is not None:
+            if data is not None:
+                self.logged[chat_id] = len(game.moves)
+            else:
+                self.logged.pop(chat_id, None)
+    
+    def _append(self, chat_id, game, logged):
+        """Дописывает в журнал чата ходы, сделанные после прошлой записи"""
+        if logged == len(game.moves):
+            return
+        try:
+            self.store.append(chat_id, bytes(game.moves[logged:]))
+            self.appends += 1
+            self.logged[chat_id] = len(game.moves)
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка записи хода чата {chat_id}: {e}")
+            self.logged.pop(chat_id, None)
+    
+    def put(self, chat_id, game):
+        """Сохраняет игру после хода или новую игру"""
+        if self.write_through:
+            logged = self._logged_moves(chat_id, game)
+            if logged is None:
+                self._save(chat_id, game)
+            else:
+                self._append(chat_id, game, logged)
+        if self.cache is not None:
+            self._cache_put(chat_id, game)
+    
+    def _logged_moves(self, chat_id, game):
+        """Сколько ходов этой игры уже в журнале хранилища; None - журнал надо записать целиком"""
+        if self.logged is None:
+            return None
+        logged = self.logged.get(chat_id)
+        entry = self.cache.get(chat_id)
+        # Та же игра, что записана, и ходы только добавлялись
+        if logged is None or entry is None or entry[0] is not game or logged > len(game.moves):
+            return None
+        return logged
+    
+    def delete(self, chat_id):
+        if self.cache is not None:
+            self.cache.pop(chat_id, None)
+        if self.logged is not None:
+            self.logged.pop(chat_id, None)
+        self.store.delete(chat_id)
+    
+    def __contains__(self, chat_id):
+        return self.get(chat_id) is not None
+    
+    def close(self):
+        self.store.close()
+    
+    def get_stats(self):
+        """Возвращает статистику обращений к сессиям"""
+        return {
+            'stored': len(self.store),
+            'cached': len(self.cache) if self.cache is not None else 0,
+            'hits': self.hits,
+            'loads': self.loads,
+            'saves': self.saves,
+            'appends': self.appends,
+            'replays': self.replays,
+            'evictions': self.evictions,
+            'errors': self.errors
+        }
@@ -0,0 +1,137 @@
+import json
+import os
+from config import (RECORDS_FILE, RECORDS_SNAPSHOT_FILE, JOURNAL_FSYNC,
+                    JOURNAL_COMPACT_ENTRIES, JOURNAL_COMPACT_INTERVAL)
+from database.journal_storage import JournalStorage
+from database.leaderboard import SnapshotLeaderboard
+from database.records_snapshot import RecordsSnapshot, USER_ID, write_snapshot
+
+
+class SnapshotStorage(JournalStorage):
+    """Хранилище рекордов в двоичном снимке, отображенном в память.
+    
+    При запуске снимок только открывается через mmap; запись игрока
+    раскодируется при обращении к ней. Изменения, как в JournalStorage,
+    пишутся в журнал и держатся в памяти, а фоновый поток периодически
+    собирает из снимка и изменений новый снимок. При первом запуске снимок
+    строится из JSON-файла.
+    """
+    
+    def __init__(self, path=RECORDS_SNAPSHOT_FILE, json_path=RECORDS_FILE, fsync=JOURNAL_FSYNC,
+                 compact_entries=JOURNAL_COMPACT_ENTRIES, compact_interval=JOURNAL_COMPACT_INTERVAL):
+        self.json_path = json_path
+        # Рейтинг RecordsManager; после сворачивания журнала переносится на новый снимок
+        self.leaderboard = None
+        # Рейтинг для top/count/count_above; собирается заново после записи или сворачивания
+        self.cached_leaderboard = None
+        super().__init__(path, fsync, compact_entries, compact_interval)
+    
+    def _load_records(self):
+        """Открывает снимок; в self.records остаются только изменения из журнала"""
+        if not os.path.exists(self.path):
+            self._migrate_from_json()
+        self.snapshot = RecordsSnapshot(self.path)
+        records = {}
+        for path in (self.journal_path + ".old", self.journal_path):
+            if os.path.exists(path):
+                self._replay(path, records)
+        return records
+    
+    def _migrate_from_json(self):
+        """Однократно строит снимок из JSON-файла"""
+        records = {}
+        if self.json_path and os.path.exists(self.json_path):
+            try:
+                with open(self.json_path, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"Ошибка загрузки рекордов для переноса: {e}")
+        write_snapshot(self.path, changes=records)
+        if records:
+            print(f"Перенесено рекордов из {self.json_path}: {len(records)}")
+    
+    def create_leaderboard(self):
+        # Изменения из журнала, которые еще не попали в снимок, тоже в рейтинге
+        with self.lock:
+            self.leaderboard = self._build_leaderboard()
+        return self.leaderboard
+    
+    def get(self, user_id):
+        record = self.records.get(user_id)
+        if record is None:
+            record = self.snapshot.get(user_id)
+        return record
+    
+    def put_many(self, items):
+        super().put_many(items)
+        self.cached_leaderboard = None
+    
+    def _build_leaderboard(self):
+        """Рейтинг по снимку и изменениям, которые еще не попали в снимок; вызывается под self.lock"""
+        leaderboard = SnapshotLeaderboard(self.snapshot)
+        for user_id, record in self.records.items():
+            leaderboard.update(user_id, record.get('score', 0))
+        return leaderboard
+    
+    def _current_leaderboard(self):
+        """Рейтинг для запросов к хранилищу; между записями не пересобирается"""
+        with self.lock:
+            if self.cached_leaderboard is None:
+                self.cached_leaderboard = self._build_leaderboard()
+            return self.cached_leaderboard
+    
+    def top(self, limit):
+        """Возвращает записи с лучшими результатами по убыванию очков"""
+        return [self.get(user_id) for user_id in self._current_leaderboard().top(limit)]
+    
+    def count(self):
+        return len(self._current_leaderboard())
+    
+    def scores(self):
+        """Пары (user_id, очки) в порядке появления игроков"""
+        snapshot = self.snapshot
+        rows = sorted((row[1], snapshot.string(row[USER_ID]), row[0]) for row in snapshot.rows())
+        pairs = {user_id: score for _, user_id, score in rows}
+        for user_id, record in list(self.records.items()):
+            pairs[user_id] = record.get('score', 0)
+        return list(pairs.items())
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        return self._current_leaderboard().count_above(score)
+    
+    def has_score(self, score):
+        return self.count_above(score - 1) > self.count_above(score)
+    
+    def compact(self):
+        """Собирает новый снимок из текущего и накопленных изменений"""
+        with self.lock:
+            if not self.pending:
+                return
+            changes = dict(self.records)
+            self.journal.close()
+            self._rotate_journal()
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+            self.pending = 0
+        
+        try:
+            write_snapshot(self.path, self.snapshot, changes)
+            snapshot = RecordsSnapshot(self.path)
+        except Exception as e:
+            print(f"Ошибка сохранения рекордов: {e}")
+            return
+        with self.lock:
+            # Старый снимок закроется сам, когда на него не останется ссылок
+            self.snapshot = snapshot
+            for user_id, record in changes.items():
+                if self.records.get(user_id) is record:
+                    del self.records[user_id]
+            self.cached_leaderboard = None
+        if self.leaderboard is not None:
+            self.leaderboard.rebase(snapshot)
+        os.remove(self.journal_path + ".old")
+        self.compactions += 1
+    
+    def close(self):
+        super().close()
+        self.snapshot.close()
@@ -0,0 +1,131 @@
+import json
+import os
+import sqlite3
+import threading
+from config import RECORDS_FILE, RECORDS_DB_FILE
+from database.leaderboard import LeaderboardIndex
+
+# Поля записи игрока; все хранятся в отдельных колонках
+FIELDS = (
+    'username', 'first_name', 'last_name', 'score', 'date', 'last_played',
+    'best_score', 'best_date', 'last_score', 'games_played'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    user_id TEXT PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    score INTEGER NOT NULL DEFAULT 0,
+    date TEXT,
+    last_played TEXT,
+    best_score INTEGER,
+    best_date TEXT,
+    last_score INTEGER,
+    games_played INTEGER
+);
+CREATE INDEX IF NOT EXISTS records_score ON records (score DESC);
+CREATE INDEX IF NOT EXISTS records_last_played ON records (last_played);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT = (
+    f"INSERT INTO records (user_id, {', '.join(FIELDS)}) "
+    f"VALUES (?, {', '.join('?' for _ in FIELDS)}) "
+    f"ON CONFLICT(user_id) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in FIELDS)}"
+)
+
+
+class SqliteStorage:
+    """Хранилище рекордов во встроенной базе SQLite в режиме WAL.
+    
+    Каждый результат - это upsert одной строки, а топ и место в рейтинге
+    считаются запросами по индексу на score. При первом запуске записи
+    переносятся из JSON-файла.
+    """
+    
+    def __init__(self, path=RECORDS_DB_FILE, json_path=RECORDS_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_from_json(json_path)
+        # Запись идет через отдельное соединение, чтобы фоновая запись
+        # (database/writer.py) не мешала чтению в основном потоке
+        self.write_conn = sqlite3.connect(path, check_same_thread=False)
+        self.write_conn.execute("PRAGMA synchronous=NORMAL")
+        self.write_lock = threading.Lock()
+    
+    def _migrate_from_json(self, json_path):
+        """Однократно переносит записи из JSON-файла"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        records = {}
+        if json_path and os.path.exists(json_path):
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"Ошибка загрузки рекордов для переноса: {e}")
+                return
+        with self.conn:
+            self.conn.executemany(UPSERT, [self._to_row(user_id, r) for user_id, r in records.items()])
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(records)),))
+        if records:
+            print(f"Перенесено рекордов из {json_path}: {len(records)}")
+    
+    @staticmethod
+    def _to_row(user_id, record):
+        return (user_id,) + tuple(record.get(f, 0 if f == 'score' else None) for f in FIELDS)
+    
+    @staticmethod
+    def _to_record(row):
+        # Пустые колонки пропускаем, как отсутствующие ключи в JSON
+        return {f: row[f] for f in FIELDS if row[f] is not None}
+    
+    def get(self, user_id):
+        row = self.conn.execute("SELECT * FROM records WHERE user_id = ?", (user_id,)).fetchone()
+        return self._to_record(row) if row else None
+    
+    def put(self, user_id, record):
+        self.put_many([(user_id, record)])
+    
+    def put_many(self, items):
+        """Сохраняет несколько записей в одной транзакции"""
+        rows = [self._to_row(user_id, record) for user_id, record in items]
+        with self.write_lock, self.write_conn:
+            self.write_conn.executemany(UPSERT, rows)
+    
+    def top(self, limit):
+        """Возвращает записи с лучшими результатами по убыванию очков"""
+        rows = self.conn.execute("SELECT * FROM records ORDER BY score DESC, rowid LIMIT ?", (limit,))
+        return [self._to_record(row) for row in rows]
+    
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    
+    def scores(self):
+        """Пары (user_id, очки) в порядке появления игроков"""
+        return self.conn.execute("SELECT user_id, score FROM records ORDER BY rowid").fetchall()
+    
+    def create_leaderboard(self):
+        """Индекс рейтинга по всем записям хранилища"""
+        return LeaderboardIndex(self.scores())
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        return self.conn.execute("SELECT COUNT(*) FROM records WHERE score > ?", (score,)).fetchone()[0]
+    
+    def has_score(self, score):
+        return self.conn.execute("SELECT 1 FROM records WHERE score = ? LIMIT 1", (score,)).fetchone() is not None
+    
+    def close(self):
+        with self.write_lock:
+            self.write_conn.close()
+        self.conn.close()
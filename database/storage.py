@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+from config import RECORDS_FILE
+from database.leaderboard import LeaderboardIndex
+
+logger = logging.getLogger(__name__)
+
+class JsonStorage:
+    """Хранилище рекордов в JSON-файле.
+    
+    Все записи держатся в памяти, файл целиком перезаписывается после
+    каждого изменения. Ошибка записи файла передается вызывающему
+    (RecordsWriter повторит пачку); записи остаются в памяти.
+    """
+    
+    def __init__(self, path=RECORDS_FILE):
+        self.path = path
+        self.records = self._load_records()
+    
+    def _load_records(self):
+        """Загружает рекорды из файла"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Ошибка загрузки рекордов: {e}")
+                return {}
+        return {}
+    
+    def _save_records(self):
+        """Сохраняет рекорды в файл; при ошибке прежний файл остается целым"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+    
+    def get(self, user_id):
+        return self.records.get(user_id)
+    
+    def put(self, user_id, record):
+        self.records[user_id] = record
+        self._save_records()
+    
+    def put_many(self, items):
+        """Сохраняет несколько записей одной перезаписью файла"""
+        for user_id, record in items:
+            self.records[user_id] = record
+        self._save_records()
+    
+    def top(self, limit):
+        """Возвращает записи с лучшими результатами по убыванию очков"""
+        return sorted(self.records.values(), key=lambda x: x.get('score', 0), reverse=True)[:limit]
+    
+    def count(self):
+        return len(self.records)
+    
+    def scores(self):
+        """Пары (user_id, очки) в порядке появления игроков"""
+        return [(user_id, r.get('score', 0)) for user_id, r in self.records.items()]
+    
+    def create_leaderboard(self):
+        """Индекс рейтинга по всем записям хранилища"""
+        return LeaderboardIndex(self.scores())
+    
+    def count_above(self, score):
+        """Количество игроков с результатом строго больше score"""
+        return sum(1 for r in self.records.values() if r.get('score', 0) > score)
+    
+    def has_score(self, score):
+        return any(r.get('score', 0) == score for r in self.records.values())
+    
+    def close(self):
+        pass
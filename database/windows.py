@@ -0,0 +1,121 @@
+import json
+import os
+from bisect import insort
+from datetime import datetime
+from config import LEADERBOARD_WINDOWS, WINDOW_TOP_SIZE, WINDOWS_FILE
+
+# Ключ периода, в который попадает момент времени
+WINDOW_KEYS = {
+    "day": lambda moment: moment.date().isoformat(),
+    "week": lambda moment: "%d-W%02d" % moment.isocalendar()[:2],
+}
+
+
+class TopK:
+    """Лучшие результаты игроков за один период, не больше size записей.
+    
+    У каждого игрока учитывается лучший результат. Порог входа в таблицу
+    только растет, поэтому вытесненный игрок в нее уже не нужен: его
+    прежний результат ниже порога, и таблица остается точной.
+    """
+    
+    def __init__(self, size):
+        self.size = size
+        # (-очки, порядковый номер, user_id) по возрастанию
+        self.entries = []
+        self.keys = {}
+        self.names = {}
+        self.seq = 0
+        self.version = 0
+    
+    def add(self, user_id, score, name):
+        """Учитывает результат; возвращает True, если таблица изменилась"""
+        old_key = self.keys.get(user_id)
+        if old_key is not None:
+            if score <= -old_key[0]:
+                return False
+            self.entries.remove(old_key + (user_id,))
+        elif len(self.entries) >= self.size and score <= -self.entries[-1][0]:
+            return False
+        
+        # При равных очках выше тот, кто набрал их раньше
+        key = (-score, self.seq)
+        self.seq += 1
+        insort(self.entries, key + (user_id,))
+        self.keys[user_id] = key
+        self.names[user_id] = name
+        if len(self.entries) > self.size:
+            _, _, dropped = self.entries.pop()
+            del self.keys[dropped]
+            del self.names[dropped]
+        self.version += 1
+        return True
+    
+    def top(self):
+        """Записи таблицы: (user_id, очки, имя) по убыванию очков"""
+        return [(user_id, -score, self.names[user_id]) for score, _, user_id in self.entries]
+
+
+class WindowedLeaderboards:
+    """Таблицы рекордов за текущие сутки и неделю.
+    
+    Каждый результат из update_record попадает в таблицу TopK своего
+    периода. Хранится только таблица текущего периода: при переходе
+    к новому периоду старая удаляется, поэтому память ограничена
+    size записями на окно, а топ читается без просмотра истории.
+    """
+    
+    def __init__(self, windows=LEADERBOARD_WINDOWS, size=WINDOW_TOP_SIZE, path=WINDOWS_FILE):
+        self.windows = windows
+        self.size = size
+        self.path = path
+        # окно -> (ключ периода, TopK)
+        self.current = {}
+        self._load()
+    
+    def _bucket(self, window, moment):
+        """Таблица периода, в который попадает moment; прошедший период удаляется"""
+        key = WINDOW_KEYS[window](moment)
+        current = self.current.get(window)
+        if current is None or current[0] != key:
+            current = self.current[window] = (key, TopK(self.size))
+        return current[1]
+    
+    def add(self, user_id, score, name, moment=None):
+        moment = moment or datetime.now()
+        for window in self.windows:
+            self._bucket(window, moment).add(user_id, score, name)
+    
+    def top(self, window, moment=None):
+        """Ключ текущего периода, версия его таблицы и ее записи"""
+        moment = moment or datetime.now()
+        bucket = self._bucket(window, moment)
+        return (self.current[window][0], bucket.version), bucket.top()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Ошибка загрузки таблиц за период: {e}")
+            return
+        for window, (key, entries) in data.items():
+            if window not in self.windows:
+                continue
+            bucket = TopK(self.size)
+            for user_id, score, name in entries:
+                bucket.add(user_id, score, name)
+            self.current[window] = (key, bucket)
+    
+    def save(self):
+        """Сохраняет таблицы текущих периодов"""
+        if not self.path:
+            return
+        data = {window: [key, bucket.top()] for window, (key, bucket) in self.current.items()}
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Ошибка сохранения таблиц за период: {e}")
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class RecordsWriter:
+    """Фоновая запись рекордов в хранилище.
+    
+    submit кладет запись в очередь и сразу возвращается. Одна задача в цикле
+    событий забирает из очереди все накопившиеся записи, оставляет последнюю
+    для каждого игрока и пишет их одним вызовом put_many в отдельном потоке.
+    Пока запись не сохранена, она отдается из памяти через get.
+    
+    Если хранилище не приняло пачку, записи остаются в памяти, и пачка
+    пишется снова вместе с новыми записями через паузу, которая растет
+    от RETRY_DELAY до RETRY_MAX_DELAY секунд.
+    
+    run выполняет в том же потоке другую запись на диск (архив партий),
+    чтобы она тоже не шла в цикле событий.
+    
+    До start (и после stop) submit и run пишут сразу, как раньше.
+    """
+    
+    RETRY_DELAY = 0.5
+    RETRY_MAX_DELAY = 30.0
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.pending = {}
+        self.queue = None
+        self.task = None
+        self.executor = None
+        self.stopping = None
+        
+        # Статистика
+        self.submitted = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.retries = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+        self.last_flush_time = 0.0
+    
+    def start(self):
+        """Запускает задачу записи в текущем цикле событий"""
+        if self.task is not None:
+            return
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        # Один поток: хранилище никогда не пишется параллельно
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="records-writer")
+        self.task = asyncio.get_running_loop().create_task(self._run())
+    
+    def submit(self, user_id, record):
+        self.submitted += 1
+        if self.task is None:
+            self.storage.put(user_id, record)
+            self.written += 1
+            return
+        self.pending[user_id] = record
+        self.queue.put_nowait((user_id, record))
+    
+    def run(self, func, *args):
+        """Выполняет func(*args) в потоке записи после уже поставленных задач"""
+        if self.executor is None:
+            func(*args)
+            return
+        self.executor.submit(self._call, func, args)
+    
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка фоновой записи: {e}")
+    
+    def get(self, user_id):
+        """Запись, которая еще не сохранена в хранилище, или None"""
+        return self.pending.get(user_id)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        # Несохраненная пачка переходит в следующую попытку
+        batch = {}
+        delay = self.RETRY_DELAY
+        while not stopping:
+            if not batch:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                batch[item[0]] = item[1]
+            while not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stopping = True
+                else:
+                    user_id, record = item
+                    batch[user_id] = record
+            
+            if await loop.run_in_executor(self.executor, self._flush, batch):
+                self._forget(batch)
+                batch = {}
+                delay = self.RETRY_DELAY
+            elif not stopping:
+                # Записи остаются в pending; пауза прерывается остановкой
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self.RETRY_MAX_DELAY)
+                self.retries += 1
+    
+    def _forget(self, batch):
+        """Убирает сохраненные записи из pending"""
+        for user_id, record in batch.items():
+            # Запись могла смениться более новой, пока шло сохранение
+            if self.pending.get(user_id) is record:
+                del self.pending[user_id]
+    
+    def _flush(self, batch):
+        """Пишет пачку в хранилище; False, если хранилище ее не приняло"""
+        start = time.perf_counter()
+        try:
+            self.storage.put_many(batch.items())
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка сохранения рекордов ({len(batch)} записей остаются в очереди): {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.written += len(batch)
+        self.flush_time_total += elapsed
+        self.flush_time_max = max(self.flush_time_max, elapsed)
+        self.last_flush_time = elapsed
+        STAGE_SECONDS.observe(elapsed, "records_flush")
+        return True
+    
+    async def stop(self):
+        """Дописывает все записи из очереди и останавливает задачу"""
+        if self.task is None:
+            return
+        self.queue.put_nowait(None)
+        self.stopping.set()
+        await self.task
+        self.task = None
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        # Если последняя пачка не сохранилась, пробуем еще раз напрямую
+        if self.pending:
+            batch = dict(self.pending)
+            if self._flush(batch):
+                self._forget(batch)
+            else:
+                logger.error(f"Не сохранено рекордов при остановке: {len(self.pending)}")
+    
+    def get_stats(self):
+        """Возвращает статистику записи"""
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'pending': len(self.pending),
+            'submitted': self.submitted,
+            'written': self.written,
+            'flushes': self.flushes,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_flush_ms': self.flush_time_total / self.flushes * 1000 if self.flushes else 0.0,
+            'max_flush_ms': self.flush_time_max * 1000,
+            'last_flush_ms': self.last_flush_time * 1000
+        }
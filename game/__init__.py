@@ -1,2 +1,5 @@
-from .tetris import TetrisGame
-from .renderer import GameRenderer
\ No newline at end of file
+from .tetris import TetrisGame
+from .bitboard import BitboardTetrisGame
+from .renderer import GameRenderer, AtlasRenderer, SessionRenderer
+from .frame_cache import FrameCache
+from .text_renderer import TextRenderer
@@ -0,0 +1,215 @@
+from config import SHAPES, COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.rng import new_seed, seed_state, next_state, pick
+from game.pieces import ROTATIONS, MASKS, KICKS, BOTTOMS, SPAWN_WIDTHS, ROTATION_COUNT, piece_masks
+
+FULL_ROW = (1 << BOARD_WIDTH) - 1
+# Таблица для bytes.translate: код цвета -> "1" для занятой клетки, "0" для пустой
+OCCUPIED = b"0" + b"1" * 255
+LINE_SCORES = {1: 100, 2: 300, 3: 500, 4: 800}
+
+class BitboardTetrisGame:
+    """Движок Тетриса на битовых масках.
+    
+    Каждая строка поля хранится как целое число (бит j - занята ли колонка j),
+    поэтому проверка коллизий, фиксация фигуры и поиск заполненных строк
+    выполняются несколькими побитовыми операциями на строку фигуры.
+    Цвета блоков лежат в отдельной компактной плоскости и нужны только
+    для отрисовки. Публичный API совпадает с TetrisGame.
+    """
+    __slots__ = ('rows', 'heights', 'colors', 'score', 'level', 'lines_cleared', 'game_over',
+                 'shape_idx', 'rotation', 'piece_color', 'piece_x', 'piece_y', 'seed', 'rng', 'moves')
+    
+    def __init__(self, seed=None):
+        # Зерно генератора фигур: одно и то же зерно и те же ходы дают ту же партию
+        self.seed = new_seed() if seed is None else seed
+        self.reset()
+    
+    def reset(self):
+        self.rng = seed_state(self.seed)
+        # Журнал ходов партии, байт на ход (коды из game/replay.py)
+        self.moves = bytearray()
+        self.rows = [0] * BOARD_HEIGHT
+        # Верхняя занятая строка каждой колонки (BOARD_HEIGHT - колонка пуста)
+        self.heights = [BOARD_HEIGHT] * BOARD_WIDTH
+        # Плоскость цветов одним массивом по строкам: индекс в COLORS + 1, 0 - пустая клетка
+        self.colors = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.game_over = False
+        self.next_piece()
+    
+    def load_board(self, codes):
+        """Заполняет поле из байтов цветов (индекс цвета + 1, 0 - пусто) и пересчитывает маски и высоты"""
+        self.colors = bytearray(codes)
+        # Строка цветов как двоичная запись маски: колонка 0 - младший бит
+        occupied = self.colors.translate(OCCUPIED)
+        self.rows = [int(occupied[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH][::-1], 2) for y in range(BOARD_HEIGHT)]
+        self.heights = [BOARD_HEIGHT] * BOARD_WIDTH
+        free = FULL_ROW
+        for y, row in enumerate(self.rows):
+            top = row & free
+            free &= ~row
+            while top:
+                bit = top & -top
+                self.heights[bit.bit_length() - 1] = y
+                top ^= bit
+    
+    @property
+    def board(self):
+        """Поле в формате TetrisGame (цвет или 0 в каждой клетке) для рендерера"""
+        palette = (0,) + tuple(COLORS)
+        colors = self.colors
+        return [[palette[c] for c in colors[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]] for y in range(BOARD_HEIGHT)]
+    
+    @property
+    def current_piece(self):
+        return ROTATIONS[self.shape_idx][self.rotation]
+    
+    def next_piece(self):
+        self.rng = next_state(self.rng)
+        shape_idx = pick(self.rng, len(SHAPES))
+        self.shape_idx = shape_idx
+        self.rotation = 0
+        self.piece_color = COLORS[shape_idx]
+        self.piece_x = BOARD_WIDTH // 2 - SPAWN_WIDTHS[shape_idx] // 2
+        self.piece_y = 0
+        
+        if self._collides(self.piece_x, self.piece_y, MASKS[shape_idx][0]):
+            self.game_over = True
+    
+    def _collides(self, x, y, masks):
+        rows = self.rows
+        for i, mask, low, high in masks:
+            if x + low < 0 or x + high >= BOARD_WIDTH:
+                return True
+            row_y = y + i
+            if row_y >= BOARD_HEIGHT:
+                return True
+            if row_y >= 0 and rows[row_y] & (mask << x if x >= 0 else mask >> -x):
+                return True
+        return False
+    
+    def check_collision(self, x, y, piece):
+        return self._collides(x, y, piece_masks(piece))
+    
+    def move(self, dx, dy):
+        if self.game_over:
+            return False
+        
+        new_x = self.piece_x + dx
+        new_y = self.piece_y + dy
+        
+        if not self._collides(new_x, new_y, MASKS[self.shape_idx][self.rotation]):
+            self.piece_x = new_x
+            self.piece_y = new_y
+            return True
+        return False
+    
+    def rotate(self):
+        if self.game_over:
+            return False
+        
+        rotation = (self.rotation + 1) % ROTATION_COUNT
+        masks = MASKS[self.shape_idx][rotation]
+        
+        for dx in KICKS:
+            if not self._collides(self.piece_x + dx, self.piece_y, masks):
+                self.piece_x += dx
+                self.rotation = rotation
+                return True
+        return False
+    
+    def drop(self):
+        if self.game_over:
+            return False
+        
+        landing_y = self._landing_y()
+        self.score += landing_y - self.piece_y  # Бонус за быстрое падение
+        self.piece_y = landing_y
+        self.lock_piece()
+        return True
+    
+    def _landing_y(self):
+        """Строка, на которую упадет текущая фигура, по индексу высот колонок"""
+        x = self.piece_x
+        y = self.piece_y
+        heights = self.heights
+        landing_y = BOARD_HEIGHT
+        for j, bottom in BOTTOMS[self.shape_idx][self.rotation]:
+            top = heights[x + j]
+            if y + bottom >= top:
+                # Фигура задвинута под навес - ищем опору перебором
+                masks = MASKS[self.shape_idx][self.rotation]
+                while not self._collides(x, y + 1, masks):
+                    y += 1
+                return y
+            landing_y = min(landing_y, top - 1 - bottom)
+        return landing_y
+    
+    def ghost_position(self):
+        """Позиция (x, y), в которой приземлится текущая фигура, или None после окончания игры"""
+        if self.game_over:
+            return None
+        return self.piece_x, self._landing_y()
+    
+    def lock_piece(self):
+        x = self.piece_x
+        color_idx = self.shape_idx + 1
+        for i, mask, low, high in MASKS[self.shape_idx][self.rotation]:
+            row_y = self.piece_y + i
+            if 0 <= row_y < BOARD_HEIGHT:
+                self.rows[row_y] |= mask << x if x >= 0 else mask >> -x
+                base = row_y * BOARD_WIDTH + x
+                for j in range(low, high + 1):
+                    if mask >> j & 1:
+                        self.colors[base + j] = color_idx
+                        if row_y < self.heights[x + j]:
+                            self.heights[x + j] = row_y
+        
+        self.clear_lines()
+        self.next_piece()
+    
+    def clear_lines(self):
+        cleared = self.rows.count(FULL_ROW)
+        if not cleared:
+            return
+        
+        full = [i for i, row in enumerate(self.rows) if row == FULL_ROW]
+        keep = [i for i, row in enumerate(self.rows) if row != FULL_ROW]
+        self.rows = [0] * cleared + [self.rows[i] for i in keep]
+        colors = self.colors
+        self.colors = bytearray(cleared * BOARD_WIDTH) + b"".join(
+            [colors[i * BOARD_WIDTH:(i + 1) * BOARD_WIDTH] for i in keep]
+        )
+        self._shift_heights(full)
+        
+        self.lines_cleared += cleared
+        self.score += LINE_SCORES.get(cleared, 800)
+        self.level = self.lines_cleared // 10 + 1
+    
+    def _shift_heights(self, cleared):
+        """Обновляет индекс высот после удаления строк cleared"""
+        rows = self.rows
+        for x, top in enumerate(self.heights):
+            if top >= BOARD_HEIGHT:
+                continue
+            if top in cleared:
+                # Верхний блок сгорел - ищем новый верх колонки
+                bit = 1 << x
+                top = 0
+                while top < BOARD_HEIGHT and not rows[top] & bit:
+                    top += 1
+                self.heights[x] = top
+            else:
+                self.heights[x] = top + sum(1 for line in cleared if line > top)
+    
+    def get_game_state(self):
+        """Возвращает состояние игры для отображения"""
+        return {
+            'score': self.score,
+            'level': self.level,
+            'lines_cleared': self.lines_cleared,
+            'game_over': self.game_over,
+            'next_piece_shape': len(self.current_piece)
+        }
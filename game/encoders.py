@@ -0,0 +1,79 @@
+"""Кодирование кадров для отправки в Telegram.
+
+Кадр содержит всего около десятка цветов (COLORS, фон, рамка, контуры),
+поэтому палитровый PNG заметно меньше 24-битного и кодируется быстрее.
+Формат выбирается в config.IMAGE_FORMAT.
+"""
+import io
+from PIL import Image
+from config import COLORS, IMAGE_FORMAT, PNG_COMPRESS_LEVEL, WEBP_QUALITY, WEBP_LOSSLESS, JPEG_QUALITY
+from game.renderer import BACKGROUND_COLOR, FRAME_COLOR, OUTLINE_COLOR, GLOW_COLOR
+
+
+PALETTE_COLORS = [BACKGROUND_COLOR, FRAME_COLOR, OUTLINE_COLOR, GLOW_COLOR] + list(COLORS)
+# До 16 цветов хватает 4 бит на пиксель - файл получается примерно втрое меньше
+PALETTE_BITS = 4 if len(PALETTE_COLORS) <= 16 else 8
+
+
+def _build_palette_image():
+    palette = [channel for color in PALETTE_COLORS for channel in color]
+    # Оставшиеся записи палитры заполняем цветом фона
+    palette += list(BACKGROUND_COLOR) * (256 - len(PALETTE_COLORS))
+    img = Image.new('P', (1, 1))
+    img.putpalette(palette)
+    return img
+
+
+PALETTE_IMAGE = _build_palette_image()
+
+
+def encode_png(img, compress_level=PNG_COMPRESS_LEVEL):
+    bio = io.BytesIO()
+    img.save(bio, 'PNG', compress_level=compress_level)
+    return bio.getvalue()
+
+
+def encode_palette_png(img, compress_level=PNG_COMPRESS_LEVEL):
+    """PNG с палитрой: цвета кадра переводятся в индексы без дизеринга"""
+    paletted = img.quantize(palette=PALETTE_IMAGE, dither=Image.Dither.NONE)
+    bio = io.BytesIO()
+    paletted.save(bio, 'PNG', compress_level=compress_level, bits=PALETTE_BITS)
+    return bio.getvalue()
+
+
+def encode_webp(img, quality=WEBP_QUALITY, lossless=WEBP_LOSSLESS):
+    bio = io.BytesIO()
+    img.save(bio, 'WEBP', quality=quality, lossless=lossless, method=0)
+    return bio.getvalue()
+
+
+def encode_jpeg(img, quality=JPEG_QUALITY):
+    bio = io.BytesIO()
+    img.save(bio, 'JPEG', quality=quality)
+    return bio.getvalue()
+
+
+ENCODERS = {
+    'png': encode_png,
+    'png_palette': encode_palette_png,
+    'webp': encode_webp,
+    'jpeg': encode_jpeg
+}
+
+
+FILE_EXTENSIONS = {
+    'png': 'png',
+    'png_palette': 'png',
+    'webp': 'webp',
+    'jpeg': 'jpg'
+}
+
+
+def frame_filename(image_format=IMAGE_FORMAT):
+    """Имя файла для загрузки кадра: по расширению определяется тип изображения"""
+    return f"tetris.{FILE_EXTENSIONS[image_format]}"
+
+
+def encode_frame(img, image_format=IMAGE_FORMAT):
+    """Кодирует кадр в формат из настроек"""
+    return ENCODERS[image_format](img)
@@ -0,0 +1,64 @@
+import hashlib
+from collections import OrderedDict
+from config import FRAME_CACHE_MAX_BYTES
+
+class FrameCache:
+    """LRU-кэш закодированных кадров с адресацией по содержимому.
+    
+    Ключ - короткий хэш состояния поля, поэтому одинаковые позиции из разных
+    игр (например, стартовые) используют один и тот же кадр.
+    """
+    
+    def __init__(self, max_bytes=FRAME_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(snapshot):
+        """Вычисляет ключ кадра по снимку игры (см. game.snapshot)"""
+        return hashlib.blake2b(snapshot, digest_size=16).digest()
+    
+    def get(self, key):
+        """Возвращает кадр из кэша или None"""
+        data = self.frames.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.frames.move_to_end(key)
+        self.hits += 1
+        return data
+    
+    def put(self, key, data):
+        """Сохраняет кадр, вытесняя самые старые при превышении лимита памяти"""
+        if len(data) > self.max_bytes:
+            return
+        old = self.frames.pop(key, None)
+        if old is not None:
+            self.size_bytes -= len(old)
+        self.frames[key] = data
+        self.size_bytes += len(data)
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self.frames.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            self.evictions += 1
+    
+    def clear(self):
+        self.frames.clear()
+        self.size_bytes = 0
+    
+    def get_stats(self):
+        """Возвращает статистику кэша"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.frames),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,65 @@
+"""Заранее рассчитанные таблицы поворотов фигур.
+
+Для каждой фигуры из SHAPES и каждого из четырех поворотов хранятся
+матрица фигуры, смещения занятых клеток и построчные битовые маски.
+Фигура в игре описывается парой (индекс фигуры, индекс поворота),
+поэтому повороты не создают новых списков.
+"""
+from config import SHAPES
+
+ROTATION_COUNT = 4
+
+# Сдвиги по горизонтали, которые пробуются при повороте (первый - без сдвига)
+KICKS = (0, -1, 1, -2, 2)
+
+
+def _rotate(piece):
+    """Поворачивает матрицу фигуры по часовой стрелке"""
+    return tuple(tuple(row) for row in zip(*piece[::-1]))
+
+
+def _cells(piece):
+    return tuple((i, j) for i, row in enumerate(piece) for j, cell in enumerate(row) if cell)
+
+
+def piece_masks(piece):
+    """Строки фигуры в виде (смещение строки, маска, мин. колонка, макс. колонка)"""
+    masks = []
+    for i, row in enumerate(piece):
+        mask = 0
+        for j, cell in enumerate(row):
+            if cell:
+                mask |= 1 << j
+        if mask:
+            masks.append((i, mask, (mask & -mask).bit_length() - 1, mask.bit_length() - 1))
+    return tuple(masks)
+
+
+def _bottoms(piece):
+    """Нижняя занятая строка фигуры в каждой колонке: (колонка, строка)"""
+    bottoms = {}
+    for i, j in _cells(piece):
+        bottoms[j] = max(bottoms.get(j, i), i)
+    return tuple(sorted(bottoms.items()))
+
+
+def _build_rotations():
+    rotations = []
+    for shape in SHAPES:
+        states = [tuple(tuple(row) for row in shape)]
+        for _ in range(ROTATION_COUNT - 1):
+            states.append(_rotate(states[-1]))
+        rotations.append(tuple(states))
+    return tuple(rotations)
+
+
+# ROTATIONS[фигура][поворот] - матрица фигуры
+ROTATIONS = _build_rotations()
+# CELLS[фигура][поворот] - смещения (строка, колонка) занятых клеток
+CELLS = tuple(tuple(_cells(piece) for piece in states) for states in ROTATIONS)
+# MASKS[фигура][поворот] - построчные битовые маски для BitboardTetrisGame
+MASKS = tuple(tuple(piece_masks(piece) for piece in states) for states in ROTATIONS)
+# BOTTOMS[фигура][поворот] - нижний профиль фигуры для расчета точки приземления
+BOTTOMS = tuple(tuple(_bottoms(piece) for piece in states) for states in ROTATIONS)
+# Ширина фигуры в начальном положении - для расчета стартовой позиции
+SPAWN_WIDTHS = tuple(len(shape[0]) for shape in SHAPES)
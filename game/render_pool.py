@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import RENDER_MODE, RENDER_EXECUTOR, RENDER_WORKERS
+from game.renderer import GameRenderer, AtlasRenderer
+from game.encoders import encode_frame
+from game.snapshot import restore_frame_state
+from metrics import STAGE_SECONDS
+
+# Рендерер создается отдельно в каждом процессе-воркере
+_renderer = None
+
+
+def create_renderer():
+    return AtlasRenderer() if RENDER_MODE == "atlas" else GameRenderer()
+
+
+def _draw_and_encode(draw, snapshot):
+    """(закодированный кадр, время рисования, время кодирования)"""
+    start = time.perf_counter()
+    img = draw(restore_frame_state(snapshot))
+    drawn = time.perf_counter()
+    data = encode_frame(img)
+    return data, drawn - start, time.perf_counter() - drawn
+
+
+def render_snapshot_timed(snapshot):
+    """Рисует кадр по снимку игры; выполняется в воркере и возвращает кадр вместе с временами этапов"""
+    global _renderer
+    if _renderer is None:
+        _renderer = create_renderer()
+    return _draw_and_encode(_renderer.create_game_image, snapshot)
+
+
+def render_session_snapshot_timed(session, snapshot):
+    """Дорисовывает кадр сессии (SessionRenderer); возвращает кадр вместе с временами этапов"""
+    return _draw_and_encode(session.render, snapshot)
+
+
+def render_snapshot(snapshot):
+    """Рисует кадр по снимку игры и возвращает закодированное изображение. Выполняется в воркере."""
+    return render_snapshot_timed(snapshot)[0]
+
+
+def render_session_snapshot(session, snapshot):
+    """Дорисовывает кадр сессии (SessionRenderer) по снимку и возвращает закодированное изображение"""
+    return render_session_snapshot_timed(session, snapshot)[0]
+
+
+class RenderExecutor:
+    """Выносит отрисовку и кодирование кадров из цикла событий asyncio.
+    
+    kind: "thread" - пул потоков, "process" - пул процессов,
+    "inline" - рисовать прямо в цикле событий (как раньше).
+    """
+    
+    def __init__(self, kind=RENDER_EXECUTOR, workers=RENDER_WORKERS):
+        self.kind = kind
+        self.workers = workers
+        if kind == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers)
+        elif kind == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        else:
+            self.pool = None
+    
+    async def render(self, snapshot, session=None):
+        """Возвращает закодированный кадр для снимка игры.
+        
+        session - SessionRenderer игры для инкрементальной отрисовки; в пул
+        процессов он не передается, там кадр всегда рисуется целиком.
+        """
+        if session is not None and self.kind != "process":
+            func, args = render_session_snapshot_timed, (session, snapshot)
+        else:
+            func, args = render_snapshot_timed, (snapshot,)
+        if self.pool is None:
+            data, draw_time, encode_time = func(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            data, draw_time, encode_time = await loop.run_in_executor(self.pool, func, *args)
+        # Времена меряет воркер, а записываются они здесь - в том числе для пула процессов
+        STAGE_SECONDS.observe(draw_time, "render")
+        STAGE_SECONDS.observe(encode_time, "encode")
+        return data
+    
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
@@ -1,44 +1,237 @@
-from PIL import Image, ImageDraw
-from config import BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE, BORDER
-
-class GameRenderer:
-    def __init__(self):
-        self.img_width = BOARD_WIDTH * CELL_SIZE + BORDER * 2
-        self.img_height = BOARD_HEIGHT * CELL_SIZE + BORDER * 2
-    
-    def create_game_image(self, game):
-        """Создает изображение игрового поля"""
-        img = Image.new('RGB', (self.img_width, self.img_height), color=(40, 40, 40))
-        draw = ImageDraw.Draw(img)
-        
-        # Рисуем границу
-        draw.rectangle([0, 0, self.img_width, self.img_height], outline=(100, 100, 100), width=2)
-        
-        # Рисуем установленные блоки
-        for y in range(BOARD_HEIGHT):
-            for x in range(BOARD_WIDTH):
-                if game.board[y][x]:
-                    color = game.board[y][x]
-                    self._draw_block(draw, x, y, color)
-        
-        # Рисуем текущую фигуру
-        if not game.game_over:
-            for y, row in enumerate(game.current_piece):
-                for x, cell in enumerate(row):
-                    if cell:
-                        self._draw_block(draw, game.piece_x + x, game.piece_y + y, game.piece_color, is_current=True)
-        
-        return img
-    
-    def _draw_block(self, draw, x, y, color, is_current=False):
-        """Рисует отдельный блок"""
-        x1 = BORDER + x * CELL_SIZE
-        y1 = BORDER + y * CELL_SIZE
-        x2 = BORDER + (x + 1) * CELL_SIZE
-        y2 = BORDER + (y + 1) * CELL_SIZE
-        
-        draw.rectangle([x1, y1, x2, y2], fill=color, outline=(200, 200, 200), width=1)
-        
-        if is_current:
-            # Добавляем свечение для текущей фигуры
-            draw.rectangle([x1+2, y1+2, x2-2, y2-2], outline=(255, 255, 255), width=2)
\ No newline at end of file
+from PIL import Image, ImageDraw
+from config import BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE, BORDER, COLORS, SHOW_GHOST
+
+BACKGROUND_COLOR = (40, 40, 40)
+FRAME_COLOR = (100, 100, 100)
+OUTLINE_COLOR = (200, 200, 200)
+GLOW_COLOR = (255, 255, 255)
+
+class GameRenderer:
+    def __init__(self):
+        self.img_width = BOARD_WIDTH * CELL_SIZE + BORDER * 2
+        self.img_height = BOARD_HEIGHT * CELL_SIZE + BORDER * 2
+    
+    def create_game_image(self, game):
+        """Создает изображение игрового поля"""
+        img = Image.new('RGB', (self.img_width, self.img_height), color=BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(img)
+        
+        # Рисуем границу
+        draw.rectangle([0, 0, self.img_width, self.img_height], outline=FRAME_COLOR, width=2)
+        
+        # Рисуем установленные блоки
+        for y in range(BOARD_HEIGHT):
+            for x in range(BOARD_WIDTH):
+                if game.board[y][x]:
+                    color = game.board[y][x]
+                    self._draw_block(draw, x, y, color)
+        
+        # Рисуем тень - место, куда упадет фигура
+        ghost = self._ghost_position(game)
+        if ghost:
+            ghost_x, ghost_y = ghost
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        self._draw_ghost(draw, ghost_x + x, ghost_y + y, game.piece_color)
+        
+        # Рисуем текущую фигуру
+        if not game.game_over:
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        self._draw_block(draw, game.piece_x + x, game.piece_y + y, game.piece_color, is_current=True)
+        
+        return img
+    
+    def _draw_block(self, draw, x, y, color, is_current=False, origin=BORDER):
+        """Рисует отдельный блок"""
+        x1 = origin + x * CELL_SIZE
+        y1 = origin + y * CELL_SIZE
+        x2 = origin + (x + 1) * CELL_SIZE
+        y2 = origin + (y + 1) * CELL_SIZE
+        
+        draw.rectangle([x1, y1, x2, y2], fill=color, outline=OUTLINE_COLOR, width=1)
+        
+        if is_current:
+            # Добавляем свечение для текущей фигуры
+            draw.rectangle([x1+2, y1+2, x2-2, y2-2], outline=GLOW_COLOR, width=2)
+    
+    @staticmethod
+    def _ghost_position(game):
+        if not SHOW_GHOST or game.game_over:
+            return None
+        return game.ghost_position()
+    
+    def _draw_ghost(self, draw, x, y, color, origin=BORDER):
+        """Рисует клетку тени: контур цвета фигуры внутри клетки, не задевая соседей"""
+        x1 = origin + x * CELL_SIZE
+        y1 = origin + y * CELL_SIZE
+        draw.rectangle([x1+3, y1+3, x1+CELL_SIZE-3, y1+CELL_SIZE-3], outline=color, width=1)
+
+
+class AtlasRenderer(GameRenderer):
+    """Рендерер на основе заранее подготовленных спрайтов.
+    
+    Фон с рамкой и плитки блоков (обычные и "текущие") рисуются один раз,
+    а каждый кадр собирается копированием шаблона и вставкой плиток.
+    Результат побайтно совпадает с GameRenderer.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.template = self._build_template()
+        self.tiles = {}
+        self.ghost_tiles = {}
+        for color in COLORS:
+            self.get_tile(color, False)
+            self.get_tile(color, True)
+            self.get_ghost_tile(color)
+    
+    def _build_template(self):
+        """Рисует фон с рамкой"""
+        img = Image.new('RGB', (self.img_width, self.img_height), color=BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([0, 0, self.img_width, self.img_height], outline=FRAME_COLOR, width=2)
+        return img
+    
+    def get_tile(self, color, is_current):
+        """Возвращает плитку блока, создавая ее при первом обращении"""
+        key = (tuple(color), is_current)
+        tile = self.tiles.get(key)
+        if tile is None:
+            # Блок занимает CELL_SIZE + 1 пикселей: контур заходит на соседнюю клетку
+            tile = Image.new('RGB', (CELL_SIZE + 1, CELL_SIZE + 1), color=BACKGROUND_COLOR)
+            self._draw_block(ImageDraw.Draw(tile), 0, 0, color, is_current, origin=0)
+            self.tiles[key] = tile
+        return tile
+    
+    def get_ghost_tile(self, color):
+        """Возвращает плитку тени: только внутренняя часть клетки, вставляется со смещением 1"""
+        key = tuple(color)
+        tile = self.ghost_tiles.get(key)
+        if tile is None:
+            tile = Image.new('RGB', (CELL_SIZE - 1, CELL_SIZE - 1), color=BACKGROUND_COLOR)
+            self._draw_ghost(ImageDraw.Draw(tile), 0, 0, color, origin=-1)
+            self.ghost_tiles[key] = tile
+        return tile
+    
+    def create_game_image(self, game):
+        """Собирает изображение игрового поля из шаблона и плиток"""
+        img = self.template.copy()
+        paste = img.paste
+        
+        # Установленные блоки
+        for y, row in enumerate(game.board):
+            top = BORDER + y * CELL_SIZE
+            for x, color in enumerate(row):
+                if color:
+                    paste(self.get_tile(color, False), (BORDER + x * CELL_SIZE, top))
+        
+        # Тень
+        ghost = self._ghost_position(game)
+        if ghost:
+            ghost_x, ghost_y = ghost
+            tile = self.get_ghost_tile(game.piece_color)
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        paste(tile, (BORDER + 1 + (ghost_x + x) * CELL_SIZE, BORDER + 1 + (ghost_y + y) * CELL_SIZE))
+        
+        # Текущая фигура
+        if not game.game_over:
+            tile = self.get_tile(game.piece_color, True)
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        paste(tile, (BORDER + (game.piece_x + x) * CELL_SIZE, BORDER + (game.piece_y + y) * CELL_SIZE))
+        
+        return img
+
+
+# Виды клеток в карте кадра SessionRenderer
+LOCKED = 0
+CURRENT = 1
+GHOST = 2
+
+
+class SessionRenderer:
+    """Рендерер одной игровой сессии, перерисовывающий только изменившиеся клетки.
+    
+    Хранит последний кадр и карту клеток, по которой он нарисован. Плитки
+    берутся из общего AtlasRenderer. Если из поля пропал установленный блок
+    (сжигание линий сдвинуло строки или началась новая игра), кадр рисуется заново.
+    """
+    
+    def __init__(self, atlas):
+        self.atlas = atlas
+        self.frame = None
+        self.cells = None
+        self.background = Image.new('RGB', (CELL_SIZE + 1, CELL_SIZE + 1), color=BACKGROUND_COLOR)
+        self.full_redraws = 0
+        self.partial_redraws = 0
+    
+    def _cell_map(self, game):
+        """Возвращает для каждой клетки ключ плитки (цвет, вид) или None"""
+        cells = [(color, LOCKED) if color else None for row in game.board for color in row]
+        ghost = self.atlas._ghost_position(game)
+        if ghost:
+            key = (game.piece_color, GHOST)
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        cells[(ghost[1] + y) * BOARD_WIDTH + ghost[0] + x] = key
+        if not game.game_over:
+            key = (game.piece_color, CURRENT)
+            for y, row in enumerate(game.current_piece):
+                for x, cell in enumerate(row):
+                    if cell:
+                        cells[(game.piece_y + y) * BOARD_WIDTH + game.piece_x + x] = key
+        return cells
+    
+    def _needs_full_redraw(self, cells):
+        if self.frame is None:
+            return True
+        for old, new in zip(self.cells, cells):
+            if old is not None and old[1] == LOCKED and old != new:
+                return True
+        return False
+    
+    def render(self, game):
+        """Возвращает изображение кадра; изображение принадлежит сессии и меняется при следующем вызове"""
+        cells = self._cell_map(game)
+        
+        if self._needs_full_redraw(cells):
+            self.frame = self.atlas.create_game_image(game)
+            self.cells = cells
+            self.full_redraws += 1
+            return self.frame
+        
+        dirty = [i for i, (old, new) in enumerate(zip(self.cells, cells)) if old != new]
+        if dirty:
+            self._repaint(dirty, cells)
+        self.cells = cells
+        self.partial_redraws += 1
+        return self.frame
+    
+    def _repaint(self, dirty, cells):
+        """Перерисовывает изменившиеся клетки и соседей, чьи контуры заходят на них"""
+        paste = self.frame.paste
+        neighbours = set()
+        for index in dirty:
+            y, x = divmod(index, BOARD_WIDTH)
+            paste(self.background, (BORDER + x * CELL_SIZE, BORDER + y * CELL_SIZE))
+            for ny in range(max(y - 1, 0), min(y + 2, BOARD_HEIGHT)):
+                for nx in range(max(x - 1, 0), min(x + 2, BOARD_WIDTH)):
+                    neighbours.add(ny * BOARD_WIDTH + nx)
+        
+        for index in sorted(neighbours):
+            key = cells[index]
+            if key is None:
+                continue
+            y, x = divmod(index, BOARD_WIDTH)
+            color, kind = key
+            if kind == GHOST:
+                paste(self.atlas.get_ghost_tile(color), (BORDER + 1 + x * CELL_SIZE, BORDER + 1 + y * CELL_SIZE))
+            else:
+                paste(self.atlas.get_tile(color, kind == CURRENT), (BORDER + x * CELL_SIZE, BORDER + y * CELL_SIZE))
@@ -0,0 +1,89 @@
+"""Журнал ходов партии и ее повтор.
+
+Партия полностью задается зерном генератора фигур (game/rng.py) и
+последовательностью нажатий, поэтому вместо поля можно хранить журнал:
+байт на ход, только дописывается. По журналу партия восстанавливается
+после перезапуска (хранилище сессий в режиме SESSION_FORMAT = "log") и
+перепроверяется: очки, присланные в update_record, можно пересчитать
+офлайн (benchmarks/replay_games.py).
+
+Журнал в байтах - версия, зерно и коды ходов. Первый байт журнала
+больше любой версии состояния игры (game/state.py), поэтому хранилище
+различает их без отдельного поля.
+"""
+import struct
+from operator import methodcaller
+from game.bitboard import BitboardTetrisGame
+
+# Код хода - индекс в ACTIONS
+ACTIONS = ("left", "right", "down", "rotate", "drop")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+# Действие по коду хода
+APPLY = (
+    methodcaller('move', -1, 0),
+    methodcaller('move', 1, 0),
+    methodcaller('move', 0, 1),
+    methodcaller('rotate'),
+    methodcaller('drop'),
+)
+
+LOG_VERSION = 0x81
+# Версия, зерно
+LOG_HEADER = struct.Struct('<BI')
+
+
+def play(game, action):
+    """Применяет нажатие к игре и записывает его в журнал ходов; после конца игры ничего не делает"""
+    if game.game_over:
+        return
+    code = ACTION_CODES[action]
+    game.moves.append(code)
+    APPLY[code](game)
+
+
+def pack_log(game):
+    """Журнал партии в байтах или None, если начало партии неизвестно"""
+    if game.seed is None:
+        return None
+    return LOG_HEADER.pack(LOG_VERSION, game.seed) + game.moves
+
+
+def is_log(data):
+    return bool(data) and data[0] == LOG_VERSION
+
+
+def unpack_log(data):
+    """(зерно, коды ходов) из байтов журнала"""
+    version, seed = LOG_HEADER.unpack_from(data)
+    if version != LOG_VERSION:
+        raise ValueError(f"Неизвестная версия журнала ходов: {version}")
+    return seed, data[LOG_HEADER.size:]
+
+
+def replay(seed, moves, game_class=BitboardTetrisGame):
+    """Проигрывает ходы с начала партии и возвращает игру в том же состоянии"""
+    game = game_class(seed)
+    for count, code in enumerate(moves):
+        if game.game_over:
+            # Нажатия после конца игры (журналы прежних версий) ничего не меняли
+            moves = moves[:count]
+            break
+        APPLY[code](game)
+    game.moves = bytearray(moves)
+    return game
+
+
+def replay_log(data, game_class=BitboardTetrisGame):
+    """Восстанавливает игру из байтов журнала"""
+    seed, moves = unpack_log(data)
+    if moves.translate(None, bytes(range(len(ACTIONS)))):
+        raise ValueError("Неизвестный код хода в журнале")
+    return replay(seed, moves, game_class)
+
+
+def verify_score(data, score, game_class=BitboardTetrisGame):
+    """True, если повтор журнала дает ровно score очков"""
+    try:
+        return replay_log(data, game_class).score == score
+    except (ValueError, struct.error):
+        return False
@@ -0,0 +1,35 @@
+"""Генератор фигур партии: xorshift32 с состоянием в одном целом числе.
+
+У каждой игры свое зерно (seed), поэтому последовательность фигур зависит
+только от зерна, а не от глобального random и других партий процесса.
+Партию можно повторить по зерну и журналу ходов (game/replay.py).
+random.Random на игру занимал бы около 2,5 КБ; здесь состояние - одно
+число в слоте игры, и оно сохраняется вместе с игрой (game/state.py).
+"""
+import random
+
+MASK = 0xFFFFFFFF
+# Подмешивается к зерну, чтобы нулевое зерно не давало нулевое состояние
+SEED_MIX = 0x9E3779B9
+
+
+def new_seed():
+    """Случайное 32-битное зерно для новой партии"""
+    return random.getrandbits(32)
+
+
+def seed_state(seed):
+    """Начальное состояние генератора по зерну; xorshift не выходит из нуля"""
+    return (seed ^ SEED_MIX) & MASK or SEED_MIX
+
+
+def next_state(state):
+    state ^= (state << 13) & MASK
+    state ^= state >> 17
+    state ^= (state << 5) & MASK
+    return state
+
+
+def pick(state, count):
+    """Число от 0 до count - 1 по старшим битам состояния"""
+    return (state * count) >> 32
@@ -0,0 +1,61 @@
+"""Компактный снимок игры для отрисовки.
+
+Снимок - это несколько байт с параметрами фигуры и по байту на клетку поля
+(индекс цвета + 1). Его дешево хэшировать и передавать в процессы-рендереры
+вместо целого объекта игры.
+"""
+import struct
+from config import COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.pieces import ROTATIONS
+
+HEADER = struct.Struct('<BBbbBb')
+COLOR_CODES = {color: i + 1 for i, color in enumerate(COLORS)}
+PALETTE = (0,) + tuple(COLORS)
+
+
+class FrameState:
+    """Минимальный набор полей игры, который нужен рендереру"""
+    __slots__ = ('board', 'shape_idx', 'rotation', 'current_piece', 'piece_x', 'piece_y', 'piece_color', 'game_over', 'ghost_y')
+    
+    def __init__(self, board, shape_idx, rotation, piece_x, piece_y, game_over, ghost_y=None):
+        self.board = board
+        self.shape_idx = shape_idx
+        self.rotation = rotation
+        self.current_piece = ROTATIONS[shape_idx][rotation]
+        self.piece_x = piece_x
+        self.piece_y = piece_y
+        self.piece_color = COLORS[shape_idx]
+        self.game_over = game_over
+        self.ghost_y = ghost_y
+    
+    def ghost_position(self):
+        if self.game_over or self.ghost_y is None:
+            return None
+        return self.piece_x, self.ghost_y
+
+
+def board_codes(game):
+    """Возвращает поле в виде байтов: индекс цвета + 1 для каждой клетки"""
+    colors = getattr(game, 'colors', None)
+    if colors is not None:
+        return bytes(colors)
+    return bytes(COLOR_CODES[c] if c else 0 for row in game.board for c in row)
+
+
+def snapshot_game(game):
+    """Упаковывает состояние игры, видимое на кадре"""
+    ghost = game.ghost_position()
+    ghost_y = ghost[1] if ghost else -1
+    header = HEADER.pack(game.shape_idx, game.rotation, game.piece_x, game.piece_y, game.game_over, ghost_y)
+    return header + board_codes(game)
+
+
+def restore_frame_state(snapshot):
+    """Восстанавливает FrameState из снимка"""
+    shape_idx, rotation, piece_x, piece_y, game_over, ghost_y = HEADER.unpack_from(snapshot)
+    codes = snapshot[HEADER.size:]
+    board = [
+        [PALETTE[c] for c in codes[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]]
+        for y in range(BOARD_HEIGHT)
+    ]
+    return FrameState(board, shape_idx, rotation, piece_x, piece_y, bool(game_over), ghost_y if ghost_y >= 0 else None)
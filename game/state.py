@@ -0,0 +1,90 @@
+"""Двоичная сериализация игры для хранилища сессий.
+
+В отличие от снимка кадра (game/snapshot.py), здесь сохраняется все, что
+нужно, чтобы продолжить партию: фигура и ее позиция, очки, уровень, число
+линий, зерно и состояние генератора фигур, поле и журнал ходов
+(game/replay.py). Клетка поля занимает полбайта (индекс цвета + 1), поэтому
+игра на поле 10x20 укладывается в 124 байта и байт на каждый ход. Занятость
+клеток, битовые маски строк и высоты колонок восстанавливаются из цветов.
+"""
+import operator
+import struct
+from config import COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.snapshot import board_codes
+from game.rng import new_seed, seed_state
+
+VERSION = 2
+# Версия, фигура, поворот, x, y, флаги, очки, уровень, линии, зерно, состояние генератора
+HEADER = struct.Struct('<BBBbbBIHIII')
+# Версия 1: без генератора и журнала ходов
+HEADER_V1 = struct.Struct('<BBBbbBIHI')
+CELLS = BOARD_WIDTH * BOARD_HEIGHT
+BOARD_BYTES = (CELLS + 1) // 2
+
+FLAG_GAME_OVER = 1
+# Партия восстановлена из версии 1: начала нет, журнал ходов неполный
+FLAG_NO_SEED = 2
+
+
+# Таблицы для bytes.translate: сдвиг кода в старшие полбайта и разбор байта на половины
+_HIGH = bytes((i << 4) & 0xFF for i in range(256))
+_LOW_HALF = bytes(i & 0x0F for i in range(256))
+_HIGH_HALF = bytes(i >> 4 for i in range(256))
+
+
+def _pack_codes(codes):
+    """Два кода клеток в байте: четная клетка - в младших битах"""
+    if len(codes) % 2:
+        codes += b'\x00'
+    return bytes(map(operator.or_, codes[::2], codes[1::2].translate(_HIGH)))
+
+
+def _unpack_codes(data):
+    codes = bytearray(len(data) * 2)
+    codes[::2] = data.translate(_LOW_HALF)
+    codes[1::2] = data.translate(_HIGH_HALF)
+    return bytes(codes[:CELLS])
+
+
+def pack_game(game):
+    """Упаковывает игру в байты"""
+    flags = FLAG_GAME_OVER if game.game_over else 0
+    if game.seed is None:
+        flags |= FLAG_NO_SEED
+    header = HEADER.pack(
+        VERSION, game.shape_idx, game.rotation, game.piece_x, game.piece_y, flags,
+        game.score, game.level, game.lines_cleared, game.seed or 0, game.rng
+    )
+    return header + _pack_codes(board_codes(game)) + game.moves
+
+
+def unpack_game(data, game_class):
+    """Восстанавливает игру класса game_class (TetrisGame или BitboardTetrisGame) из байтов"""
+    if data[0] == 1:
+        version, shape_idx, rotation, piece_x, piece_y, flags, score, level, lines = HEADER_V1.unpack_from(data)
+        # Дальше фигуры выбирает новый генератор; повторить такую партию нельзя
+        seed = None
+        rng = seed_state(new_seed())
+        flags |= FLAG_NO_SEED
+        header_size = HEADER_V1.size
+    else:
+        version, shape_idx, rotation, piece_x, piece_y, flags, score, level, lines, seed, rng = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Неизвестная версия состояния игры: {version}")
+        header_size = HEADER.size
+    # Конструктор начал бы новую партию и выбрал случайную фигуру
+    game = game_class.__new__(game_class)
+    game.load_board(_unpack_codes(data[header_size:header_size + BOARD_BYTES]))
+    game.shape_idx = shape_idx
+    game.rotation = rotation
+    game.piece_color = COLORS[shape_idx]
+    game.piece_x = piece_x
+    game.piece_y = piece_y
+    game.game_over = bool(flags & FLAG_GAME_OVER)
+    game.score = score
+    game.level = level
+    game.lines_cleared = lines
+    game.seed = None if flags & FLAG_NO_SEED else seed
+    game.rng = rng
+    game.moves = bytearray(data[header_size + BOARD_BYTES:])
+    return game
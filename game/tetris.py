@@ -1,118 +1,199 @@
-import random
-from config import SHAPES, COLORS, BOARD_WIDTH, BOARD_HEIGHT
-
-class TetrisGame:
-    def __init__(self):
-        self.reset()
-    
-    def reset(self):
-        self.board = [[0 for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-        self.game_over = False
-        self.next_piece()
-    
-    def next_piece(self):
-        shape_idx = random.randint(0, len(SHAPES) - 1)
-        self.current_piece = SHAPES[shape_idx]
-        self.piece_color = COLORS[shape_idx]
-        self.piece_x = BOARD_WIDTH // 2 - len(self.current_piece[0]) // 2
-        self.piece_y = 0
-        
-        if self.check_collision(self.piece_x, self.piece_y, self.current_piece):
-            self.game_over = True
-    
-    def check_collision(self, x, y, piece):
-        for i, row in enumerate(piece):
-            for j, cell in enumerate(row):
-                if cell:
-                    if (x + j < 0 or x + j >= BOARD_WIDTH or 
-                        y + i >= BOARD_HEIGHT or 
-                        (y + i >= 0 and self.board[y + i][x + j])):
-                        return True
-        return False
-    
-    def move(self, dx, dy):
-        if self.game_over:
-            return False
-            
-        new_x = self.piece_x + dx
-        new_y = self.piece_y + dy
-        
-        if not self.check_collision(new_x, new_y, self.current_piece):
-            self.piece_x = new_x
-            self.piece_y = new_y
-            return True
-        return False
-    
-    def rotate(self):
-        if self.game_over:
-            return False
-            
-        rotated = list(zip(*self.current_piece[::-1]))
-        rotated = [list(row) for row in rotated]
-        
-        if not self.check_collision(self.piece_x, self.piece_y, rotated):
-            self.current_piece = rotated
-            return True
-        
-        # Попробуем сдвинуть при коллизии
-        for dx in [-1, 1, -2, 2]:
-            if not self.check_collision(self.piece_x + dx, self.piece_y, rotated):
-                self.piece_x += dx
-                self.current_piece = rotated
-                return True
-        return False
-    
-    def drop(self):
-        if self.game_over:
-            return False
-            
-        score_earned = 0
-        while self.move(0, 1):
-            score_earned += 1
-        
-        self.score += score_earned  # Бонус за быстрое падение
-        self.lock_piece()
-        return True
-    
-    def lock_piece(self):
-        for i, row in enumerate(self.current_piece):
-            for j, cell in enumerate(row):
-                if cell and 0 <= self.piece_y + i < BOARD_HEIGHT:
-                    self.board[self.piece_y + i][self.piece_x + j] = self.piece_color
-        
-        self.clear_lines()
-        self.next_piece()
-    
-    def clear_lines(self):
-        lines_to_clear = []
-        for i in range(BOARD_HEIGHT):
-            if all(self.board[i]):
-                lines_to_clear.append(i)
-        
-        # Удаляем заполненные линии
-        for line in sorted(lines_to_clear, reverse=True):
-            del self.board[line]
-        
-        # Добавляем новые пустые линии сверху
-        for _ in lines_to_clear:
-            self.board.insert(0, [0 for _ in range(BOARD_WIDTH)])
-        
-        # Начисляем очки
-        if lines_to_clear:
-            self.lines_cleared += len(lines_to_clear)
-            line_scores = {1: 100, 2: 300, 3: 500, 4: 800}
-            self.score += line_scores.get(len(lines_to_clear), 800)
-            self.level = self.lines_cleared // 10 + 1
-    
-    def get_game_state(self):
-        """Возвращает состояние игры для отображения"""
-        return {
-            'score': self.score,
-            'level': self.level,
-            'lines_cleared': self.lines_cleared,
-            'game_over': self.game_over,
-            'next_piece_shape': len(self.current_piece) if hasattr(self, 'current_piece') else 0
-        }
\ No newline at end of file
+from config import SHAPES, COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.rng import new_seed, seed_state, next_state, pick
+from game.pieces import ROTATIONS, CELLS, KICKS, BOTTOMS, SPAWN_WIDTHS, ROTATION_COUNT
+
+class TetrisGame:
+    # Без __dict__: игр в памяти столько же, сколько активных чатов
+    __slots__ = ('colors', 'heights', 'score', 'level', 'lines_cleared', 'game_over',
+                 'shape_idx', 'rotation', 'piece_color', 'piece_x', 'piece_y', 'seed', 'rng', 'moves')
+    
+    def __init__(self, seed=None):
+        # Зерно генератора фигур: одно и то же зерно и те же ходы дают ту же партию
+        self.seed = new_seed() if seed is None else seed
+        self.reset()
+    
+    def reset(self):
+        self.rng = seed_state(self.seed)
+        # Журнал ходов партии, байт на ход (коды из game/replay.py)
+        self.moves = bytearray()
+        # Поле - один массив байтов по строкам: код цвета клетки (индекс в COLORS + 1,
+        # 0 - пусто) вместо списков кортежей цветов
+        self.colors = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        # Верхняя занятая строка каждой колонки (BOARD_HEIGHT - колонка пуста)
+        self.heights = [BOARD_HEIGHT] * BOARD_WIDTH
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.game_over = False
+        self.next_piece()
+    
+    def load_board(self, codes):
+        """Заполняет поле из байтов цветов (индекс цвета + 1, 0 - пусто) и пересчитывает высоты"""
+        self.colors = bytearray(codes)
+        self.heights = [BOARD_HEIGHT] * BOARD_WIDTH
+        for y in range(BOARD_HEIGHT - 1, -1, -1):
+            for x, c in enumerate(self.colors[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]):
+                if c:
+                    self.heights[x] = y
+    
+    @property
+    def board(self):
+        """Поле с цветом или 0 в каждой клетке для рендерера"""
+        palette = (0,) + tuple(COLORS)
+        colors = self.colors
+        return [[palette[c] for c in colors[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]] for y in range(BOARD_HEIGHT)]
+    
+    @property
+    def current_piece(self):
+        return ROTATIONS[self.shape_idx][self.rotation]
+    
+    def next_piece(self):
+        self.rng = next_state(self.rng)
+        shape_idx = pick(self.rng, len(SHAPES))
+        self.shape_idx = shape_idx
+        self.rotation = 0
+        self.piece_color = COLORS[shape_idx]
+        self.piece_x = BOARD_WIDTH // 2 - SPAWN_WIDTHS[shape_idx] // 2
+        self.piece_y = 0
+        
+        if self._collides(self.piece_x, self.piece_y, CELLS[shape_idx][0]):
+            self.game_over = True
+    
+    def _collides(self, x, y, cells):
+        """Проверяет коллизию по заранее рассчитанным смещениям клеток"""
+        board = self.colors
+        for i, j in cells:
+            col = x + j
+            row = y + i
+            if col < 0 or col >= BOARD_WIDTH or row >= BOARD_HEIGHT or (row >= 0 and board[row * BOARD_WIDTH + col]):
+                return True
+        return False
+    
+    def check_collision(self, x, y, piece):
+        cells = [(i, j) for i, row in enumerate(piece) for j, cell in enumerate(row) if cell]
+        return self._collides(x, y, cells)
+    
+    def move(self, dx, dy):
+        if self.game_over:
+            return False
+        
+        new_x = self.piece_x + dx
+        new_y = self.piece_y + dy
+        
+        if not self._collides(new_x, new_y, CELLS[self.shape_idx][self.rotation]):
+            self.piece_x = new_x
+            self.piece_y = new_y
+            return True
+        return False
+    
+    def rotate(self):
+        if self.game_over:
+            return False
+        
+        rotation = (self.rotation + 1) % ROTATION_COUNT
+        cells = CELLS[self.shape_idx][rotation]
+        
+        # При коллизии пробуем сдвинуть фигуру
+        for dx in KICKS:
+            if not self._collides(self.piece_x + dx, self.piece_y, cells):
+                self.piece_x += dx
+                self.rotation = rotation
+                return True
+        return False
+    
+    def drop(self):
+        if self.game_over:
+            return False
+        
+        landing_y = self._landing_y()
+        self.score += landing_y - self.piece_y  # Бонус за быстрое падение
+        self.piece_y = landing_y
+        self.lock_piece()
+        return True
+    
+    def _landing_y(self):
+        """Строка, на которую упадет текущая фигура, по индексу высот колонок"""
+        x = self.piece_x
+        y = self.piece_y
+        heights = self.heights
+        landing_y = BOARD_HEIGHT
+        for j, bottom in BOTTOMS[self.shape_idx][self.rotation]:
+            top = heights[x + j]
+            if y + bottom >= top:
+                # Фигура задвинута под навес - ищем опору перебором
+                cells = CELLS[self.shape_idx][self.rotation]
+                while not self._collides(x, y + 1, cells):
+                    y += 1
+                return y
+            landing_y = min(landing_y, top - 1 - bottom)
+        return landing_y
+    
+    def ghost_position(self):
+        """Позиция (x, y), в которой приземлится текущая фигура, или None после окончания игры"""
+        if self.game_over:
+            return None
+        return self.piece_x, self._landing_y()
+    
+    def lock_piece(self):
+        heights = self.heights
+        color_idx = self.shape_idx + 1
+        for i, j in CELLS[self.shape_idx][self.rotation]:
+            row = self.piece_y + i
+            if 0 <= row < BOARD_HEIGHT:
+                col = self.piece_x + j
+                self.colors[row * BOARD_WIDTH + col] = color_idx
+                if row < heights[col]:
+                    heights[col] = row
+        
+        self.clear_lines()
+        self.next_piece()
+    
+    def clear_lines(self):
+        colors = self.colors
+        lines_to_clear = []
+        # Строки выше самой высокой колонки пусты и не могут быть заполнены
+        for i in range(min(self.heights), BOARD_HEIGHT):
+            if 0 not in colors[i * BOARD_WIDTH:(i + 1) * BOARD_WIDTH]:
+                lines_to_clear.append(i)
+        
+        # Удаляем заполненные линии
+        for line in sorted(lines_to_clear, reverse=True):
+            del self.colors[line * BOARD_WIDTH:(line + 1) * BOARD_WIDTH]
+        
+        # Добавляем новые пустые линии сверху
+        self.colors[0:0] = bytes(len(lines_to_clear) * BOARD_WIDTH)
+        
+        if lines_to_clear:
+            self._shift_heights(lines_to_clear)
+        
+        # Начисляем очки
+        if lines_to_clear:
+            self.lines_cleared += len(lines_to_clear)
+            line_scores = {1: 100, 2: 300, 3: 500, 4: 800}
+            self.score += line_scores.get(len(lines_to_clear), 800)
+            self.level = self.lines_cleared // 10 + 1
+    
+    def _shift_heights(self, cleared):
+        """Обновляет индекс высот после удаления строк cleared"""
+        board = self.colors
+        for x, top in enumerate(self.heights):
+            if top >= BOARD_HEIGHT:
+                continue
+            if top in cleared:
+                # Верхний блок сгорел - ищем новый верх колонки
+                top = 0
+                while top < BOARD_HEIGHT and not board[top * BOARD_WIDTH + x]:
+                    top += 1
+                self.heights[x] = top
+            else:
+                self.heights[x] = top + sum(1 for line in cleared if line > top)
+    
+    def get_game_state(self):
+        """Возвращает состояние игры для отображения"""
+        return {
+            'score': self.score,
+            'level': self.level,
+            'lines_cleared': self.lines_cleared,
+            'game_over': self.game_over,
+            'next_piece_shape': len(self.current_piece) if hasattr(self, 'shape_idx') else 0
+        }
@@ -0,0 +1,53 @@
+from config import COLORS, BOARD_WIDTH, BOARD_HEIGHT
+from game.pieces import CELLS
+from game.snapshot import board_codes
+
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+
+EMPTY_GLYPH = "⬛"
+UNKNOWN_GLYPH = "⬜"
+# Цветные квадраты для COLORS: Cyan, Yellow, Purple, Orange, Blue, Green, Red
+COLOR_GLYPHS = ["💠", "🟨", "🟪", "🟧", "🟦", "🟩", "🟥"]
+
+
+class TextRenderer:
+    """Рисует поле строками эмодзи вместо картинки.
+    
+    Каждый цвет из COLORS соответствует своему квадрату. Готовые строки поля
+    кэшируются по содержимому, поэтому кадр собирается из уже построенных строк.
+    """
+    
+    def __init__(self, row_cache_size=4096):
+        glyphs = COLOR_GLYPHS + [UNKNOWN_GLYPH] * (len(COLORS) - len(COLOR_GLYPHS))
+        # Коды клеток совпадают с game.snapshot: 0 - пусто, индекс цвета + 1
+        self.glyphs = [EMPTY_GLYPH] + glyphs[:len(COLORS)]
+        self.row_cache = {}
+        self.row_cache_size = row_cache_size
+        
+        max_length = BOARD_HEIGHT * (BOARD_WIDTH * max(len(g.encode('utf-16-le')) // 2 for g in self.glyphs) + 1)
+        if max_length > MESSAGE_LIMIT:
+            raise ValueError(f"Поле {BOARD_WIDTH}x{BOARD_HEIGHT} не помещается в сообщение Telegram")
+    
+    def _render_row(self, codes):
+        text = self.row_cache.get(codes)
+        if text is None:
+            if len(self.row_cache) >= self.row_cache_size:
+                self.row_cache.clear()
+            glyphs = self.glyphs
+            text = self.row_cache[codes] = "".join([glyphs[c] for c in codes])
+        return text
+    
+    def render(self, game):
+        """Возвращает поле в виде текста"""
+        codes = bytearray(board_codes(game))
+        if not game.game_over:
+            code = game.shape_idx + 1
+            base = game.piece_y * BOARD_WIDTH + game.piece_x
+            for i, j in CELLS[game.shape_idx][game.rotation]:
+                codes[base + i * BOARD_WIDTH + j] = code
+        
+        return "\n".join([
+            self._render_row(bytes(codes[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH]))
+            for y in range(BOARD_HEIGHT)
+        ])
@@ -1,3 +1,4 @@
-from .menu import MenuHandler
-from .records_handler import RecordsHandler
-from .game_handler import GameHandler
\ No newline at end of file
+from .menu import MenuHandler
+from .records_handler import RecordsHandler
+from .game_handler import GameHandler
+from .stats_handler import StatsHandler
@@ -1,206 +1,372 @@
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
-import io
-from game.tetris import TetrisGame
-from game.renderer import GameRenderer
-
-class GameHandler:
-    def __init__(self, records_manager):
-        self.records_manager = records_manager
-        self.renderer = GameRenderer()
-        self.games = {}
-    
-    async def handle_game_action(self, update, context, query, user):
-        """Обработчик игровых действий"""
-        # Игровые действия
-        if query.data in ["left", "right", "down", "rotate", "drop", "end_game"]:
-            await self._handle_game_actions(update, context, query, user)
-    
-    async def _handle_game_actions(self, update, context, query, user):
-        """Обрабатывает игровые действия"""
-        chat_id = query.message.chat_id
-        
-        if query.data == "end_game":
-            # Удаляем игру и показываем меню завершения
-            if chat_id in self.games:
-                del self.games[chat_id]
-            await self._show_game_over_menu(query, user)
-            return
-        
-        if chat_id not in self.games:
-            await self.start_game(update, context, query.message, user)
-            return
-        
-        game = self.games[chat_id]
-        
-        # Игровая логика
-        if query.data == "left": 
-            game.move(-1, 0)
-        elif query.data == "right": 
-            game.move(1, 0)
-        elif query.data == "down": 
-            game.move(0, 1)
-        elif query.data == "rotate": 
-            game.rotate()
-        elif query.data == "drop": 
-            game.drop()
-        
-        if game.game_over:
-            await self._show_game_over(query, user, game)
-        else:
-            await self._update_game_display(query, user, game)
-    
-    async def start_game(self, update, context, message, user):
-        """Начинает новую игру"""
-        chat_id = message.chat_id
-        self.games[chat_id] = TetrisGame()
-        await self._send_game_message(message, user)
-    
-    def _create_game_keyboard(self):
-        """Создает игровую клавиатуру с кнопкой меню"""
-        keyboard = [
-            [
-                InlineKeyboardButton("⬅️", callback_data="left"),
-                InlineKeyboardButton("🔄", callback_data="rotate"),
-                InlineKeyboardButton("➡️", callback_data="right")
-            ],
-            [
-                InlineKeyboardButton("⬇️ Быстрее", callback_data="down"),
-                InlineKeyboardButton("💨 Сбросить", callback_data="drop")
-            ],
-            [
-                InlineKeyboardButton("⏹️ Завершить игру", callback_data="end_game")
-            ],
-            [
-                InlineKeyboardButton("↩️ Главное меню", callback_data="main_menu")  # Добавлена кнопка меню
-            ]
-        ]
-        return keyboard
-    
-    async def _send_game_message(self, message, user):
-        """Отправляет игровое сообщение"""
-        chat_id = message.chat_id
-        game = self.games[chat_id]
-        
-        # Создаем изображение игры
-        try:
-            img = self.renderer.create_game_image(game)
-            bio = io.BytesIO()
-            img.save(bio, 'PNG')
-            bio.seek(0)
-            
-            keyboard = self._create_game_keyboard()
-            text = self._create_game_status_text(user, game)
-            
-            await message.reply_photo(
-                photo=bio,
-                caption=text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            print(f"Ошибка создания изображения: {e}")
-            # Если не удалось создать изображение, отправляем текстовую версию
-            keyboard = self._create_game_keyboard()
-            text = self._create_game_status_text(user, game) + "\n\n🖼️ Не удалось загрузить изображение игры"
-            
-            await message.reply_text(
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-    
-    async def _update_game_display(self, query, user, game):
-        """Обновляет игровое сообщение"""
-        try:
-            # Пытаемся обновить как медиа (фото с подписью)
-            img = self.renderer.create_game_image(game)
-            bio = io.BytesIO()
-            img.save(bio, 'PNG')
-            bio.seek(0)
-            
-            keyboard = self._create_game_keyboard()
-            text = self._create_game_status_text(user, game)
-            
-            await query.edit_message_media(
-                media=InputMediaPhoto(media=bio, caption=text, parse_mode='Markdown'),
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-        except Exception as e:
-            print(f"Ошибка обновления медиа: {e}")
-            # Если не удалось обновить медиа, пробуем обновить текст
-            try:
-                keyboard = self._create_game_keyboard()
-                text = self._create_game_status_text(user, game) + "\n\n🖼️ Не удалось обновить изображение"
-                
-                await query.edit_message_text(
-                    text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-            except Exception as e2:
-                print(f"Ошибка обновления текста: {e2}")
-                # Если и это не удалось, отправляем новое сообщение
-                await self._send_game_message(query.message, user)
-    
-    async def _show_game_over(self, query, user, game):
-        """Показывает экран окончания игры"""
-        user_data = {'username': user.username, 'first_name': user.first_name}
-        self.records_manager.update_record(user.id, user_data, game.score)
-        
-        # Удаляем игру
-        chat_id = query.message.chat_id
-        if chat_id in self.games:
-            del self.games[chat_id]
-        
-        text = f"💀 **Игра окончена!**\n⭐ Очки: **{game.score}**"
-        keyboard = [
-            [InlineKeyboardButton("🎮 Новая игра", callback_data="play_game")],
-            [InlineKeyboardButton("📊 Моя статистика", callback_data="my_stats")],
-            [InlineKeyboardButton("🏆 Таблица рекордов", callback_data="show_records")],
-            [InlineKeyboardButton("↩️ Главное меню", callback_data="main_menu")]
-        ]
-        
-        await self._safe_edit_message(query, text, keyboard)
-    
-    async def _show_game_over_menu(self, query, user):
-        """Показывает меню после досрочного завершения игры"""
-        chat_id = query.message.chat_id
-        game = self.games.get(chat_id)
-        score = game.score if game else 0
-        
-        if game:
-            user_data = {'username': user.username, 'first_name': user.first_name}
-            self.records_manager.update_record(user.id, user_data, score)
-            if chat_id in self.games:
-                del self.games[chat_id]
-        
-        text = f"⏹️ **Игра завершена**\n⭐ Набрано очков: **{score}**"
-        keyboard = [
-            [InlineKeyboardButton("🎮 Новая игра", callback_data="play_game")],
-            [InlineKeyboardButton("📊 Моя статистика", callback_data="my_stats")],
-            [InlineKeyboardButton("🏆 Таблица рекордов", callback_data="show_records")],
-            [InlineKeyboardButton("↩️ Главное меню", callback_data="main_menu")]
-        ]
-        
-        await self._safe_edit_message(query, text, keyboard)
-    
-    def _create_game_status_text(self, user, game):
-        """Создает текст статуса игры"""
-        return f"🎮 **Игра Тетрис**\n👤 Игрок: {user.first_name}\n⭐ Очки: **{game.score}**\n📊 Уровень: **{game.level}**"
-    
-    async def _safe_edit_message(self, query, text, keyboard):
-        """Безопасно редактирует сообщение с обработкой ошибок"""
-        try:
-            await query.edit_message_text(
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            print(f"Ошибка редактирования сообщения: {e}")
-            # Если не удалось отредактировать, отправляем новое сообщение
-            await query.message.reply_text(
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
\ No newline at end of file
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, RetryAfter
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from game.tetris import TetrisGame
+from game.bitboard import BitboardTetrisGame
+from game.renderer import AtlasRenderer, SessionRenderer
+from game.frame_cache import FrameCache
+from game.render_pool import RenderExecutor
+from game.snapshot import snapshot_game
+from game.encoders import frame_filename
+from game.text_renderer import TextRenderer
+from game.replay import ACTIONS, play, pack_log
+from database.session_store import GameSessions
+from handlers.keyboards import GAME_KEYBOARDS, GAME_OVER_KEYBOARD
+from handlers.outbound import OutboundScheduler
+from config import GAME_ENGINE, INCREMENTAL_RENDER, DISPLAY_MODE, SESSION_MAX_RENDERERS, SESSION_RENDERER_TTL
+from metrics import STAGE_SECONDS
+
+class GameHandler:
+    def __init__(self, records_manager, sessions=None, outbound=None):
+        self.records_manager = records_manager
+        self.game_class = BitboardTetrisGame if GAME_ENGINE == "bitboard" else TetrisGame
+        self.render_executor = RenderExecutor()
+        self.atlas = AtlasRenderer() if INCREMENTAL_RENDER else None
+        # chat_id -> (кадр сессии, время последнего кадра), от давних к свежим
+        self.session_renderers = OrderedDict()
+        self.rendering_chats = set()
+        self.frame_cache = FrameCache()
+        self.text_renderer = TextRenderer()
+        # Режим отображения по чатам с игрой: "image" или "text"; без записи - DISPLAY_MODE
+        self.display_modes = {}
+        # Чаты, где кадр сейчас рисуется или отправляется
+        self.pending_displays = {}
+        self.presses = 0
+        self.frames = 0
+        # Активные игры по чатам (хранилище сессий)
+        self.games = sessions if sessions is not None else GameSessions(self.game_class)
+        self.games.on_evict = self._on_session_evicted
+        # Все запросы к Telegram идут через планировщик с лимитами
+        self.outbound = outbound if outbound is not None else OutboundScheduler()
+    
+    async def handle_game_action(self, update, context, query, user):
+        """Обработчик игровых действий"""
+        # Игровые действия
+        if query.data in ACTIONS or query.data == "end_game":
+            await self._handle_game_actions(update, context, query, user)
+        elif query.data == "toggle_view":
+            await self._toggle_display_mode(update, context, query, user)
+    
+    async def _handle_game_actions(self, update, context, query, user):
+        """Обрабатывает игровые действия"""
+        chat_id = query.message.chat_id
+        
+        if query.data == "end_game":
+            # Удаляем игру и показываем меню завершения
+            self._end_session(chat_id)
+            await self._show_game_over_menu(query, user)
+            return
+        
+        game = self.games.get(chat_id)
+        if game is None:
+            await self.start_game(update, context, query.message, user)
+            return
+        if game.game_over:
+            # Конец игры уже показывается; нажатия до этого не меняют игру и журнал
+            return
+        
+        # Игровая логика; ход записывается в журнал партии
+        start = time.perf_counter()
+        play(game, query.data)
+        STAGE_SECONDS.observe(time.perf_counter() - start, "game")
+        self.games.put(chat_id, game)
+        self.presses += 1
+        
+        state = self.pending_displays.get(chat_id)
+        if state is not None:
+            # Кадр еще в работе: нажатие уже применено, покажем итог одним кадром после него
+            state.update(query=query, user=user, dirty=True)
+            return
+        state = self.pending_displays[chat_id] = {'query': query, 'user': user, 'dirty': True}
+        # Ссылка на задачу хранится, чтобы ее не удалил сборщик мусора
+        state['task'] = asyncio.create_task(self._display_loop(chat_id, state))
+    
+    async def _display_loop(self, chat_id, state):
+        """Показывает последнее состояние игры, пока приходят новые нажатия"""
+        try:
+            while state['dirty']:
+                state['dirty'] = False
+                game = self.games.get(chat_id)
+                if game is None:
+                    # Игру завершили кнопкой, пока шла отправка кадра
+                    break
+                self.frames += 1
+                if game.game_over:
+                    await self._show_game_over(state['query'], state['user'], game)
+                    break
+                await self._update_game_display(state['query'], state['user'], game)
+        except Exception as e:
+            print(f"Ошибка обновления игры: {e}")
+        finally:
+            del self.pending_displays[chat_id]
+    
+    def get_input_stats(self):
+        """Возвращает число нажатий, кадров и сэкономленных кадров"""
+        return {
+            'presses': self.presses,
+            'frames': self.frames,
+            'frames_saved': self.presses - self.frames,
+            'presses_per_frame': self.presses / self.frames if self.frames else 0.0
+        }
+    
+    async def start_game(self, update, context, message, user):
+        """Начинает новую игру"""
+        chat_id = message.chat_id
+        # Новая игра в чате остается в выбранном режиме
+        self._drop_game(chat_id)
+        self.games.put(chat_id, self.game_class())
+        await self._send_game_message(message, user)
+    
+    def _get_display_mode(self, chat_id):
+        return self.display_modes.get(chat_id, DISPLAY_MODE)
+    
+    async def _toggle_display_mode(self, update, context, query, user):
+        """Переключает отображение поля между картинкой и текстом"""
+        chat_id = query.message.chat_id
+        mode = "image" if self._get_display_mode(chat_id) == "text" else "text"
+        self.display_modes[chat_id] = mode
+        
+        if chat_id not in self.games:
+            await self.start_game(update, context, query.message, user)
+            return
+        
+        # Фото нельзя превратить в текстовое сообщение, поэтому отправляем новое
+        await self._send_game_message(query.message, user)
+    
+    def _game_keyboard(self, display_mode="image"):
+        """Возвращает игровую клавиатуру для режима отображения"""
+        return GAME_KEYBOARDS[display_mode]
+    
+    def _end_session(self, chat_id):
+        """Удаляет игру чата, освобождает ее кадр и забывает режим отображения"""
+        self._drop_game(chat_id)
+        self.display_modes.pop(chat_id, None)
+    
+    def _drop_game(self, chat_id):
+        """Удаляет игру чата и освобождает ее кадр"""
+        self.games.delete(chat_id)
+        state = self.pending_displays.get(chat_id)
+        if state is not None:
+            # Отложенный кадр относится к завершенной игре
+            state['dirty'] = False
+        self.session_renderers.pop(chat_id, None)
+    
+    def _on_session_evicted(self, chat_id):
+        """Игра ушла из памяти: кадр сессии нарисуется заново, если игру продолжат.
+        
+        Режим отображения тоже забывается, иначе записи копились бы для
+        каждого чата; продолженная игра показывается в режиме DISPLAY_MODE.
+        """
+        self.session_renderers.pop(chat_id, None)
+        self.display_modes.pop(chat_id, None)
+    
+    async def _render_frame(self, chat_id, game):
+        """Возвращает закодированный кадр, по возможности из кэша"""
+        snapshot = snapshot_game(game)
+        key = self.frame_cache.make_key(snapshot)
+        data = self.frame_cache.get(key)
+        if data is None:
+            session = None
+            # Холст сессии нельзя рисовать из двух задач сразу (кадр из фоновой
+            # задачи и, например, переключение вида); второй кадр рисуется целиком
+            if self.atlas is not None and chat_id not in self.rendering_chats:
+                session = self._session_renderer(chat_id)
+                self.rendering_chats.add(chat_id)
+            try:
+                data = await self.render_executor.render(snapshot, session)
+            finally:
+                if session is not None:
+                    self.rendering_chats.discard(chat_id)
+            self.frame_cache.put(key, data)
+        return data
+    
+    def _session_renderer(self, chat_id):
+        """Кадр сессии чата; давние и лишние кадры освобождаются"""
+        now = time.monotonic()
+        entry = self.session_renderers.pop(chat_id, None)
+        session = entry[0] if entry is not None else SessionRenderer(self.atlas)
+        renderers = self.session_renderers
+        while renderers:
+            old_chat_id, (_, last_used) = next(iter(renderers.items()))
+            if len(renderers) < SESSION_MAX_RENDERERS and now - last_used <= SESSION_RENDERER_TTL:
+                break
+            # Кадр, который сейчас рисуется, освободится после отрисовки
+            del renderers[old_chat_id]
+        renderers[chat_id] = (session, now)
+        return session
+    
+    async def shutdown(self):
+        """Останавливает отправку, пул рендеринга и закрывает хранилище сессий"""
+        await self.outbound.stop()
+        self.render_executor.shutdown()
+        self.games.close()
+    
+    def _photo_file(self, data):
+        """Файл кадра для загрузки в Telegram; при повторе запроса нужен новый"""
+        bio = io.BytesIO(data)
+        bio.name = frame_filename()
+        return bio
+    
+    def _send(self, message, call, replaceable=True):
+        """Отправляет запрос про сообщение через планировщик.
+        
+        Изменение сообщения, которое еще ждет очереди, заменяется следующим
+        изменением того же сообщения; None - запрос заменен.
+        """
+        key = (message.chat_id, message.message_id) if replaceable else None
+        return self.outbound.send(message.chat_id, call, key)
+    
+    def _create_text_board_message(self, user, game):
+        """Создает сообщение с полем в текстовом режиме"""
+        return self._create_game_status_text(user, game) + "\n\n" + self.text_renderer.render(game)
+    
+    async def _send_game_message(self, message, user):
+        """Отправляет игровое сообщение"""
+        chat_id = message.chat_id
+        game = self.games.get(chat_id)
+        
+        if self._get_display_mode(chat_id) == "text":
+            text = self._create_text_board_message(user, game)
+            await self._send(message, lambda: message.reply_text(
+                text,
+                reply_markup=self._game_keyboard("text"),
+                parse_mode='Markdown'
+            ), replaceable=False)
+            return
+        
+        # Подпись берется вместе со снимком поля: пока кадр рисуется, игра может уйти вперед
+        text = self._create_game_status_text(user, game)
+        # Создаем изображение игры
+        try:
+            data = await self._render_frame(chat_id, game)
+            
+            keyboard = self._game_keyboard()
+            
+            await self._send(message, lambda: message.reply_photo(
+                photo=self._photo_file(data),
+                caption=text,
+                reply_markup=keyboard,
+                parse_mode='Markdown'
+            ), replaceable=False)
+        except RetryAfter as e:
+            # Telegram ограничил чат: еще один запрос сделает только хуже
+            print(f"Сообщение игры не отправлено: {e}")
+        except Exception as e:
+            print(f"Ошибка создания изображения: {e}")
+            # Если не удалось создать изображение, отправляем текстовую версию
+            keyboard = self._game_keyboard()
+            fallback = text + "\n\n🖼️ Не удалось загрузить изображение игры"
+            
+            await self._send(message, lambda: message.reply_text(
+                fallback,
+                reply_markup=keyboard,
+                parse_mode='Markdown'
+            ), replaceable=False)
+    
+    async def _update_text_display(self, query, user, game):
+        """Обновляет игровое сообщение в текстовом режиме"""
+        text = self._create_text_board_message(user, game)
+        try:
+            await self._send(query.message, lambda: query.edit_message_text(
+                text,
+                reply_markup=self._game_keyboard("text"),
+                parse_mode='Markdown'
+            ))
+        except RetryAfter as e:
+            print(f"Поле не обновлено: {e}")
+        except BadRequest as e:
+            # Ход упирался в стену - поле не изменилось, обновлять нечего
+            if "not modified" in str(e):
+                return
+            print(f"Ошибка обновления текста: {e}")
+            await self._send_game_message(query.message, user)
+    
+    async def _update_game_display(self, query, user, game):
+        """Обновляет игровое сообщение"""
+        if self._get_display_mode(query.message.chat_id) == "text":
+            await self._update_text_display(query, user, game)
+            return
+        
+        # Подпись - к тому же состоянию игры, что и снимок для кадра
+        text = self._create_game_status_text(user, game)
+        try:
+            # Пытаемся обновить как медиа (фото с подписью)
+            data = await self._render_frame(query.message.chat_id, game)
+            
+            keyboard = self._game_keyboard()
+            
+            await self._send(query.message, lambda: query.edit_message_media(
+                media=InputMediaPhoto(media=self._photo_file(data), caption=text, parse_mode='Markdown'),
+                reply_markup=keyboard
+            ))
+        except RetryAfter as e:
+            # Кадр не дошел после всех повторов; следующий кадр покажет игру
+            print(f"Кадр не обновлен: {e}")
+        except Exception as e:
+            print(f"Ошибка обновления медиа: {e}")
+            # Если не удалось обновить медиа, пробуем обновить текст
+            try:
+                keyboard = self._game_keyboard()
+                fallback = text + "\n\n🖼️ Не удалось обновить изображение"
+                
+                await self._send(query.message, lambda: query.edit_message_text(
+                    fallback,
+                    reply_markup=keyboard,
+                    parse_mode='Markdown'
+                ))
+            except Exception as e2:
+                print(f"Ошибка обновления текста: {e2}")
+                # Если и это не удалось, отправляем новое сообщение
+                await self._send_game_message(query.message, user)
+    
+    async def _show_game_over(self, query, user, game):
+        """Показывает экран окончания игры"""
+        user_data = {'username': user.username, 'first_name': user.first_name}
+        self.records_manager.update_record(user.id, user_data, game.score, replay=pack_log(game))
+        
+        # Удаляем игру
+        self._end_session(query.message.chat_id)
+        
+        text = f"💀 **Игра окончена!**\n⭐ Очки: **{game.score}**"
+        await self._safe_edit_message(query, text, GAME_OVER_KEYBOARD)
+    
+    async def _show_game_over_menu(self, query, user):
+        """Показывает меню после досрочного завершения игры"""
+        chat_id = query.message.chat_id
+        game = self.games.get(chat_id)
+        score = game.score if game else 0
+        
+        if game:
+            user_data = {'username': user.username, 'first_name': user.first_name}
+            self.records_manager.update_record(user.id, user_data, score, replay=pack_log(game))
+            self._end_session(chat_id)
+        
+        text = f"⏹️ **Игра завершена**\n⭐ Набрано очков: **{score}**"
+        await self._safe_edit_message(query, text, GAME_OVER_KEYBOARD)
+    
+    def _create_game_status_text(self, user, game):
+        """Создает текст статуса игры"""
+        return f"🎮 **Игра Тетрис**\n👤 Игрок: {user.first_name}\n⭐ Очки: **{game.score}**\n📊 Уровень: **{game.level}**"
+    
+    async def _safe_edit_message(self, query, text, keyboard):
+        """Безопасно редактирует сообщение с обработкой ошибок"""
+        try:
+            # Заменяет кадр этого сообщения, если тот еще не ушел
+            await self._send(query.message, lambda: query.edit_message_text(
+                text,
+                reply_markup=keyboard,
+                parse_mode='Markdown'
+            ))
+        except RetryAfter as e:
+            print(f"Сообщение не отредактировано: {e}")
+        except Exception as e:
+            print(f"Ошибка редактирования сообщения: {e}")
+            # Если не удалось отредактировать, отправляем новое сообщение
+            await self._send(query.message, lambda: query.message.reply_text(
+                text,
+                reply_markup=keyboard,
+                parse_mode='Markdown'
+            ), replaceable=False)
@@ -0,0 +1,63 @@
+"""Клавиатуры бота.
+
+Все клавиатуры постоянные, поэтому собираются один раз при импорте.
+InlineKeyboardMarkup в PTB неизменяемый, и один объект можно отдавать
+во все сообщения.
+"""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def _markup(rows):
+    """Собирает клавиатуру из рядов пар (текст, callback_data)"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in rows
+    ])
+
+
+def _game_keyboard(view_button):
+    return _markup([
+        [("⬅️", "left"), ("🔄", "rotate"), ("➡️", "right")],
+        [("⬇️ Быстрее", "down"), ("💨 Сбросить", "drop")],
+        [view_button, ("⏹️ Завершить игру", "end_game")],
+        [("↩️ Главное меню", "main_menu")]
+    ])
+
+
+# Игровая клавиатура для каждого режима отображения; кнопка переключает на другой режим
+GAME_KEYBOARDS = {
+    "image": _game_keyboard(("🔤 Текстом", "toggle_view")),
+    "text": _game_keyboard(("🖼️ Картинкой", "toggle_view"))
+}
+
+GAME_OVER_KEYBOARD = _markup([
+    [("🎮 Новая игра", "play_game")],
+    [("📊 Моя статистика", "my_stats")],
+    [("🏆 Таблица рекордов", "show_records")],
+    [("↩️ Главное меню", "main_menu")]
+])
+
+MAIN_MENU_KEYBOARD = _markup([
+    [("🎮 Начать игру", "play_game")],
+    [("🏆 Таблица рекордов", "show_records")],
+    [("📊 Моя статистика", "my_stats")],
+    [("📖 Правила игры", "show_rules")]
+])
+
+RULES_KEYBOARD = _markup([
+    [("🎮 Начать игру", "play_game")],
+    [("↩️ Главное меню", "main_menu")]
+])
+
+RECORDS_KEYBOARD = _markup([
+    [("🏆 Все время", "show_records"), ("📅 Сегодня", "records_day"), ("🗓️ Неделя", "records_week")],
+    [("📊 Моя статистика", "my_stats")],
+    [("🎮 Начать игру", "play_game")],
+    [("↩️ Главное меню", "main_menu")]
+])
+
+STATS_KEYBOARD = _markup([
+    [("🎮 Играть", "play_game")],
+    [("🏆 Таблица рекордов", "show_records")],
+    [("↩️ Главное меню", "main_menu")]
+])
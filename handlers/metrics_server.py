@@ -0,0 +1,55 @@
+import asyncio
+from config import METRICS_LISTEN, METRICS_PORT
+from handlers.webhook import BadRequest, read_request, write_response
+from metrics import render_prometheus
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """HTTP-сервер метрик для Prometheus: GET /metrics, остальное - 404"""
+    
+    def __init__(self, host=METRICS_LISTEN, port=METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.connections = set()
+        self.scrapes = 0
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def _serve_connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    write_response(writer, e.status, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, _, _ = request
+                if path.split('?', 1)[0] == "/metrics" and method == "GET":
+                    self.scrapes += 1
+                    write_response(writer, 200, render_prometheus().encode(), CONTENT_TYPE)
+                else:
+                    write_response(writer, 404)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+    
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+        self.server = None
@@ -0,0 +1,284 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+from telegram.error import RetryAfter
+from metrics import STAGE_SECONDS, OUTBOUND_WAIT_SECONDS
+from config import (OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_GROUP_RATE,
+                    OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше burst про запас. rate=0 - без лимита"""
+    
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+    
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic() if now is None else now
+    
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def ready_at(self, now):
+        """Момент, когда в ведре будет целый токен"""
+        if not self.rate:
+            return now
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+    
+    def take(self, now):
+        if self.rate:
+            self._refill(now)
+            self.tokens -= 1
+    
+    def is_full(self, now):
+        if not self.rate:
+            return True
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Request:
+    __slots__ = ('key', 'call', 'future', 'submitted', 'retries')
+    
+    def __init__(self, key, call, future, submitted):
+        self.key = key
+        self.call = call
+        self.future = future
+        self.submitted = submitted
+        self.retries = 0
+
+
+class _ChatQueue:
+    __slots__ = ('queue', 'bucket', 'paused_until', 'busy', 'scheduled')
+    
+    def __init__(self, bucket):
+        self.queue = deque()
+        self.bucket = bucket
+        # До этого момента чат молчит после ответа 429
+        self.paused_until = 0.0
+        # Запрос чата сейчас в сети; следующий ждет его, чтобы сохранить порядок
+        self.busy = False
+        # Чат стоит в очереди готовности планировщика
+        self.scheduled = False
+    
+    def ready_at(self, now):
+        return max(self.bucket.ready_at(now), self.paused_until)
+
+
+class OutboundScheduler:
+    """Планировщик исходящих запросов к Bot API с лимитами Telegram.
+    
+    Все сообщения и их изменения идут через send(): запросы чата уходят по
+    одному и в порядке отправки, а частоту ограничивают ведра токенов -
+    общее (global_rate в секунду) и по чату (chat_rate, для групп
+    group_rate, с запасом burst запросов подряд). Запрос с ключом key
+    (обычно чат и id сообщения), который еще ждет очереди, заменяется
+    следующим запросом с тем же ключом: устаревший кадр не отправляется,
+    а его send() возвращает None.
+    
+    Ответ 429 (RetryAfter) не передается вызывающему: чат замолкает на
+    указанное Telegram время, и запрос повторяется (не больше max_retries
+    раз), если его еще не заменил более новый. Остальные ошибки
+    возвращаются из send() как есть.
+    """
+    
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE,
+                 group_rate=OUTBOUND_GROUP_RATE, burst=OUTBOUND_CHAT_BURST,
+                 max_retries=OUTBOUND_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.chats = {}
+        # Запросы с ключом, которые еще ждут отправки: ключ -> запрос
+        self.pending = {}
+        # (момент готовности, chat_id) для чатов, у которых есть что отправить
+        self.ready = []
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.in_flight = set()
+        self.last_prune = 0.0
+        
+        # Статистика
+        self.submitted = 0
+        self.sent = 0
+        self.replaced = 0
+        self.retried = 0
+        self.failed = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+    
+    async def send(self, chat_id, call, key=None):
+        """Выполняет call() в очереди чата и возвращает ее результат.
+        
+        call создает запрос заново при каждом вызове (файлы нельзя прочитать
+        дважды). Возвращает None, если запрос заменен более новым с тем же key.
+        """
+        if self.task is None:
+            self.task = asyncio.create_task(self._dispatch())
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self.submitted += 1
+        
+        request = self.pending.get(key) if key is not None else None
+        if request is not None:
+            # Новый кадр занимает место старого в очереди чата
+            if not request.future.done():
+                request.future.set_result(None)
+            self.replaced += 1
+            request.call = call
+            request.future = loop.create_future()
+            return await request.future
+        
+        request = _Request(key, call, loop.create_future(), now)
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            chat = self.chats[chat_id] = _ChatQueue(TokenBucket(rate, self.burst, now))
+        chat.queue.append(request)
+        if key is not None:
+            self.pending[key] = request
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        self._schedule(chat_id, chat, now)
+        return await request.future
+    
+    def _schedule(self, chat_id, chat, now):
+        if chat.queue and not chat.busy and not chat.scheduled:
+            chat.scheduled = True
+            heapq.heappush(self.ready, (chat.ready_at(now), chat_id))
+            self.wakeup.set()
+    
+    async def _dispatch(self):
+        """Отправляет запросы, как только позволяют ведра чата и общее"""
+        while True:
+            now = time.monotonic()
+            if not self.ready:
+                self._prune(now)
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            ready_at, chat_id = self.ready[0]
+            wait = max(ready_at, self.global_bucket.ready_at(now)) - now
+            if wait > 0:
+                # Новый запрос может оказаться готов раньше - тогда нас разбудят
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            heapq.heappop(self.ready)
+            chat = self.chats[chat_id]
+            chat.scheduled = False
+            actual = chat.ready_at(now)
+            if actual > now:
+                # Ведро чата наполнилось чуть позже расчетного (округление)
+                chat.scheduled = True
+                heapq.heappush(self.ready, (actual, chat_id))
+                continue
+            
+            request = chat.queue.popleft()
+            if request.key is not None and self.pending.get(request.key) is request:
+                del self.pending[request.key]
+            self.queued -= 1
+            chat.bucket.take(now)
+            self.global_bucket.take(now)
+            chat.busy = True
+            wait = now - request.submitted
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+            OUTBOUND_WAIT_SECONDS.observe(wait)
+            task = asyncio.create_task(self._send(chat_id, chat, request))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+    
+    async def _send(self, chat_id, chat, request):
+        start = time.perf_counter()
+        try:
+            result = await request.call()
+        except RetryAfter as e:
+            self.retried += 1
+            chat.paused_until = time.monotonic() + e.retry_after
+            newer = request.key is not None and request.key in self.pending
+            if newer:
+                # Пока ждем, повторять нечего: в очереди уже более новый кадр
+                self.replaced += 1
+                if not request.future.done():
+                    request.future.set_result(None)
+            elif request.retries >= self.max_retries:
+                self.failed += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                request.retries += 1
+                chat.queue.appendleft(request)
+                if request.key is not None:
+                    self.pending[request.key] = request
+                self.queued += 1
+        except Exception as e:
+            self.failed += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, "telegram")
+            chat.busy = False
+            self._schedule(chat_id, chat, time.monotonic())
+    
+    def _prune(self, now):
+        """Забывает ведра чатов, которые молчат достаточно долго, чтобы ведро наполнилось"""
+        if now - self.last_prune < 1:
+            return
+        self.last_prune = now
+        idle = [chat_id for chat_id, chat in self.chats.items()
+                if not chat.queue and not chat.busy and chat.paused_until <= now and chat.bucket.is_full(now)]
+        for chat_id in idle:
+            del self.chats[chat_id]
+    
+    async def stop(self):
+        """Останавливает отправку; запросы, которые не успели уйти, отменяются"""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await asyncio.gather(*self.in_flight, return_exceptions=True)
+        for chat in self.chats.values():
+            for request in chat.queue:
+                request.future.cancel()
+        self.chats.clear()
+        self.pending.clear()
+        self.ready.clear()
+        self.queued = 0
+    
+    def get_stats(self):
+        """Возвращает размер очереди, число отправленных, замененных и повторенных запросов"""
+        dispatched = self.sent + self.failed + self.retried
+        return {
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'in_flight': len(self.in_flight),
+            'chats': len(self.chats),
+            'submitted': self.submitted,
+            'sent': self.sent,
+            'replaced': self.replaced,
+            'retried': self.retried,
+            'failed': self.failed,
+            'avg_wait_ms': self.wait_time_total / dispatched * 1000 if dispatched else 0.0,
+            'max_wait_ms': self.wait_time_max * 1000
+        }
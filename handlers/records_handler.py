@@ -1,70 +1,110 @@
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from datetime import datetime
-
-class RecordsHandler:
-    def __init__(self, records_manager):
-        self.records_manager = records_manager
-    
-    async def show_records(self, update, context, message):
-        """Показывает таблицу рекордов"""
-        top_records = self.records_manager.get_top_records(10)
-        
-        text = "🏆 **Топ-10 игроков**\n\n"
-        
-        if top_records:
-            for i, record in enumerate(top_records, 1):
-                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-                # Обрезаем длинные имена
-                name = record['first_name']
-                if len(name) > 15:
-                    name = name[:15] + "..."
-                text += f"{medal} {name} - **{record['score']}** очков\n"
-        else:
-            text += "🎯 Пока нет рекордов! Станьте первым!\n"
-        
-        text += f"\n👥 Всего игроков: {len(self.records_manager.records)}"
-        
-        keyboard = [
-            [InlineKeyboardButton("📊 Моя статистика", callback_data="my_stats")],
-            [InlineKeyboardButton("🎮 Начать игру", callback_data="play_game")],
-            [InlineKeyboardButton("↩️ Главное меню", callback_data="main_menu")]
-        ]
-        
-        try:
-            await message.edit_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
-        except Exception as e:
-            # Если сообщение слишком длинное, упрощаем его
-            simplified_text = "🏆 **Топ игроков**\n\nИспользуйте кнопки ниже для просмотра статистики:"
-            await message.edit_text(simplified_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
-    
-    async def show_user_stats(self, update, context, message, user):
-        """Показывает статистику пользователя"""
-        stats = self.records_manager.get_user_stats(user.id)
-        
-        text = f"📊 **Статистика игрока** {user.first_name}\n\n"
-        text += f"⭐ **Лучший результат:** **{stats['best_score']}** очков\n"
-        text += f"🎯 **Последняя игра:** {stats['last_score']} очков\n"
-        
-        if stats['rank']:
-            text += f"🏅 **Место в рейтинге:** {stats['rank']}\n"
-        else:
-            text += f"🏅 **Место в рейтинге:** не определено\n"
-        
-        text += f"🎮 **Сыграно игр:** {max(stats['games_played'], 1)}\n"
-        text += f"👥 **Всего игроков:** {stats['total_players']}"
-        
-        if stats['best_score'] == 0:
-            text += "\n\n🎯 У вас еще нет рекорда! Сыграйте первую игру!"
-        
-        keyboard = [
-            [InlineKeyboardButton("🎮 Играть", callback_data="play_game")],
-            [InlineKeyboardButton("🏆 Таблица рекордов", callback_data="show_records")],
-            [InlineKeyboardButton("↩️ Главное меню", callback_data="main_menu")]
-        ]
-        
-        try:
-            await message.edit_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
-        except Exception as e:
-            # Упрощаем текст при ошибке
-            simplified_text = f"📊 **Статистика** {user.first_name}\n\nЛучший результат: **{stats['best_score']}** очков"
-            await message.edit_text(simplified_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
\ No newline at end of file
+from datetime import datetime
+from handlers.keyboards import RECORDS_KEYBOARD, STATS_KEYBOARD
+from handlers.response_cache import ResponseCache
+
+# Заголовки таблиц рекордов за период
+WINDOW_TITLES = {
+    "day": "🏆 **Топ-10 за сегодня**",
+    "week": "🏆 **Топ-10 за неделю**"
+}
+
+class RecordsHandler:
+    def __init__(self, records_manager):
+        self.records_manager = records_manager
+        self.cache = ResponseCache()
+    
+    async def show_records(self, update, context, message):
+        """Показывает таблицу рекордов"""
+        # Текст меняется только вместе с топом или числом игроков
+        version = self.records_manager.top_version
+        text = self.cache.get("records", None, version)
+        if text is None:
+            text = self._create_records_text()
+            self.cache.put("records", None, version, text)
+        
+        await self._show_records_text(message, text)
+    
+    async def show_window_records(self, update, context, message, window):
+        """Показывает таблицу рекордов за текущие сутки или неделю"""
+        version, top_records = self.records_manager.get_window_top(window)
+        view = f"records_{window}"
+        text = self.cache.get(view, None, version)
+        if text is None:
+            text = self._format_top(WINDOW_TITLES[window], top_records)
+            self.cache.put(view, None, version, text)
+        
+        await self._show_records_text(message, text)
+    
+    async def _show_records_text(self, message, text):
+        try:
+            await message.edit_text(text, reply_markup=RECORDS_KEYBOARD, parse_mode='Markdown')
+        except Exception as e:
+            # Если сообщение слишком длинное, упрощаем его
+            simplified_text = "🏆 **Топ игроков**\n\nИспользуйте кнопки ниже для просмотра статистики:"
+            await message.edit_text(simplified_text, reply_markup=RECORDS_KEYBOARD, parse_mode='Markdown')
+    
+    def _create_records_text(self):
+        """Создает текст таблицы рекордов"""
+        top_records = self.records_manager.get_top_records(self.records_manager.TOP_SIZE)
+        text = self._format_top("🏆 **Топ-10 игроков**", top_records)
+        text += f"\n👥 Всего игроков: {self.records_manager.get_players_count()}"
+        return text
+    
+    def _format_top(self, title, top_records):
+        """Создает текст таблицы из записей с first_name и score"""
+        text = title + "\n\n"
+        
+        if top_records:
+            for i, record in enumerate(top_records, 1):
+                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                # Обрезаем длинные имена
+                name = record['first_name']
+                if len(name) > 15:
+                    name = name[:15] + "..."
+                text += f"{medal} {name} - **{record['score']}** очков\n"
+        else:
+            text += "🎯 Пока нет рекордов! Станьте первым!\n"
+        
+        return text
+    
+    async def show_user_stats(self, update, context, message, user):
+        """Показывает статистику пользователя"""
+        # Место игрока зависит от чужих результатов, поэтому версия - любое изменение рекордов
+        version = self.records_manager.records_version
+        key = (user.id, user.first_name)
+        cached = self.cache.get("stats", key, version)
+        if cached is None:
+            stats = self.records_manager.get_user_stats(user.id)
+            cached = (self._create_stats_text(user, stats), stats['best_score'])
+            self.cache.put("stats", key, version, cached)
+        text, best_score = cached
+        
+        try:
+            await message.edit_text(text, reply_markup=STATS_KEYBOARD, parse_mode='Markdown')
+        except Exception as e:
+            # Упрощаем текст при ошибке
+            simplified_text = f"📊 **Статистика** {user.first_name}\n\nЛучший результат: **{best_score}** очков"
+            await message.edit_text(simplified_text, reply_markup=STATS_KEYBOARD, parse_mode='Markdown')
+    
+    def _create_stats_text(self, user, stats):
+        """Создает текст статистики игрока"""
+        text = f"📊 **Статистика игрока** {user.first_name}\n\n"
+        text += f"⭐ **Лучший результат:** **{stats['best_score']}** очков\n"
+        text += f"🎯 **Последняя игра:** {stats['last_score']} очков\n"
+        
+        if stats['rank']:
+            text += f"🏅 **Место в рейтинге:** {stats['rank']}\n"
+        else:
+            text += f"🏅 **Место в рейтинге:** не определено\n"
+        
+        text += f"🎮 **Сыграно игр:** {max(stats['games_played'], 1)}\n"
+        text += f"👥 **Всего игроков:** {stats['total_players']}"
+        
+        if stats['best_score'] == 0:
+            text += "\n\n🎯 У вас еще нет рекорда! Сыграйте первую игру!"
+        
+        return text
+    
+    def get_cache_stats(self):
+        """Возвращает попадания в кэш по экранам"""
+        return self.cache.get_stats()
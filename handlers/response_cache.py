@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from config import RESPONSE_CACHE_MAX_ENTRIES
+
+
+class ResponseCache:
+    """Кэш готовых текстов ответов по экранам.
+    
+    Запись хранится вместе с версией данных, из которых она построена;
+    если версия изменилась, запись считается устаревшей. Число записей
+    ограничено, вытесняются давно не запрошенные.
+    """
+    
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+    
+    def get(self, view, key, version):
+        entry = self.entries.get((view, key))
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end((view, key))
+            self.hits[view] = self.hits.get(view, 0) + 1
+            return entry[1]
+        self.misses[view] = self.misses.get(view, 0) + 1
+        return None
+    
+    def put(self, view, key, version, value):
+        self.entries[(view, key)] = (version, value)
+        self.entries.move_to_end((view, key))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def get_stats(self):
+        """Возвращает попадания и промахи по каждому экрану"""
+        stats = {}
+        for view in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits.get(view, 0)
+            misses = self.misses.get(view, 0)
+            stats[view] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses)
+            }
+        return stats
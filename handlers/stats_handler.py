@@ -0,0 +1,57 @@
+import time
+from config import ADMIN_IDS
+from metrics import STAGE_SECONDS, CALLBACKS, CALLBACK_ERRORS, START_TIME, collect_stats
+
+# Порядок этапов в сводке
+STAGES = ["dispatch", "game", "render", "encode", "answer", "telegram", "records", "records_flush"]
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+class StatsHandler:
+    """Команда /stats: сводка метрик для администраторов (ADMIN_IDS)"""
+    
+    def __init__(self, admin_ids=ADMIN_IDS):
+        self.admin_ids = admin_ids
+    
+    def is_admin(self, user):
+        return user is not None and user.id in self.admin_ids
+    
+    async def show_stats(self, update, context):
+        """Отвечает сводкой администратору; остальным команда не видна"""
+        if not self.is_admin(update.effective_user):
+            return
+        await update.message.reply_text(self.create_stats_text(), parse_mode='Markdown')
+    
+    def create_stats_text(self):
+        """Сводка: задержки этапов и показатели компонентов"""
+        uptime = int(time.time() - START_TIME)
+        callbacks = sum(CALLBACKS.values.values())
+        errors = sum(CALLBACK_ERRORS.values.values())
+        lines = ["📈 **Статистика бота**", f"⏱ Работает: {uptime // 3600} ч {uptime % 3600 // 60} мин",
+                 f"👆 Нажатий: {callbacks}, ошибок: {errors}", "", "```"]
+        
+        # Квантили - верхние границы корзин гистограммы
+        lines.append(f"{'этап':<14}{'число':>8}{'сред':>8}{'p50':>8}{'p99':>8}{'макс':>8}  мс")
+        for stage in STAGES:
+            summary = STAGE_SECONDS.summary(stage)
+            if summary is None:
+                continue
+            count, total, maximum = summary
+            lines.append(f"{stage:<14}{count:>8}{_ms(total / count):>8}{_ms(STAGE_SECONDS.quantile(0.5, stage)):>8}"
+                         f"{_ms(STAGE_SECONDS.quantile(0.99, stage)):>8}{_ms(maximum):>8}")
+        
+        for prefix, stats in collect_stats().items():
+            values = []
+            for key, value in stats.items():
+                if isinstance(value, float):
+                    values.append(f"{key}={value:.2f}")
+                elif isinstance(value, int):
+                    values.append(f"{key}={value}")
+            if values:
+                lines.append("")
+                lines.append(f"{prefix}: " + ", ".join(values))
+        lines.append("```")
+        return "\n".join(lines)
@@ -0,0 +1,75 @@
+import asyncio
+from telegram.ext import BaseUpdateProcessor
+from config import CONCURRENT_UPDATES
+
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка апдейтов с очередностью внутри чата.
+    
+    Апдейты разных чатов обрабатываются одновременно (не больше
+    max_concurrent_updates), а апдейты одного чата - строго по одному и в
+    порядке поступления: каждый ждет блокировку своего чата. asyncio.Lock
+    отдается ожидающим по очереди, а до блокировки апдейт доходит без
+    переключений задач, поэтому порядок совпадает с порядком в очереди PTB.
+    
+    Слот параллельности апдейт занимает только после блокировки чата:
+    ожидающие своей очереди апдейты слотов не держат, и один занятый чат
+    не останавливает остальные. Поэтому process_update переопределен и
+    семафор BaseUpdateProcessor не используется.
+    
+    Обработчики апдейтов одного чата не пересекаются, но фоновые задачи
+    кадров (GameHandler._display_loop) работают вне блокировки чата: они
+    читают игру и редактируют сообщение одновременно со следующим апдейтом.
+    Общее состояние с ними GameHandler согласует сам (pending_displays,
+    rendering_chats).
+    """
+    
+    def __init__(self, max_concurrent_updates=CONCURRENT_UPDATES):
+        super().__init__(max_concurrent_updates)
+        # Занятые слоты: апдейты, которые держат блокировку своего чата
+        self.slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # chat_id -> [блокировка, число апдейтов, которые ее держат или ждут]
+        self.locks = {}
+        self.processed = 0
+        self.waited = 0
+    
+    async def process_update(self, update, coroutine):
+        # Без семафора базового класса: слот берется в do_process_update после блокировки чата
+        await self.do_process_update(update, coroutine)
+    
+    async def do_process_update(self, update, coroutine):
+        chat = getattr(update, 'effective_chat', None)
+        if chat is None:
+            async with self.slots:
+                await coroutine
+            return
+        
+        entry = self.locks.get(chat.id)
+        if entry is None:
+            entry = self.locks[chat.id] = [asyncio.Lock(), 0]
+        if entry[0].locked():
+            self.waited += 1
+        entry[1] += 1
+        try:
+            async with entry[0], self.slots:
+                await coroutine
+        finally:
+            self.processed += 1
+            entry[1] -= 1
+            # Блокировки держим только для чатов, у которых есть апдейты в работе
+            if entry[1] == 0:
+                del self.locks[chat.id]
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    def get_stats(self):
+        """Возвращает число обработанных апдейтов и тех, что ждали свой чат"""
+        return {
+            'processed': self.processed,
+            'waited': self.waited,
+            'active_chats': len(self.locks)
+        }
@@ -0,0 +1,244 @@
+import asyncio
+import hmac
+import json
+import time
+from telegram import Update
+from config import (WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    WEBHOOK_QUEUE_SIZE, WEBHOOK_RECORD_FILE)
+
+# Апдейты Telegram на порядки меньше; защита от мусорных запросов
+MAX_BODY_SIZE = 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    """Запрос не разобрать: ответить кодом status и закрыть соединение"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """Читает один HTTP/1.1-запрос: (метод, путь, заголовки, тело) или None, если соединение закрыто.
+    
+    Поддерживается только тело с Content-Length - так присылает апдейты Telegram.
+    Неразборчивый запрос дает BadRequest; после него поток не выровнен по
+    запросам, поэтому соединение нужно закрыть.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise BadRequest(431, "Слишком длинные заголовки запроса")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise BadRequest(400, f"Неверный заголовок запроса: {lines[0][:100]!r}")
+    if length < 0:
+        raise BadRequest(400, f"Неверная длина запроса: {length}")
+    if length > MAX_BODY_SIZE:
+        raise BadRequest(413, f"Слишком большой запрос: {length} байт")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except (asyncio.IncompleteReadError, ConnectionError):
+        # Соединение закрылось посреди тела - отвечать некому
+        return None
+    return method, path, headers, body
+
+
+def write_response(writer, status, body=b"", content_type="application/json", keep_alive=True):
+    """Пишет HTTP-ответ; отправку дожидается вызывающий через drain"""
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер, который принимает апдейты от Telegram (webhook).
+    
+    Запрос с апдейтом только разбирается и ставится в очередь, после чего
+    Telegram сразу получает ответ 200. Принятых, но не обработанных апдейтов
+    (в очереди и в работе) не больше queue_size: сверх этого сервер отвечает
+    503, и Telegram повторит доставку позже, поэтому при перегрузке апдейты
+    ждут на стороне Telegram, а не копятся в памяти бота. Задача-диспетчер
+    забирает апдейты из очереди по порядку и запускает для каждого задачу
+    обработки через processor (ChatUpdateProcessor), не дожидаясь ее: апдейт
+    чата, занятого предыдущими, ждет свою блокировку, не задерживая
+    остальные чаты, а сколько апдейтов обрабатывается одновременно, решает
+    processor.
+    
+    Если задан record_path, тело каждого принятого апдейта дописывается туда
+    строкой JSON - такой файл можно проиграть локально
+    (benchmarks/fake_bot_api.py).
+    """
+    
+    def __init__(self, application, processor, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET,
+                 host=WEBHOOK_LISTEN, port=WEBHOOK_PORT, queue_size=WEBHOOK_QUEUE_SIZE,
+                 record_path=WEBHOOK_RECORD_FILE):
+        self.application = application
+        self.processor = processor
+        self.path = path
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.record_path = record_path
+        self.queue = None
+        self.server = None
+        self.dispatcher = None
+        # Задачи обработки апдейтов, которые еще не завершились
+        self.tasks = set()
+        self.connections = set()
+        self.record_file = None
+        
+        # Статистика
+        self.received = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.dispatched = 0
+        self.processed = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+    
+    async def start(self):
+        """Запускает сервер и задачи обработки в текущем цикле событий"""
+        self.queue = asyncio.Queue()
+        if self.record_path:
+            self.record_file = open(self.record_path, 'ab')
+        self.dispatcher = asyncio.create_task(self._dispatch())
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        # Порт 0 - выбрать свободный (для локальных проверок)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def _serve_connection(self, reader, writer):
+        """Обслуживает соединение; Telegram держит соединения открытыми и шлет по ним апдейты подряд"""
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    write_response(writer, e.status, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                status = self._accept(*request)
+                write_response(writer, status)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+    
+    def _accept(self, method, path, headers, body):
+        """Проверяет запрос и ставит апдейт в очередь; возвращает код ответа"""
+        if path != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if self.secret and not hmac.compare_digest(
+                headers.get('x-telegram-bot-api-secret-token', ''), self.secret):
+            return 403
+        if self.queue.qsize() + len(self.tasks) >= self.queue_size:
+            self.rejected += 1
+            return 503
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            self.invalid += 1
+            print(f"Ошибка разбора апдейта: {e}")
+            return 400
+        
+        self.received += 1
+        self.queue.put_nowait((update, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize() + len(self.tasks))
+        if self.record_file is not None:
+            self.record_file.write(body.replace(b"\n", b"") + b"\n")
+        return 200
+    
+    async def _dispatch(self):
+        """Запускает обработку апдейтов из очереди, не дожидаясь ее окончания"""
+        while True:
+            update, received = await self.queue.get()
+            wait = time.perf_counter() - received
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+            self.dispatched += 1
+            # Если ждать обработку здесь, апдейты других чатов стояли бы в
+            # очереди, пока занятый чат отпускает блокировку. Задачи стартуют
+            # в порядке создания и берут блокировку чата до первого
+            # переключения, поэтому апдейты чата все равно идут по порядку
+            task = asyncio.create_task(self._process(update))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    async def _process(self, update):
+        try:
+            await self.processor.process_update(update, self.application.process_update(update))
+            self.processed += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка обработки апдейта: {e}")
+        finally:
+            self.queue.task_done()
+    
+    async def stop(self):
+        """Перестает принимать апдейты и дорабатывает очередь"""
+        if self.server is None:
+            return
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+        self.server = None
+        # Очередь считается пройденной, когда завершились задачи всех апдейтов
+        await self.queue.join()
+        self.dispatcher.cancel()
+        await asyncio.gather(self.dispatcher, *self.tasks, return_exceptions=True)
+        self.dispatcher = None
+        if self.record_file is not None:
+            self.record_file.close()
+            self.record_file = None
+    
+    def get_stats(self):
+        """Возвращает статистику приема и обработки апдейтов"""
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'invalid': self.invalid,
+            'processed': self.processed,
+            'errors': self.errors,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'in_progress': len(self.tasks),
+            'max_queue_depth': self.max_queue_depth,
+            'avg_wait_ms': self.wait_time_total / self.dispatched * 1000 if self.dispatched else 0.0,
+            'max_wait_ms': self.wait_time_max * 1000
+        }
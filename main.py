@@ -1,112 +1,242 @@
-import logging
-import os
-from telegram import Update
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-
-# Импортируем из config - все работает как раньше
-from config import BOT_TOKEN, BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE, BORDER, RECORDS_FILE, SHAPES, COLORS
-from database.records import RecordsManager
-from handlers.menu import MenuHandler
-from handlers.records_handler import RecordsHandler
-from handlers.game_handler import GameHandler
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-class TetrisBot:
-    def __init__(self):
-        # Проверяем наличие BOT_TOKEN
-        if not BOT_TOKEN:
-            raise ValueError(
-                "❌ BOT_TOKEN не найден!\n"
-                "📝 Для локальной разработки:\n"
-                "   - Создайте файл .env с BOT_TOKEN=ваш_токен\n"
-                "   - Или установите переменную окружения\n\n"
-                "🌐 Для деплоя на Render.com:\n"
-                "   - Добавьте BOT_TOKEN в Environment Variables"
-            )
-        
-        self.records_manager = RecordsManager()
-        self.menu_handler = MenuHandler(self.records_manager)
-        self.records_handler = RecordsHandler(self.records_manager)
-        self.game_handler = GameHandler(self.records_manager)
-        
-        self.application = Application.builder().token(BOT_TOKEN).build()
-        self._setup_handlers()
-    
-    # ... остальной код без изменений
-    def _setup_handlers(self):
-        """Настраивает обработчики команд"""
-        self.application.add_handler(CommandHandler("start", self.start))
-        self.application.add_handler(CommandHandler("help", self.help))
-        self.application.add_handler(CommandHandler("play", self.play))
-        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
-    
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /start"""
-        await self.menu_handler.show_main_menu(update, context)
-    
-    async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /help"""
-        await update.message.reply_text(
-            "🎮 **Команды бота:**\n\n"
-            "/start - Главное меню\n"
-            "/play - Начать игру\n"
-            "/help - Справка\n\n"
-            "Используйте кнопки для навигации!",
-            parse_mode='Markdown'
-        )
-    
-    async def play(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /play"""
-        user = update.effective_user
-        await self.game_handler.start_game(update, context, update.message, user)
-    
-    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик callback запросов"""
-        query = update.callback_query
-        await query.answer()
-        
-        user = update.effective_user
-        
-        logger.info(f"Callback received: {query.data} from user {user.id}")
-        
-        # Всегда сначала проверяем меню и навигацию
-        if query.data == "main_menu":
-            await self.menu_handler.show_main_menu(update, context, query.message)
-        
-        elif query.data == "play_game":
-            await self.game_handler.start_game(update, context, query.message, user)
-        
-        elif query.data == "show_records":
-            await self.records_handler.show_records(update, context, query.message)
-        
-        elif query.data == "my_stats":
-            await self.records_handler.show_user_stats(update, context, query.message, user)
-        
-        elif query.data == "show_rules":
-            await self.menu_handler.show_rules(update, context, query.message)
-        
-        # Игровые действия передаем в game_handler
-        elif query.data in ["left", "right", "down", "rotate", "drop", "end_game"]:
-            await self.game_handler.handle_game_action(update, context, query, user)
-        
-        else:
-            logger.warning(f"Unknown callback data: {query.data}")
-            await query.message.reply_text("Неизвестная команда. Используйте кнопки меню.")
-    
-    def run(self):
-        """Запускает бота"""
-        print("🎮 Бот Тетрис запускается...")
-        print("📱 Откройте Telegram и найдите своего бота")
-        print("🚀 Отправьте /start для начала")
-        
-        self.application.run_polling()
-
-if __name__ == '__main__':
-    bot = TetrisBot()
-    bot.run()
\ No newline at end of file
+import asyncio
+import logging
+import os
+import signal
+import time
+from telegram import Update
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+
+# Импортируем из config - все работает как раньше
+from config import BOT_TOKEN, BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE, BORDER, RECORDS_FILE, SHAPES, COLORS, CONCURRENT_UPDATES
+from config import BOT_API_URL, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, METRICS_PORT
+from database.records import RecordsManager
+from handlers.menu import MenuHandler
+from handlers.records_handler import RecordsHandler
+from handlers.game_handler import GameHandler
+from handlers.update_processor import ChatUpdateProcessor
+from handlers.webhook import WebhookServer
+from handlers.metrics_server import MetricsServer
+from handlers.stats_handler import StatsHandler
+import metrics
+from metrics import STAGE_SECONDS, CALLBACKS, CALLBACK_ERRORS, SlowRequestProfiler
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Кнопки, которые различает handle_callback; остальные считаются как "other"
+CALLBACK_ACTIONS = {
+    "main_menu", "play_game", "show_records", "records_day", "records_week", "my_stats", "show_rules",
+    "left", "right", "down", "rotate", "drop", "end_game", "toggle_view"
+}
+
+class TetrisBot:
+    def __init__(self):
+        # Проверяем наличие BOT_TOKEN
+        if not BOT_TOKEN:
+            raise ValueError(
+                "❌ BOT_TOKEN не найден!\n"
+                "📝 Для локальной разработки:\n"
+                "   - Создайте файл .env с BOT_TOKEN=ваш_токен\n"
+                "   - Или установите переменную окружения\n\n"
+                "🌐 Для деплоя на Render.com:\n"
+                "   - Добавьте BOT_TOKEN в Environment Variables"
+            )
+        # Без секрета webhook принимал бы апдейты от кого угодно
+        if WEBHOOK_URL and not WEBHOOK_SECRET:
+            raise ValueError(
+                "❌ WEBHOOK_SECRET не задан!\n"
+                "🔒 В режиме webhook (задан WEBHOOK_URL) установите WEBHOOK_SECRET -\n"
+                "   Telegram присылает его с каждым апдейтом, остальные запросы отклоняются"
+            )
+        
+        self.records_manager = RecordsManager()
+        self.menu_handler = MenuHandler(self.records_manager)
+        self.records_handler = RecordsHandler(self.records_manager)
+        self.game_handler = GameHandler(self.records_manager)
+        self.stats_handler = StatsHandler()
+        self.profiler = SlowRequestProfiler()
+        self.metrics_server = MetricsServer() if METRICS_PORT else None
+        
+        # Чаты обрабатываются параллельно, апдейты внутри чата - по очереди
+        self.update_processor = ChatUpdateProcessor(CONCURRENT_UPDATES)
+        builder = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .concurrent_updates(self.update_processor)
+            # Каждому одновременному апдейту нужно свое соединение с Bot API
+            .connection_pool_size(CONCURRENT_UPDATES)
+            .post_init(self._on_startup)
+            .post_shutdown(self._on_shutdown)
+        )
+        if BOT_API_URL:
+            builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+        self.application = builder.build()
+        self._setup_handlers()
+        self._register_metrics()
+    
+    # ... остальной код без изменений
+    def _setup_handlers(self):
+        """Настраивает обработчики команд"""
+        self.application.add_handler(CommandHandler("start", self.start))
+        self.application.add_handler(CommandHandler("help", self.help))
+        self.application.add_handler(CommandHandler("play", self.play))
+        self.application.add_handler(CommandHandler("stats", self.stats_handler.show_stats))
+        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
+    
+    def _register_metrics(self):
+        """Подключает статистику компонентов к метрикам"""
+        metrics.register_stats("sessions", self.game_handler.games.get_stats)
+        metrics.register_stats("input", self.game_handler.get_input_stats)
+        metrics.register_stats("frame_cache", self.game_handler.frame_cache.get_stats)
+        metrics.register_stats("outbound", self.game_handler.outbound.get_stats)
+        metrics.register_stats("updates", self.update_processor.get_stats)
+        metrics.register_stats("records_writer", self.records_manager.get_writer_stats)
+        metrics.register_stats("response_cache", self.records_handler.get_cache_stats)
+    
+    async def _on_startup(self, application):
+        """Запускает фоновые задачи в цикле событий приложения"""
+        self.records_manager.start_writer()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+            logger.info(f"Метрики: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+    
+    async def _on_shutdown(self, application):
+        """Освобождает ресурсы при остановке приложения"""
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.game_handler.shutdown()
+        # Дописываем рекорды, которые еще стоят в очереди
+        await self.records_manager.stop_writer()
+        logger.info(f"Records writer: {self.records_manager.get_writer_stats()}")
+        logger.info(f"Response cache: {self.records_handler.get_cache_stats()}")
+        logger.info(f"Game input: {self.game_handler.get_input_stats()}")
+        logger.info(f"Updates: {self.update_processor.get_stats()}")
+        logger.info(f"Game sessions: {self.game_handler.games.get_stats()}")
+        logger.info(f"Outbound: {self.game_handler.outbound.get_stats()}")
+        self.records_manager.close()
+    
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /start"""
+        await self.menu_handler.show_main_menu(update, context)
+    
+    async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /help"""
+        await update.message.reply_text(
+            "🎮 **Команды бота:**\n\n"
+            "/start - Главное меню\n"
+            "/play - Начать игру\n"
+            "/help - Справка\n\n"
+            "Используйте кнопки для навигации!",
+            parse_mode='Markdown'
+        )
+    
+    async def play(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /play"""
+        user = update.effective_user
+        await self.game_handler.start_game(update, context, update.message, user)
+    
+    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик callback запросов; меряет время нажатия целиком"""
+        action = update.callback_query.data if update.callback_query.data in CALLBACK_ACTIONS else "other"
+        CALLBACKS.inc(action)
+        start = time.perf_counter()
+        profile = self.profiler.start()
+        try:
+            await self._handle_callback(update, context)
+        except Exception:
+            CALLBACK_ERRORS.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.observe(elapsed, "dispatch")
+            self.profiler.finish(profile, elapsed, action)
+    
+    async def _handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        start = time.perf_counter()
+        await query.answer()
+        STAGE_SECONDS.observe(time.perf_counter() - start, "answer")
+        
+        user = update.effective_user
+        
+        logger.debug("Callback received: %s from user %s", query.data, user.id)
+        
+        # Всегда сначала проверяем меню и навигацию
+        if query.data == "main_menu":
+            await self.menu_handler.show_main_menu(update, context, query.message)
+        
+        elif query.data == "play_game":
+            await self.game_handler.start_game(update, context, query.message, user)
+        
+        elif query.data == "show_records":
+            await self.records_handler.show_records(update, context, query.message)
+        
+        elif query.data == "records_day":
+            await self.records_handler.show_window_records(update, context, query.message, "day")
+        
+        elif query.data == "records_week":
+            await self.records_handler.show_window_records(update, context, query.message, "week")
+        
+        elif query.data == "my_stats":
+            await self.records_handler.show_user_stats(update, context, query.message, user)
+        
+        elif query.data == "show_rules":
+            await self.menu_handler.show_rules(update, context, query.message)
+        
+        # Игровые действия передаем в game_handler
+        elif query.data in ["left", "right", "down", "rotate", "drop", "end_game", "toggle_view"]:
+            await self.game_handler.handle_game_action(update, context, query, user)
+        
+        else:
+            logger.warning(f"Unknown callback data: {query.data}")
+            await query.message.reply_text("Неизвестная команда. Используйте кнопки меню.")
+    
+    def run(self):
+        """Запускает бота"""
+        print("🎮 Бот Тетрис запускается...")
+        print("📱 Откройте Telegram и найдите своего бота")
+        print("🚀 Отправьте /start для начала")
+        
+        if WEBHOOK_URL:
+            asyncio.run(self._run_webhook())
+        else:
+            self.application.run_polling()
+    
+    async def _run_webhook(self):
+        """Получает апдейты через webhook на встроенном HTTP-сервере до SIGINT/SIGTERM"""
+        application = self.application
+        server = WebhookServer(application, self.update_processor)
+        metrics.register_stats("webhook", server.get_stats)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        
+        # Тот же порядок запуска и остановки, что и в run_polling
+        await application.initialize()
+        await self._on_startup(application)
+        await application.start()
+        try:
+            await server.start()
+            await application.bot.set_webhook(
+                WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook: {WEBHOOK_URL}, порт {server.port}")
+            await stop.wait()
+        finally:
+            await server.stop()
+            logger.info(f"Webhook server: {server.get_stats()}")
+            await application.stop()
+            await application.shutdown()
+            await self._on_shutdown(application)
+
+if __name__ == '__main__':
+    bot = TetrisBot()
+    bot.run()
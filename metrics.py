@@ -0,0 +1,222 @@
+"""Метрики бота: счетчики и гистограммы задержек по этапам обработки нажатия.
+
+Метрика - обычный объект в памяти процесса; observe и inc стоят около
+микросекунды, поэтому метрики всегда включены. Показатели компонентов,
+у которых уже есть get_stats() (сессии, кэши, очереди), не дублируются:
+register_stats подключает такой словарь целиком, и он читается только
+при запросе метрик. render_prometheus() отдает все в текстовом формате
+Prometheus (handlers/metrics_server.py), а админ-команда /stats - в виде
+короткой сводки.
+
+SlowRequestProfiler снимает профиль с доли нажатий и сохраняет его,
+только если нажатие оказалось медленным.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+from bisect import bisect_left
+from config import PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_DIR
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+START_TIME = time.time()
+
+# Все метрики процесса в порядке создания
+_metrics = []
+# (префикс, get_stats) компонентов
+_stats = []
+
+
+def _labels(label, value):
+    return f'{{{label}="{value}"}}' if label else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Counter:
+    """Счетчик; label - имя метки, если счетчик ведется по нескольким значениям"""
+    
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+    
+    def inc(self, label_value="", amount=1):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+    
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} counter")
+        for value, count in self.values.items():
+            lines.append(f"{self.name}{_labels(self.label, value)} {count}")
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: число наблюдений по корзинам, сумма и максимум"""
+    
+    def __init__(self, name, help, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        # значение метки -> [число по корзинам (последняя - +Inf), сумма, максимум]
+        self.series = {}
+    
+    def observe(self, value, label_value=""):
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        if value > series[2]:
+            series[2] = value
+    
+    def summary(self, label_value=""):
+        """(число, сумма, максимум) или None, если наблюдений не было"""
+        series = self.series.get(label_value)
+        if series is None:
+            return None
+        return sum(series[0]), series[1], series[2]
+    
+    def quantile(self, q, label_value=""):
+        """Верхняя граница корзины, в которую попадает квантиль q; для последней корзины - максимум"""
+        series = self.series.get(label_value)
+        if series is None:
+            return 0.0
+        counts = series[0]
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= target:
+                return min(bound, series[2])
+        return series[2]
+    
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for value, (counts, total, _) in self.series.items():
+            prefix = f'{self.label}="{value}",' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{_labels(self.label, value)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.label, value)} {cumulative}")
+
+
+def counter(name, help, label=None):
+    metric = Counter(name, help, label)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help, label=None, buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help, label, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_stats(prefix, get_stats):
+    """Подключает словарь get_stats() компонента: каждое число - метрика tetris_<prefix>_<ключ>.
+    
+    Вложенные словари (статистика по экранам и т.п.) становятся метрикой с меткой name.
+    Повторная регистрация префикса заменяет прежнюю.
+    """
+    unregister_stats(prefix)
+    _stats.append((prefix, get_stats))
+
+
+def unregister_stats(prefix):
+    _stats[:] = [(name, func) for name, func in _stats if name != prefix]
+
+
+def collect_stats():
+    """Текущие словари статистики компонентов: префикс -> словарь"""
+    result = {}
+    for prefix, get_stats in _stats:
+        try:
+            result[prefix] = get_stats()
+        except Exception as e:
+            print(f"Ошибка сбора метрик {prefix}: {e}")
+    return result
+
+
+def render_prometheus():
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    lines = []
+    for metric in _metrics:
+        metric.render(lines)
+    lines.append("# TYPE tetris_uptime_seconds gauge")
+    lines.append(f"tetris_uptime_seconds {time.time() - START_TIME:.0f}")
+    for prefix, stats in collect_stats().items():
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                # {экран: {hits: ...}} -> tetris_<prefix>_hits{name="экран"}
+                for nested_key, nested_value in value.items():
+                    if isinstance(nested_value, (int, float)):
+                        lines.append(f'tetris_{prefix}_{nested_key}{{name="{key}"}} {_format_value(nested_value)}')
+            elif isinstance(value, (int, float)):
+                lines.append(f"tetris_{prefix}_{key} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Этапы нажатия: dispatch - весь обработчик кнопки, game - ход в движке,
+# render и encode - рисование и кодирование кадра, answer и telegram - запросы
+# к Bot API (ответ на нажатие и сообщения), records - обновление рекорда,
+# records_flush - запись пачки рекордов в хранилище
+STAGE_SECONDS = histogram('tetris_stage_seconds', "Время этапов обработки нажатия, с", label='stage')
+OUTBOUND_WAIT_SECONDS = histogram('tetris_outbound_wait_seconds', "Ожидание запроса в очереди планировщика, с")
+CALLBACKS = counter('tetris_callbacks_total', "Нажатия кнопок по действиям", label='action')
+CALLBACK_ERRORS = counter('tetris_callback_errors_total', "Ошибки в обработчике кнопок")
+SLOW_PROFILES = counter('tetris_slow_profiles_total', "Сохраненные профили медленных нажатий")
+
+
+class SlowRequestProfiler:
+    """Профилирует долю sample_rate нажатий и сохраняет профиль медленных.
+    
+    cProfile видит только поток цикла событий и, пока нажатие ждет сеть,
+    заодно все остальные задачи - профиль показывает, чем был занят цикл.
+    Одновременно снимается не больше одного профиля. Профиль нажатия
+    дольше slow_ms печатается (самые дорогие функции) и, если задан
+    directory, сохраняется файлом .prof для snakeviz/pstats.
+    """
+    
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, slow_ms=PROFILE_SLOW_MS, directory=PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.slow = slow_ms / 1000
+        self.directory = directory
+        self.active = False
+    
+    def start(self):
+        """Профиль для этого нажатия или None"""
+        if not self.sample_rate or self.active or random.random() >= self.sample_rate:
+            return None
+        self.active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    
+    def finish(self, profile, elapsed, label):
+        if profile is None:
+            return
+        profile.disable()
+        self.active = False
+        if elapsed < self.slow:
+            return
+        SLOW_PROFILES.inc()
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(15)
+        print(f"Медленное нажатие {label}: {elapsed * 1000:.0f} мс\n{out.getvalue()}")
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, f"slow-{label}-{int(time.time() * 1000)}.prof"))